@@ -0,0 +1,85 @@
+"""
+Escritura diferida en lote para registros de alto volumen.
+
+Los registros se acumulan en un buffer circular en memoria y un hilo de fondo
+los guarda cada `max_eventos` registros o cada `intervalo_ms` milisegundos.
+Si el buffer se llena antes de vaciarse se descartan los más antiguos: para
+estos registros importa más no cargar la base de datos en cada request que
+conservar cada uno.
+
+Cada uso define `guardar(registros)`, normalmente con un bulk_create.
+"""
+import atexit
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+from django.db import close_old_connections
+
+
+class BufferEscrituraDiferida(ABC):
+    nombre_hilo = 'escritura-diferida'
+
+    def __init__(self, capacidad=10000, max_eventos=200, intervalo_ms=1000, asincrono=True):
+        self.registros = deque(maxlen=capacidad)
+        self.max_eventos = max_eventos
+        self.intervalo_s = intervalo_ms / 1000
+        self.asincrono = asincrono
+        self.descartados = 0
+        self._lock = threading.Lock()
+        self._aviso = threading.Event()
+        self._hilo = None
+
+    @abstractmethod
+    def guardar(self, registros):
+        """Persiste los registros acumulados; devuelve las filas creadas"""
+
+    def agregar(self, registro):
+        with self._lock:
+            if len(self.registros) == self.registros.maxlen:
+                self.descartados += 1
+            self.registros.append(registro)
+            pendientes = len(self.registros)
+        if not self.asincrono:
+            if pendientes >= self.max_eventos:
+                self.vaciar()
+            return
+        self._iniciar()
+        if pendientes >= self.max_eventos:
+            self._aviso.set()
+
+    def vaciar(self):
+        with self._lock:
+            registros = list(self.registros)
+            self.registros.clear()
+        if not registros:
+            return 0
+        return self.guardar(registros)
+
+    def _iniciar(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive():
+                return
+            self._hilo = threading.Thread(target=self._ejecutar, name=self.nombre_hilo, daemon=True)
+            self._hilo.start()
+            atexit.register(self._vaciar_al_salir)
+
+    def _vaciar_al_salir(self):
+        try:
+            self.vaciar()
+        except Exception:
+            # Al terminar el proceso la base de datos puede ya no estar disponible
+            pass
+
+    def _ejecutar(self):
+        while True:
+            self._aviso.wait(self.intervalo_s)
+            self._aviso.clear()
+            try:
+                close_old_connections()
+                self.vaciar()
+            except Exception:
+                # Un fallo de la base de datos no debe detener el hilo
+                pass
@@ -0,0 +1,95 @@
+"""
+Filtros por rango de fechas sobre campos DateTimeField.
+
+Los formularios de reportes y listados reciben fechas sueltas ('desde' y
+'hasta', AAAA-MM-DD, ambas incluidas). Filtrar con campo__date__gte obliga a
+la base de datos a convertir la columna fila por fila (CONVERT_TZ + DATE en
+MySQL), así que no puede usar el índice. Aquí se convierten las fechas en un
+rango semiabierto de datetimes con zona horaria:
+
+    desde 00:00 <= campo < (hasta + 1 día) 00:00
+
+en la zona horaria local (settings.TIME_ZONE, America/Santiago), que sí usa
+el índice del campo. Los días de cambio de horario duran 23 o 25 horas y
+quedan cubiertos completos porque los límites son medianoches locales.
+
+Las APIs también reciben fechas con hora ISO 8601 (2025-01-10T08:00:00, con
+o sin zona horaria): esas se usan como instantes exactos, ambos incluidos.
+"""
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+RESOLUCION = timedelta(microseconds=1)
+
+
+def parsear_limite(valor):
+    """
+    Returns:
+        date si el valor es un día, datetime con zona horaria si trae hora, o
+        None si viene vacío
+
+    Raises:
+        ValueError: si el valor no es una fecha ni una fecha con hora válida
+    """
+    if isinstance(valor, datetime):
+        return valor if timezone.is_aware(valor) else timezone.make_aware(valor)
+    if isinstance(valor, date):
+        return valor
+    texto = (valor or '').strip()
+    if not texto:
+        return None
+    # parse_date y parse_datetime lanzan ValueError si el formato calza pero
+    # la fecha no existe (2025-02-30) y devuelven None si no calza
+    fecha = parse_date(texto)
+    if fecha:
+        return fecha
+    instante = parse_datetime(texto)
+    if instante is None:
+        raise ValueError(f'Fecha no válida: {texto!r}')
+    return instante if timezone.is_aware(instante) else timezone.make_aware(instante)
+
+
+def _limite_o_none(valor):
+    try:
+        return parsear_limite(valor)
+    except ValueError:
+        return None
+
+
+def inicio_del_dia(fecha):
+    """Primer instante del día en la zona horaria local"""
+    inicio = datetime.combine(fecha, time.min, tzinfo=timezone.get_current_timezone())
+    # Si la medianoche no existe (cambio a horario de verano) zoneinfo la deja
+    # con la hora anterior al cambio; el ida y vuelta por UTC la normaliza
+    return timezone.localtime(inicio.astimezone(dt_timezone.utc))
+
+
+def rango_fechas(desde=None, hasta=None):
+    """
+    Returns:
+        (inicio, fin): datetimes con zona horaria, inicio incluido y fin
+        excluido; cada uno es None si la fecha no viene o no es válida
+    """
+    desde, hasta = _limite_o_none(desde), _limite_o_none(hasta)
+    if isinstance(desde, datetime):
+        inicio = desde
+    else:
+        inicio = inicio_del_dia(desde) if desde else None
+    if isinstance(hasta, datetime):
+        # Un instante exacto se incluye, como hacía campo__lte
+        fin = hasta + RESOLUCION
+    else:
+        fin = inicio_del_dia(hasta + timedelta(days=1)) if hasta else None
+    return inicio, fin
+
+
+def filtrar_por_fechas(queryset, campo, desde=None, hasta=None):
+    """Restringe el queryset a los objetos con campo entre desde y hasta (días incluidos)"""
+    inicio, fin = rango_fechas(desde, hasta)
+    if inicio:
+        queryset = queryset.filter(**{f'{campo}__gte': inicio})
+    if fin:
+        queryset = queryset.filter(**{f'{campo}__lt': fin})
+    return queryset
@@ -0,0 +1,182 @@
+"""
+Paginación por cursor (keyset) para listados grandes.
+
+En vez de COUNT(*) + OFFSET, cada página filtra por la última fila vista
+según (campo de fecha, id) en orden descendente, así la página 1000 cuesta lo
+mismo que la primera si hay un índice sobre esas columnas. El cursor es
+opaco para el cliente: codifica la fecha, el id y la dirección.
+
+El total es opcional y aproximado: sin filtros se toma de las estadísticas de
+la tabla (MySQL) y con filtros se cuenta hasta TOTAL_MAXIMO filas.
+
+Lo usan las vistas HTML (paginar_por_cursor) y la API (PaginacionCursor).
+"""
+import base64
+import json
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+TAMANO_PAGINA = 20
+TOTAL_MAXIMO = 1000
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valor, pk, atras=False):
+    datos = json.dumps([valor.isoformat(), pk, 1 if atras else 0], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valor, pk, atras = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        fecha = parse_datetime(valor)
+        if fecha is None:
+            raise ValueError
+        return fecha, int(pk), bool(atras)
+    except (TypeError, ValueError, json.JSONDecodeError):
+        raise CursorInvalido('Cursor inválido')
+
+
+class PaginaCursor:
+    """Página de resultados con los cursores para avanzar y retroceder"""
+
+    def __init__(self, object_list, cursor_siguiente, cursor_anterior, total=None, total_es_minimo=False):
+        self.object_list = object_list
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self.total = total
+        self.total_es_minimo = total_es_minimo
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+
+def total_aproximado(queryset, maximo=TOTAL_MAXIMO):
+    """
+    Returns:
+        (total, es_minimo): es_minimo indica que hay al menos `total` filas
+    """
+    if not queryset.query.where and connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table],
+            )
+            fila = cursor.fetchone()
+        if fila and fila[0] is not None:
+            return int(fila[0]), False
+    total = queryset.order_by()[:maximo + 1].count()
+    if total > maximo:
+        return maximo, True
+    return total, False
+
+
+def paginar_por_cursor(queryset, cursor=None, campo='creado_en', tamano=TAMANO_PAGINA, con_total=False):
+    """
+    Devuelve una PaginaCursor ordenada por (campo, id) descendente.
+
+    Un cursor inválido se trata como la primera página.
+    """
+    base = queryset
+    atras = False
+    if cursor:
+        try:
+            valor, pk, atras = decodificar_cursor(cursor)
+        except CursorInvalido:
+            cursor = None
+    if cursor:
+        if atras:
+            queryset = queryset.filter(Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'pk__gt': pk}))
+        else:
+            queryset = queryset.filter(Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'pk__lt': pk}))
+
+    orden = (campo, 'pk') if atras else (f'-{campo}', '-pk')
+    filas = list(queryset.order_by(*orden)[:tamano + 1])
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if atras:
+        filas.reverse()
+
+    cursor_siguiente = cursor_anterior = None
+    if filas:
+        primera, ultima = filas[0], filas[-1]
+        # La fila extra indica que hay más en la dirección en que se avanza;
+        # en la otra dirección hay más si se llegó desde un cursor
+        if hay_mas or atras:
+            cursor_siguiente = codificar_cursor(getattr(ultima, campo), ultima.pk)
+        if (atras and hay_mas) or (not atras and cursor):
+            cursor_anterior = codificar_cursor(getattr(primera, campo), primera.pk, atras=True)
+
+    total, total_es_minimo = total_aproximado(base) if con_total else (None, False)
+    return PaginaCursor(filas, cursor_siguiente, cursor_anterior, total, total_es_minimo)
+
+
+class PaginacionCursor(BasePagination):
+    """
+    Paginación por cursor para los viewsets de DRF.
+
+    El viewset define `campo_cursor` (por defecto 'fecha_creacion'). Con
+    ?total=1 la respuesta incluye un conteo aproximado.
+    """
+    page_size = TAMANO_PAGINA
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.pagina = paginar_por_cursor(
+            queryset,
+            cursor=request.query_params.get(self.cursor_query_param),
+            campo=getattr(view, 'campo_cursor', 'fecha_creacion'),
+            tamano=self.page_size,
+            con_total=request.query_params.get('total') == '1',
+        )
+        return list(self.pagina)
+
+    def _url(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        respuesta = {
+            'next': self._url(self.pagina.cursor_siguiente),
+            'previous': self._url(self.pagina.cursor_anterior),
+            'results': data,
+        }
+        if self.pagina.total is not None:
+            respuesta['count'] = self.pagina.total
+            respuesta['count_es_minimo'] = self.pagina.total_es_minimo
+        return Response(respuesta)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_es_minimo': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
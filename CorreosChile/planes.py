@@ -0,0 +1,55 @@
+"""
+Revisión de planes de consulta.
+
+recorridos_completos(queryset) ejecuta EXPLAIN y devuelve las tablas que el
+plan lee completas, sin usar un índice. Lo usa la suite de CorreosChile/tests.py
+para que un cambio de esquema o de consulta que pierda un índice falle en los
+tests en vez de notarse en producción.
+
+- MySQL: EXPLAIN FORMAT=JSON, tablas con access_type ALL.
+- SQLite: EXPLAIN QUERY PLAN, pasos 'SCAN tabla' sin 'USING INDEX'.
+
+Recorrer un índice completo en orden (para un ORDER BY con LIMIT) no cuenta
+como recorrido completo.
+"""
+import json
+import re
+
+from django.db import connection
+
+_SCAN_SQLITE = re.compile(r'\bSCAN (\w+)(?! USING (?:COVERING )?INDEX)(?:\s|$)')
+
+
+def _tablas_json(nodo, tablas):
+    if isinstance(nodo, dict):
+        tabla = nodo.get('table')
+        if isinstance(tabla, dict) and tabla.get('access_type') == 'ALL':
+            tablas.append(tabla.get('table_name'))
+        for valor in nodo.values():
+            _tablas_json(valor, tablas)
+    elif isinstance(nodo, list):
+        for valor in nodo:
+            _tablas_json(valor, tablas)
+    return tablas
+
+
+def recorridos_completos(queryset):
+    """
+    Returns:
+        Lista de tablas que el plan de la consulta recorre completas
+    """
+    if connection.vendor == 'mysql':
+        return _tablas_json(json.loads(queryset.explain(format='json')), [])
+    if connection.vendor == 'sqlite':
+        return [m.group(1) for m in _SCAN_SQLITE.finditer(queryset.explain()) if m.group(1) != 'CONSTANT']
+    raise NotImplementedError(f'Planes de consulta no soportados para {connection.vendor}')
+
+
+def analizar_tablas(*modelos):
+    """Actualiza las estadísticas de las tablas para que el plan refleje los datos sembrados"""
+    if connection.vendor != 'mysql':
+        return
+    with connection.cursor() as cursor:
+        for modelo in modelos:
+            cursor.execute(f'ANALYZE TABLE {connection.ops.quote_name(modelo._meta.db_table)}')
+            cursor.fetchall()
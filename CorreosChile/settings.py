@@ -53,6 +53,7 @@ INSTALLED_APPS = [
     'conductores',
     'flota',
     'paquetes',
+    'busqueda',
     
     # Frameworks de terceros
     'rest_framework',
@@ -120,6 +121,42 @@ DATABASES = {
 }
 
 
+# Cache
+# Debe ser compartido entre procesos: el límite de intentos de login
+# (usuarios/limite_login.py) y los conteos cacheados se cuentan e invalidan
+# igual para todos los workers. Con CACHE_REDIS_URL se usa Redis (requiere el
+# paquete redis); con CACHE_EN_BASE_DE_DATOS=True, una tabla de MySQL creada con:
+#   python manage.py createcachetable
+# Sin ninguno de los dos queda el cache en memoria de cada proceso, que solo
+# sirve en desarrollo: el chequeo usuarios.E001 detiene el arranque si no se
+# permite con PERMITIR_CACHE_LOCAL (por defecto, solo con DEBUG).
+
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+CACHE_EN_BASE_DE_DATOS = config('CACHE_EN_BASE_DE_DATOS', default=False, cast=bool)
+PERMITIR_CACHE_LOCAL = config('PERMITIR_CACHE_LOCAL', default=DEBUG, cast=bool)
+
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+elif CACHE_EN_BASE_DE_DATOS:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache_compartido',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
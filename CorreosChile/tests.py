@@ -0,0 +1,178 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from busqueda.codigos import filtrar_por_codigo
+from conductores.models import Conductor, RutaConductor, EnvioRuta, IncidenciaConductor
+from envios.models import Envio
+from notificaciones.models import Notificacion
+from notificaciones_mejoradas.models import PlantillaNotificacion, NotificacionProgramada, HistorialNotificacion
+from paquetes.models import TipoPaquete, Remitente, Destinatario, Paquete, HistorialPaquete
+from reclamos.models import Reclamo
+from seguimiento.models import EventoSeguimiento
+from .fechas import filtrar_por_fechas, parsear_limite, rango_fechas
+from .planes import recorridos_completos, analizar_tablas
+
+CANTIDAD_ENVIOS = 300
+
+
+class PlanesConsultaTest(TestCase):
+    """Las consultas de los listados y filtros más usados no deben recorrer tablas completas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ahora = timezone.now()
+        cls.usuarios = [User.objects.create_user(username=f'cliente{i}') for i in range(3)]
+        estados = [e for e, _ in Envio.ESTADOS]
+
+        # bulk_create: sin signals, y en MySQL sin ids, por eso se vuelven a leer
+        Envio.objects.bulk_create([
+            Envio(codigo=f'PLAN{i:05d}', estado=estados[i % len(estados)], origen='Santiago', destino='Temuco',
+                  destinatario_nombre=f'Cliente {i}', direccion_destino='Calle 1', usuario=cls.usuarios[i % 3])
+            for i in range(CANTIDAD_ENVIOS)
+        ])
+        envios = list(Envio.objects.order_by('pk'))
+        cls.envio = envios[0]
+        EventoSeguimiento.objects.bulk_create([
+            EventoSeguimiento(envio=envio, estado='en_transito', ubicacion='Centro de distribución')
+            for envio in envios for _ in range(2)
+        ])
+        Notificacion.objects.bulk_create([
+            Notificacion(titulo='Envío en tránsito', mensaje='...', usuario=envio.usuario, envio=envio, leida=i % 4 == 0)
+            for i, envio in enumerate(envios)
+        ])
+
+        plantilla = PlantillaNotificacion.objects.create(nombre='Tránsito', tipo='envio_en_transito')
+        NotificacionProgramada.objects.bulk_create([
+            NotificacionProgramada(envio=envio, plantilla=plantilla, destinatario=envio.usuario,
+                                   fecha_programada=ahora + timedelta(hours=i % 48 - 24), canal_programado='email',
+                                   estado='pendiente' if i % 3 else 'enviada')
+            for i, envio in enumerate(envios)
+        ])
+
+        cls.conductor = conductor = Conductor.objects.create(
+            usuario=User.objects.create_user(username='conductor'), licencia_conducir='LIC-1',
+            fecha_vencimiento_licencia=timezone.localdate() + timedelta(days=365),
+        )
+        RutaConductor.objects.bulk_create([
+            RutaConductor(conductor=conductor, nombre_ruta=f'Ruta {i}', fecha=timezone.localdate() - timedelta(days=i))
+            for i in range(10)
+        ])
+        rutas = list(RutaConductor.objects.order_by('pk'))
+        cls.ruta = rutas[0]
+        EnvioRuta.objects.bulk_create([
+            EnvioRuta(ruta=rutas[i % len(rutas)], envio=envio, orden_entrega=i // len(rutas) + 1,
+                      estado='pendiente' if i % 2 else 'entregado')
+            for i, envio in enumerate(envios)
+        ])
+
+        remitente = Remitente.objects.create(numero_documento='11111111-1', nombre_completo='Tienda', email='t@t.cl',
+                                             telefono='+56911111111', direccion='Calle 1', comuna='Santiago', region='RM')
+        destinatario = Destinatario.objects.create(numero_documento='22222222-2', nombre_completo='Cliente',
+                                                   email='c@c.cl', telefono='+56922222222', direccion='Calle 2',
+                                                   comuna='Ñuñoa', region='RM')
+        tipo = TipoPaquete.objects.create(nombre='sobre')
+        Paquete.objects.bulk_create([
+            Paquete(codigo_seguimiento=f'CC{i:012d}', tipo_paquete=tipo, remitente=remitente, destinatario=destinatario,
+                    peso_kg=Decimal('1.00'), descripcion_contenido='Documentos')
+            for i in range(CANTIDAD_ENVIOS)
+        ])
+        paquetes = list(Paquete.objects.order_by('pk'))
+        cls.paquete = paquetes[0]
+        HistorialPaquete.objects.bulk_create([
+            HistorialPaquete(paquete=paquete, estado_anterior='registrado', estado_nuevo='en_almacen')
+            for paquete in paquetes for _ in range(2)
+        ])
+
+        analizar_tablas(Envio, EventoSeguimiento, Notificacion, NotificacionProgramada, EnvioRuta, Paquete,
+                        HistorialPaquete)
+
+    def consultas(self):
+        usuario = self.usuarios[0]
+        hoy = timezone.localdate()
+        return {
+            'envios del cliente por estado': Envio.objects.filter(usuario=usuario, estado='pendiente').order_by('-creado_en'),
+            'eventos de un envío': EventoSeguimiento.objects.filter(envio=self.envio).order_by('-registrado_en'),
+            'historial de un paquete': HistorialPaquete.objects.filter(paquete=self.paquete).order_by('-fecha_cambio'),
+            'notificaciones programadas vencidas': NotificacionProgramada.objects.filter(
+                estado='pendiente', fecha_programada__lte=timezone.now()
+            ),
+            'notificaciones no leídas': Notificacion.objects.filter(usuario=usuario, leida=False).order_by('-creado_en'),
+            'paradas pendientes de una ruta': EnvioRuta.objects.filter(
+                ruta=self.ruta, estado__in=['pendiente', 'en_camino']
+            ).order_by('orden_entrega'),
+            'página de paquetes': Paquete.objects.order_by('-fecha_creacion', '-pk')[:21],
+            'código parcial': filtrar_por_codigo(Envio.objects.all(), 'envio', '0042'),
+            'página de envíos': Envio.objects.order_by('-creado_en', '-pk')[:11],
+            'envíos por fecha': filtrar_por_fechas(Envio.objects.all(), 'creado_en', hoy, hoy),
+            'eventos por fecha': filtrar_por_fechas(EventoSeguimiento.objects.all(), 'registrado_en', hoy, hoy),
+            'reclamos por fecha': filtrar_por_fechas(Reclamo.objects.all(), 'creado_en', hoy, hoy),
+            'notificaciones enviadas hoy': filtrar_por_fechas(HistorialNotificacion.objects.all(), 'fecha_envio', hoy, hoy),
+            'incidencias del conductor hoy': filtrar_por_fechas(
+                IncidenciaConductor.objects.filter(conductor=self.conductor), 'fecha_reporte', hoy, hoy
+            ).order_by('-fecha_reporte'),
+        }
+
+    def test_sin_recorridos_completos(self):
+        for nombre, queryset in self.consultas().items():
+            with self.subTest(nombre):
+                self.assertEqual(recorridos_completos(queryset), [], queryset.explain())
+
+    def test_detecta_recorrido_completo(self):
+        # destino no tiene índice: asegura que la revisión de planes no pasa en falso
+        self.assertEqual(recorridos_completos(Envio.objects.filter(destino='Temuco')), [Envio._meta.db_table])
+
+    def test_lookup_date_recorre_la_tabla(self):
+        # Lo que reemplaza filtrar_por_fechas: convertir la columna impide usar el índice
+        consulta = Envio.objects.filter(creado_en__date__gte=timezone.localdate())
+        self.assertEqual(recorridos_completos(consulta), [Envio._meta.db_table])
+
+
+class RangoFechasTest(TestCase):
+    def test_rango_semiabierto_en_hora_local(self):
+        inicio, fin = rango_fechas('2025-01-10', '2025-01-12')
+        self.assertEqual(timezone.localtime(inicio).replace(tzinfo=None), datetime(2025, 1, 10))
+        self.assertEqual(timezone.localtime(fin).replace(tzinfo=None), datetime(2025, 1, 13))
+        # Horario de verano en Santiago: UTC-3
+        self.assertEqual(inicio.utcoffset(), timedelta(hours=-3))
+
+    def test_dias_de_cambio_de_horario(self):
+        # 2024-09-08: no existe la medianoche, el día empieza a la 01:00 y dura 23 horas
+        inicio, fin = rango_fechas('2024-09-08', '2024-09-08')
+        self.assertEqual(timezone.localtime(inicio).hour, 1)
+        self.assertEqual(fin.timestamp() - inicio.timestamp(), 23 * 3600)
+        # 2024-04-06: la hora 23 se repite, el día dura 25 horas
+        inicio, fin = rango_fechas(date(2024, 4, 6), date(2024, 4, 6))
+        self.assertEqual(fin.timestamp() - inicio.timestamp(), 25 * 3600)
+
+    def test_fechas_vacias_o_invalidas_no_filtran(self):
+        self.assertEqual(rango_fechas('', None), (None, None))
+        self.assertEqual(rango_fechas('10/01/2025', '2025-02-30'), (None, None))
+
+    def test_fecha_con_hora_es_un_instante(self):
+        inicio, fin = rango_fechas('2025-01-10T08:00:00', '2025-01-10 18:30:00-03:00')
+        self.assertEqual(timezone.localtime(inicio).replace(tzinfo=None), datetime(2025, 1, 10, 8))
+        # El instante de 'hasta' queda incluido
+        self.assertEqual(fin - timedelta(microseconds=1), datetime(2025, 1, 10, 21, 30, tzinfo=dt_timezone.utc))
+        with self.assertRaises(ValueError):
+            parsear_limite('2025-01-10T25:00:00')
+
+    def test_hasta_incluye_el_dia_completo(self):
+        usuario = User.objects.create_user(username='cliente')
+        local = timezone.get_current_timezone()
+        horas = {
+            'ANTES': datetime(2025, 1, 9, 23, 59, tzinfo=local),
+            'INICIO': datetime(2025, 1, 10, 0, 0, tzinfo=local),
+            'FINAL': datetime(2025, 1, 10, 23, 59, 59, tzinfo=local),
+            'DESPUES': datetime(2025, 1, 11, 0, 0, tzinfo=local),
+        }
+        for codigo, hora in horas.items():
+            envio = Envio.objects.create(codigo=codigo, origen='Santiago', destino='Temuco', destinatario_nombre='X',
+                                         direccion_destino='Calle 1', usuario=usuario)
+            Envio.objects.filter(pk=envio.pk).update(creado_en=hora)
+
+        envios = filtrar_por_fechas(Envio.objects.all(), 'creado_en', '2025-01-10', '2025-01-10')
+        self.assertEqual(sorted(envios.values_list('codigo', flat=True)), ['FINAL', 'INICIO'])
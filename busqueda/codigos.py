@@ -0,0 +1,141 @@
+"""
+Búsqueda parcial de códigos de seguimiento y de barras.
+
+En el mesón muchas veces solo se tienen los últimos dígitos de la etiqueta,
+y un LIKE '%1234' recorre toda la tabla. Cada código se descompone en
+trigramas (FragmentoCodigo): los objetos candidatos son los que tienen todos
+los trigramas de lo buscado, lo que se resuelve con el índice
+(tipo, fragmento). Sobre esos pocos candidatos se confirma por clave primaria
+que el código empiece, termine o contenga el texto, así los trigramas en otro
+orden no dan falsos positivos.
+
+El índice solo agrega filas (ignorando las que ya existen): un código que
+cambia deja trigramas viejos que la confirmación descarta, y el comando
+reindexar_busqueda los limpia.
+"""
+from django.db.models import Count, Q
+
+from .models import FragmentoCodigo
+
+LARGO_FRAGMENTO = 3
+
+MODOS = {
+    'contiene': 'icontains',
+    'prefijo': 'istartswith',
+    'sufijo': 'iendswith',
+}
+
+
+def _envios():
+    from envios.models import Envio
+    return Envio.objects.all()
+
+
+def _paquetes():
+    from paquetes.models import Paquete
+    return Paquete.objects.all()
+
+
+def _codigos_envios(envios):
+    from envios.models import Bulto
+    codigos = {envio.pk: [envio.codigo] for envio in envios}
+    filas = Bulto.objects.filter(envio_id__in=codigos).values_list('envio_id', 'codigo_barras')
+    for envio_id, codigo_barras in filas:
+        codigos[envio_id].append(codigo_barras)
+    return codigos
+
+
+def _codigos_paquetes(paquetes):
+    return {p.pk: [p.codigo_seguimiento, p.codigo_barras] for p in paquetes}
+
+
+# tipo -> (queryset base, campos de código propios, función de códigos por objeto)
+FUENTES_CODIGO = {
+    'envio': (_envios, ('codigo',), _codigos_envios),
+    'paquete': (_paquetes, ('codigo_seguimiento', 'codigo_barras'), _codigos_paquetes),
+}
+
+
+def fragmentos(codigo):
+    codigo = (codigo or '').strip().upper()
+    return {codigo[i:i + LARGO_FRAGMENTO] for i in range(len(codigo) - LARGO_FRAGMENTO + 1)}
+
+
+def indexar_codigos(tipo, objeto_id, codigos):
+    """Agrega los trigramas de los códigos al objeto (una sola consulta)"""
+    nuevos = set()
+    for codigo in codigos:
+        nuevos |= fragmentos(codigo)
+    if nuevos:
+        FragmentoCodigo.objects.bulk_create(
+            [FragmentoCodigo(tipo=tipo, fragmento=f, objeto_id=objeto_id) for f in nuevos],
+            ignore_conflicts=True,
+        )
+
+
+def desindexar_codigos(tipo, objeto_id):
+    FragmentoCodigo.objects.filter(tipo=tipo, objeto_id=objeto_id).delete()
+
+
+def reindexar_codigos(tipo, tamano_lote=500):
+    """Reconstruye los trigramas de un tipo; devuelve los objetos indexados"""
+    base, _, codigos_por_objeto = FUENTES_CODIGO[tipo]
+    FragmentoCodigo.objects.filter(tipo=tipo).delete()
+    total = 0
+    lote = []
+    objetos = base().order_by('pk').iterator(chunk_size=tamano_lote)
+    for objeto in objetos:
+        lote.append(objeto)
+        if len(lote) == tamano_lote:
+            total += _guardar_lote(tipo, codigos_por_objeto(lote))
+            lote = []
+    if lote:
+        total += _guardar_lote(tipo, codigos_por_objeto(lote))
+    return total
+
+
+def _guardar_lote(tipo, codigos):
+    filas = [
+        FragmentoCodigo(tipo=tipo, fragmento=f, objeto_id=objeto_id)
+        for objeto_id, lista in codigos.items()
+        for f in set().union(*(fragmentos(c) for c in lista))
+    ]
+    FragmentoCodigo.objects.bulk_create(filas, batch_size=1000, ignore_conflicts=True)
+    return len(codigos)
+
+
+def _candidatos(tipo, texto):
+    buscados = fragmentos(texto)
+    return (
+        FragmentoCodigo.objects
+        .filter(tipo=tipo, fragmento__in=buscados)
+        .values('objeto_id')
+        .annotate(encontrados=Count('fragmento'))
+        .filter(encontrados=len(buscados))
+        .values('objeto_id')
+    )
+
+
+def filtrar_por_codigo(queryset, tipo, texto, modo='contiene'):
+    """
+    Restringe el queryset a los objetos con un código que empieza, termina o
+    contiene el texto (modo 'prefijo', 'sufijo' o 'contiene').
+
+    Con menos de tres caracteres solo se acepta el código completo.
+    """
+    texto = (texto or '').strip()
+    lookup = MODOS.get(modo, MODOS['contiene'])
+    _, campos, _ = FUENTES_CODIGO[tipo]
+    if len(texto) < LARGO_FRAGMENTO:
+        return queryset.filter(**{f'{campos[0]}__iexact': texto}) if texto else queryset.none()
+
+    candidatos = _candidatos(tipo, texto)
+    coincide = Q()
+    for campo in campos:
+        coincide |= Q(**{f'{campo}__{lookup}': texto})
+    if tipo == 'envio':
+        from envios.models import Bulto
+        coincide |= Q(pk__in=Bulto.objects.filter(
+            envio_id__in=candidatos, **{f'codigo_barras__{lookup}': texto}
+        ).values('envio_id'))
+    return queryset.filter(pk__in=candidatos).filter(coincide)
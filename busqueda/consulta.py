@@ -0,0 +1,113 @@
+"""
+Búsqueda de envíos, paquetes y reclamos.
+
+La consulta se interpreta así:
+
+- Una sola palabra con forma de código (letras, dígitos y guiones, con al
+  menos un dígito) se busca primero tal cual en el campo único del modelo
+  (codigo, codigo_seguimiento o numero). Si existe, es el único resultado.
+- Si no existe, se busca como parte de un código de seguimiento o de barras
+  en el índice de trigramas (ver codigos.py), los más nuevos primero.
+- Si tampoco, cada término se busca como prefijo en el índice invertido y se
+  exige que estén todos. Los resultados se ordenan por la suma de pesos de
+  los términos encontrados y, a igual puntaje, los más nuevos primero.
+
+buscar_objetos devuelve los resultados ordenados por relevancia (buscador);
+filtrar_busqueda restringe un queryset a las coincidencias y conserva su
+orden (listados con filtros y paginación).
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, Q, Sum
+
+from .codigos import FUENTES_CODIGO, filtrar_por_codigo
+from .indice import FUENTES, terminos
+from .models import TerminoBusqueda
+
+MAX_RESULTADOS = 200
+
+CAMPO_CODIGO = {
+    'envio': 'codigo',
+    'paquete': 'codigo_seguimiento',
+    'reclamo': 'numero',
+}
+
+_FORMA_CODIGO = re.compile(r'^(?=.*\d)[A-Za-z0-9-]{4,50}$')
+
+
+def interpretar(texto):
+    """
+    Returns:
+        (codigo, terminos): codigo es None si la consulta no parece un código
+    """
+    texto = (texto or '').strip()
+    codigo = texto if _FORMA_CODIGO.match(texto) else None
+    # Sin repetir y conservando el orden
+    return codigo, list(dict.fromkeys(terminos(texto)))
+
+
+def _id_por_codigo(tipo, codigo, queryset):
+    if codigo is None:
+        return None
+    return queryset.filter(**{CAMPO_CODIGO[tipo]: codigo}).values_list('pk', flat=True).first()
+
+
+def _coincidencias(tipo, lista_terminos):
+    """objeto_id con puntaje de los objetos que tienen todos los términos"""
+    condiciones = [Q(termino__startswith=t) for t in lista_terminos]
+    por_termino = {f'c{i}': Count('id', filter=c) for i, c in enumerate(condiciones)}
+    return (
+        TerminoBusqueda.objects
+        .filter(tipo=tipo)
+        .filter(reduce(or_, condiciones))
+        .values('objeto_id')
+        .annotate(puntaje=Sum('peso'), **por_termino)
+        .filter(**{f'{nombre}__gt': 0 for nombre in por_termino})
+    )
+
+
+def buscar(tipo, texto, limite=MAX_RESULTADOS, queryset=None):
+    """
+    Returns:
+        Lista de (objeto_id, puntaje) ordenada por relevancia
+    """
+    if queryset is None:
+        queryset = FUENTES[tipo][0]()
+    codigo, lista_terminos = interpretar(texto)
+    pk = _id_por_codigo(tipo, codigo, queryset)
+    if pk is not None:
+        return [(pk, None)]
+    if codigo and tipo in FUENTES_CODIGO:
+        pks = list(filtrar_por_codigo(queryset, tipo, codigo).order_by('-pk').values_list('pk', flat=True)[:limite])
+        if pks:
+            return [(pk, None) for pk in pks]
+    if not lista_terminos:
+        return []
+    filas = _coincidencias(tipo, lista_terminos).order_by('-puntaje', '-objeto_id')[:limite]
+    return [(f['objeto_id'], f['puntaje']) for f in filas]
+
+
+def buscar_objetos(tipo, texto, queryset=None, limite=MAX_RESULTADOS):
+    """Objetos que coinciden con la consulta, los más relevantes primero"""
+    if queryset is None:
+        queryset = FUENTES[tipo][0]()
+    ranking = buscar(tipo, texto, limite=limite, queryset=queryset)
+    objetos = queryset.in_bulk([pk for pk, _ in ranking])
+    return [objetos[pk] for pk, _ in ranking if pk in objetos]
+
+
+def filtrar_busqueda(queryset, tipo, texto):
+    """Restringe el queryset a los objetos que coinciden con la consulta"""
+    codigo, lista_terminos = interpretar(texto)
+    pk = _id_por_codigo(tipo, codigo, queryset)
+    if pk is not None:
+        return queryset.filter(pk=pk)
+    if codigo and tipo in FUENTES_CODIGO:
+        por_codigo = filtrar_por_codigo(queryset, tipo, codigo)
+        if por_codigo.exists():
+            return por_codigo
+    if not lista_terminos:
+        return queryset.none()
+    return queryset.filter(pk__in=_coincidencias(tipo, lista_terminos).values('objeto_id'))
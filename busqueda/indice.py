@@ -0,0 +1,165 @@
+"""
+Mantenimiento del índice invertido de búsqueda.
+
+Cada envío, paquete o reclamo se descompone en términos normalizados
+(minúsculas, sin tildes, solo letras y dígitos) y se guarda una fila por
+término en TerminoBusqueda con un peso según el campo: un término del código
+pesa más que uno de la descripción. La búsqueda resuelve con el índice
+(tipo, termino) en vez de recorrer la tabla con LIKE '%q%'.
+
+Los campos de cada tipo se declaran en FUENTES. Un objeto se reindexa
+completo al guardarse (borrar sus filas y volver a insertarlas), que son unas
+pocas decenas de filas.
+"""
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import transaction
+
+from .models import TerminoBusqueda
+
+LARGO_MINIMO = 2
+LARGO_MAXIMO = 40
+TAMANO_LOTE = 500
+
+PALABRAS_VACIAS = {
+    'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'para', 'por', 'se', 'su', 'un', 'una', 'y',
+}
+
+
+def _envios():
+    from envios.models import Envio
+    return Envio.objects.all()
+
+
+def _paquetes():
+    from paquetes.models import Paquete
+    return Paquete.objects.select_related('remitente', 'destinatario')
+
+
+def _reclamos():
+    from reclamos.models import Reclamo
+    return Reclamo.objects.select_related('envio')
+
+
+# tipo -> (queryset base, [(atributo, peso)]); los atributos admiten '__' para relaciones
+FUENTES = {
+    'envio': (_envios, [
+        ('codigo', 5),
+        ('destinatario_nombre', 3),
+        ('direccion_destino', 1),
+        ('origen', 1),
+        ('destino', 1),
+    ]),
+    'paquete': (_paquetes, [
+        ('codigo_seguimiento', 5),
+        ('codigo_barras', 5),
+        ('remitente__nombre_completo', 3),
+        ('remitente__numero_documento', 3),
+        ('destinatario__nombre_completo', 3),
+        ('destinatario__email', 2),
+        ('descripcion_contenido', 1),
+        ('ubicacion_actual', 1),
+    ]),
+    'reclamo': (_reclamos, [
+        ('numero', 5),
+        ('envio__codigo', 3),
+        ('descripcion', 1),
+        ('respuesta', 1),
+    ]),
+}
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Peñalolén' -> 'penalolen'"""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).lower()
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def terminos(texto):
+    """Términos indexables de un texto, en orden y con repeticiones"""
+    return [
+        t[:LARGO_MAXIMO] for t in re.findall(r'[a-z0-9]+', normalizar(texto))
+        if len(t) >= LARGO_MINIMO and t not in PALABRAS_VACIAS
+    ]
+
+
+def _valor(objeto, atributo):
+    for parte in atributo.split('__'):
+        objeto = getattr(objeto, parte, None)
+        if objeto is None:
+            return ''
+    return objeto
+
+
+def campos_indexados(tipo):
+    """Nombres de campo propios del modelo que alimentan el índice"""
+    return {atributo.split('__')[0] for atributo, _ in FUENTES[tipo][1]}
+
+
+def terminos_de(tipo, objeto):
+    """Counter término -> peso de un objeto"""
+    pesos = Counter()
+    for atributo, peso in FUENTES[tipo][1]:
+        for termino in terminos(_valor(objeto, atributo)):
+            pesos[termino] += peso
+    return pesos
+
+
+def _filas(tipo, objeto):
+    return [
+        TerminoBusqueda(tipo=tipo, termino=termino, objeto_id=objeto.pk, peso=min(peso, 32767))
+        for termino, peso in terminos_de(tipo, objeto).items()
+    ]
+
+
+def indexar(tipo, objeto, nuevo=False):
+    if nuevo:
+        # Un objeto recién creado no tiene filas que reemplazar
+        TerminoBusqueda.objects.bulk_create(_filas(tipo, objeto))
+        return
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(tipo=tipo, objeto_id=objeto.pk).delete()
+        TerminoBusqueda.objects.bulk_create(_filas(tipo, objeto))
+
+
+def desindexar(tipo, pk):
+    TerminoBusqueda.objects.filter(tipo=tipo, objeto_id=pk).delete()
+
+
+def reindexar(tipo, queryset=None):
+    """
+    Reconstruye el índice de un tipo (o solo de los objetos del queryset).
+
+    Returns:
+        Cantidad de objetos indexados
+    """
+    if queryset is None:
+        queryset = FUENTES[tipo][0]()
+        TerminoBusqueda.objects.filter(tipo=tipo).delete()
+        completo = True
+    else:
+        completo = False
+
+    total = 0
+    lote = []
+    for objeto in queryset.order_by('pk').iterator(chunk_size=TAMANO_LOTE):
+        lote.append(objeto)
+        if len(lote) == TAMANO_LOTE:
+            _guardar_lote(tipo, lote, completo)
+            total += len(lote)
+            lote = []
+    if lote:
+        _guardar_lote(tipo, lote, completo)
+        total += len(lote)
+    return total
+
+
+def _guardar_lote(tipo, objetos, completo):
+    with transaction.atomic():
+        if not completo:
+            TerminoBusqueda.objects.filter(tipo=tipo, objeto_id__in=[o.pk for o in objetos]).delete()
+        TerminoBusqueda.objects.bulk_create(
+            [fila for objeto in objetos for fila in _filas(tipo, objeto)], batch_size=1000
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from busqueda.codigos import FUENTES_CODIGO, reindexar_codigos
+from busqueda.indice import FUENTES, reindexar
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los índices de búsqueda de texto y de códigos de envíos, paquetes y reclamos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', action='append', help='envio, paquete o reclamo (por defecto todos)')
+
+    def handle(self, *args, **options):
+        tipos = options['tipo'] or list(FUENTES)
+        desconocidos = set(tipos) - set(FUENTES)
+        if desconocidos:
+            raise CommandError(f'Tipo no válido: {", ".join(sorted(desconocidos))}')
+
+        for tipo in tipos:
+            total = reindexar(tipo)
+            self.stdout.write(self.style.SUCCESS(f'{tipo}: {total} indexados'))
+            if tipo in FUENTES_CODIGO:
+                total = reindexar_codigos(tipo)
+                self.stdout.write(self.style.SUCCESS(f'{tipo}: {total} con códigos indexados'))
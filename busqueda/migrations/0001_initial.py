@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('envio', 'Envío'), ('paquete', 'Paquete'), ('reclamo', 'Reclamo')], max_length=10)),
+                ('termino', models.CharField(max_length=40)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+            ],
+            options={
+                'verbose_name': 'Término de búsqueda',
+                'verbose_name_plural': 'Términos de búsqueda',
+                'indexes': [models.Index(fields=['tipo', 'objeto_id'], name='busqueda_te_tipo_35b087_idx')],
+                'unique_together': {('tipo', 'termino', 'objeto_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('busqueda', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FragmentoCodigo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('envio', 'Envío'), ('paquete', 'Paquete')], max_length=10)),
+                ('fragmento', models.CharField(max_length=3)),
+                ('objeto_id', models.PositiveBigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Fragmento de código',
+                'verbose_name_plural': 'Fragmentos de código',
+                'indexes': [models.Index(fields=['tipo', 'objeto_id'], name='busqueda_fr_tipo_886b98_idx')],
+                'unique_together': {('tipo', 'fragmento', 'objeto_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+from busqueda.codigos import fragmentos
+from busqueda.indice import terminos_de
+
+TAMANO_LOTE = 500
+
+# tipo -> (app, modelo, relaciones que lee FUENTES)
+MODELOS = {
+    'envio': ('envios', 'Envio', ()),
+    'paquete': ('paquetes', 'Paquete', ('remitente', 'destinatario')),
+    'reclamo': ('reclamos', 'Reclamo', ('envio',)),
+}
+
+
+def _por_lotes(queryset):
+    lote = []
+    for objeto in queryset.order_by('pk').iterator(chunk_size=TAMANO_LOTE):
+        lote.append(objeto)
+        if len(lote) == TAMANO_LOTE:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def poblar_indices(apps, schema_editor):
+    """
+    Indexa los envíos, paquetes y reclamos que ya existían: las señales solo
+    indexan lo que se guarda después, y sin esto las búsquedas no encuentran
+    los registros antiguos hasta correr reindexar_busqueda.
+    """
+    TerminoBusqueda = apps.get_model('busqueda', 'TerminoBusqueda')
+    FragmentoCodigo = apps.get_model('busqueda', 'FragmentoCodigo')
+    Bulto = apps.get_model('envios', 'Bulto')
+
+    for tipo, (app, nombre, relaciones) in MODELOS.items():
+        queryset = apps.get_model(app, nombre).objects.select_related(*relaciones)
+        for lote in _por_lotes(queryset):
+            TerminoBusqueda.objects.bulk_create([
+                TerminoBusqueda(tipo=tipo, termino=termino, objeto_id=objeto.pk, peso=min(peso, 32767))
+                for objeto in lote
+                for termino, peso in terminos_de(tipo, objeto).items()
+            ], batch_size=1000, ignore_conflicts=True)
+
+            if tipo == 'envio':
+                codigos = {envio.pk: [envio.codigo] for envio in lote}
+                for envio_id, codigo_barras in Bulto.objects.filter(envio_id__in=codigos).values_list(
+                    'envio_id', 'codigo_barras'
+                ):
+                    codigos[envio_id].append(codigo_barras)
+            elif tipo == 'paquete':
+                codigos = {p.pk: [p.codigo_seguimiento, p.codigo_barras] for p in lote}
+            else:
+                continue
+            FragmentoCodigo.objects.bulk_create([
+                FragmentoCodigo(tipo=tipo, fragmento=fragmento, objeto_id=objeto_id)
+                for objeto_id, lista in codigos.items()
+                for fragmento in set().union(*(fragmentos(c) for c in lista))
+            ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('busqueda', '0002_fragmentocodigo'),
+        ('envios', '0006_indices_fechas'),
+        ('paquetes', '0002_indices_compuestos'),
+        ('reclamos', '0002_indices_fechas'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_indices, migrations.RunPython.noop, elidable=True),
+    ]
@@ -0,0 +1,57 @@
+from django.db import models
+
+
+class TerminoBusqueda(models.Model):
+    """
+    Índice invertido para la búsqueda de texto: una fila por término
+    normalizado de cada envío, paquete o reclamo. Se mantiene desde signals.py.
+    """
+    TIPOS = (
+        ('envio', 'Envío'),
+        ('paquete', 'Paquete'),
+        ('reclamo', 'Reclamo'),
+    )
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    termino = models.CharField(max_length=40)
+    objeto_id = models.PositiveBigIntegerField()
+    # Veces que aparece el término, ponderado por la importancia del campo
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        verbose_name = 'Término de búsqueda'
+        verbose_name_plural = 'Términos de búsqueda'
+        unique_together = ('tipo', 'termino', 'objeto_id')
+        indexes = [
+            models.Index(fields=['tipo', 'objeto_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.tipo}:{self.objeto_id} {self.termino}'
+
+
+class FragmentoCodigo(models.Model):
+    """
+    Trigramas de los códigos de seguimiento y de barras, para buscar un
+    código por su comienzo, su final o cualquier parte. Los de los bultos se
+    guardan con el id del envío.
+    """
+    TIPOS = (
+        ('envio', 'Envío'),
+        ('paquete', 'Paquete'),
+    )
+
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    fragmento = models.CharField(max_length=3)
+    objeto_id = models.PositiveBigIntegerField()
+
+    class Meta:
+        verbose_name = 'Fragmento de código'
+        verbose_name_plural = 'Fragmentos de código'
+        unique_together = ('tipo', 'fragmento', 'objeto_id')
+        indexes = [
+            models.Index(fields=['tipo', 'objeto_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.tipo}:{self.objeto_id} {self.fragmento}'
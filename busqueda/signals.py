@@ -0,0 +1,67 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from envios.models import Envio, Bulto
+from paquetes.models import Paquete, Remitente, Destinatario
+from reclamos.models import Reclamo
+from .codigos import FUENTES_CODIGO, indexar_codigos, desindexar_codigos
+from .indice import campos_indexados, indexar, desindexar, reindexar
+
+TIPO_POR_MODELO = {
+    Envio: 'envio',
+    Paquete: 'paquete',
+    Reclamo: 'reclamo',
+}
+
+
+def _reindexar_objeto(sender, instance, created=False, update_fields=None, **kwargs):
+    tipo = TIPO_POR_MODELO[sender]
+    # Las actualizaciones de estado o ETA no tocan el texto indexado
+    if update_fields and not (set(update_fields) & campos_indexados(tipo)):
+        return
+    indexar(tipo, instance, nuevo=created)
+
+
+def _quitar_objeto(sender, instance, **kwargs):
+    desindexar(TIPO_POR_MODELO[sender], instance.pk)
+
+
+def _indexar_codigos_objeto(sender, instance, update_fields=None, **kwargs):
+    tipo = TIPO_POR_MODELO[sender]
+    campos = FUENTES_CODIGO[tipo][1]
+    if update_fields and not (set(update_fields) & set(campos)):
+        return
+    indexar_codigos(tipo, instance.pk, [getattr(instance, campo) for campo in campos])
+
+
+def _quitar_codigos_objeto(sender, instance, **kwargs):
+    desindexar_codigos(TIPO_POR_MODELO[sender], instance.pk)
+
+
+for modelo in TIPO_POR_MODELO:
+    post_save.connect(_reindexar_objeto, sender=modelo, dispatch_uid=f'busqueda_indexar_{modelo.__name__}')
+    post_delete.connect(_quitar_objeto, sender=modelo, dispatch_uid=f'busqueda_desindexar_{modelo.__name__}')
+
+for modelo in (Envio, Paquete):
+    post_save.connect(_indexar_codigos_objeto, sender=modelo, dispatch_uid=f'busqueda_codigos_{modelo.__name__}')
+    post_delete.connect(_quitar_codigos_objeto, sender=modelo, dispatch_uid=f'busqueda_quitar_codigos_{modelo.__name__}')
+
+
+@receiver(post_save, sender=Bulto)
+def indexar_codigo_bulto(sender, instance, update_fields=None, **kwargs):
+    # Los bultos se buscan por su envío; bulk_create debe llamar a indexar_codigos
+    if update_fields and 'codigo_barras' not in update_fields:
+        return
+    indexar_codigos('envio', instance.envio_id, [instance.codigo_barras])
+
+
+@receiver(post_save, sender=Remitente)
+def reindexar_paquetes_remitente(sender, instance, created, **kwargs):
+    if not created:
+        reindexar('paquete', Paquete.objects.select_related('remitente', 'destinatario').filter(remitente=instance))
+
+
+@receiver(post_save, sender=Destinatario)
+def reindexar_paquetes_destinatario(sender, instance, created, **kwargs):
+    if not created:
+        reindexar('paquete', Paquete.objects.select_related('remitente', 'destinatario').filter(destinatario=instance))
@@ -0,0 +1,131 @@
+from decimal import Decimal
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from envios.models import Envio, Bulto
+from paquetes.models import TipoPaquete, Remitente, Destinatario, Paquete
+from reclamos.models import Reclamo
+from .codigos import filtrar_por_codigo
+from .consulta import buscar, buscar_objetos, filtrar_busqueda, interpretar
+from .indice import terminos
+from .models import TerminoBusqueda, FragmentoCodigo
+
+
+class BusquedaTest(TestCase):
+    def setUp(self):
+        self.e1 = Envio.objects.create(codigo='ENV2024001', origen='Santiago', destino='Peñalolén',
+                                       destinatario_nombre='María González', direccion_destino='Av. Grecia 1234')
+        self.e2 = Envio.objects.create(codigo='ENV2024002', origen='Concepción', destino='Santiago',
+                                       destinatario_nombre='Pedro Soto', direccion_destino='Calle González 55')
+        self.e3 = Envio.objects.create(codigo='ENV2024003', origen='Valparaíso', destino='Viña del Mar',
+                                       destinatario_nombre='Ana Rojas', direccion_destino='Los Álamos 9')
+
+    def test_normaliza_terminos(self):
+        self.assertEqual(terminos('María de los Ángeles, Peñalolén!'), ['maria', 'angeles', 'penalolen'])
+        self.assertEqual(interpretar('ENV2024001'), ('ENV2024001', ['env2024001']))
+        self.assertEqual(interpretar('maria gonzalez')[0], None)
+
+    def test_codigo_exacto_usa_el_campo_unico(self):
+        self.assertEqual(buscar('envio', 'ENV2024002'), [(self.e2.pk, None)])
+
+    def test_texto_libre_exige_todos_los_terminos_y_ordena_por_relevancia(self):
+        # El nombre del destinatario pesa más que la dirección
+        self.assertEqual([pk for pk, _ in buscar('envio', 'gonzalez')], [self.e1.pk, self.e2.pk])
+        self.assertEqual([pk for pk, _ in buscar('envio', 'gonz santiago')], [self.e1.pk, self.e2.pk])
+        self.assertEqual([pk for pk, _ in buscar('envio', 'maria penal')], [self.e1.pk])
+        self.assertEqual(buscar('envio', 'gonzalez valparaiso'), [])
+
+    def test_filtrar_conserva_el_orden_del_queryset(self):
+        queryset = filtrar_busqueda(Envio.objects.order_by('creado_en', 'id'), 'envio', 'gonzalez')
+        self.assertEqual(list(queryset), [self.e1, self.e2])
+        self.assertEqual(list(filtrar_busqueda(Envio.objects.all(), 'envio', '!!')), [])
+
+    def test_indice_se_actualiza_al_guardar_y_eliminar(self):
+        self.e3.destinatario_nombre = 'Ana González'
+        self.e3.save()
+        self.assertIn(self.e3.pk, [pk for pk, _ in buscar('envio', 'gonzalez')])
+
+        self.e1.delete()
+        self.assertFalse(TerminoBusqueda.objects.filter(tipo='envio', objeto_id=self.e1.pk).exists())
+
+        # Guardar solo campos no indexados no reescribe el índice
+        with CaptureQueriesContext(connection) as consultas:
+            self.e2.estado = 'en_transito'
+            self.e2.save(update_fields=['estado', 'actualizado_en'])
+        self.assertFalse([c for c in consultas if TerminoBusqueda._meta.db_table in c['sql']])
+
+    def test_reclamos_y_paquetes(self):
+        reclamo = Reclamo.objects.create(numero='R-100', descripcion='Caja llegó mojada', envio=self.e1)
+        self.assertEqual([pk for pk, _ in buscar('reclamo', 'env2024001')], [reclamo.pk])
+
+        remitente = Remitente.objects.create(numero_documento='11111111-1', nombre_completo='Tienda Austral',
+                                             email='ventas@austral.cl', telefono='+56911111111',
+                                             direccion='Calle 1', comuna='Santiago', region='RM')
+        destinatario = Destinatario.objects.create(numero_documento='22222222-2', nombre_completo='Juan Pérez',
+                                                   email='juan@correo.cl', telefono='+56922222222',
+                                                   direccion='Calle 2', comuna='Ñuñoa', region='RM')
+        paquete = Paquete.objects.create(
+            tipo_paquete=TipoPaquete.objects.create(nombre='sobre'), remitente=remitente,
+            destinatario=destinatario, peso_kg=Decimal('1.5'), descripcion_contenido='Libros usados',
+        )
+        self.assertEqual(buscar_objetos('paquete', 'austral libros'), [paquete])
+
+        remitente.nombre_completo = 'Librería Patagonia'
+        remitente.save()
+        self.assertEqual(buscar_objetos('paquete', 'patagonia'), [paquete])
+        self.assertEqual(buscar_objetos('paquete', paquete.codigo_seguimiento), [paquete])
+
+    def test_comando_reindexa(self):
+        TerminoBusqueda.objects.all().delete()
+        call_command('reindexar_busqueda', '--tipo', 'envio', stdout=open('/dev/null', 'w'))
+        self.assertEqual([pk for pk, _ in buscar('envio', 'rojas')], [self.e3.pk])
+
+    def test_migracion_indexa_los_registros_existentes(self):
+        migracion = import_module('busqueda.migrations.0003_poblar_indices')
+        Bulto.objects.create(envio=self.e1, codigo_barras='PKG-777-1')
+        TerminoBusqueda.objects.all().delete()
+        FragmentoCodigo.objects.all().delete()
+
+        migracion.poblar_indices(apps, None)
+
+        self.assertEqual([pk for pk, _ in buscar('envio', 'rojas')], [self.e3.pk])
+        self.assertEqual(list(filtrar_por_codigo(Envio.objects.all(), 'envio', '777').values_list('pk', flat=True)),
+                         [self.e1.pk])
+
+
+class BusquedaCodigosTest(TestCase):
+    def setUp(self):
+        self.e1 = Envio.objects.create(codigo='CL-100245', origen='Santiago', destino='Arica',
+                                       destinatario_nombre='Rosa Díaz', direccion_destino='Calle 1')
+        self.e2 = Envio.objects.create(codigo='CL-245100', origen='Santiago', destino='Talca',
+                                       destinatario_nombre='Luis Vera', direccion_destino='Calle 2')
+        Bulto.objects.create(envio=self.e2, codigo_barras='7801234509876')
+
+    def ids(self, texto, modo='contiene'):
+        return sorted(filtrar_por_codigo(Envio.objects.all(), 'envio', texto, modo).values_list('pk', flat=True))
+
+    def test_prefijo_sufijo_y_contiene(self):
+        self.assertEqual(self.ids('245'), [self.e1.pk, self.e2.pk])
+        self.assertEqual(self.ids('0245', 'sufijo'), [self.e1.pk])
+        self.assertEqual(self.ids('cl-2451', 'prefijo'), [self.e2.pk])
+        # El trigrama 100 está en ambos códigos, 002 solo en el primero
+        self.assertEqual(self.ids('1002'), [self.e1.pk])
+        self.assertEqual(self.ids('9876', 'sufijo'), [self.e2.pk])
+        self.assertEqual(self.ids('999'), [])
+
+    def test_ultimos_digitos_en_el_buscador(self):
+        self.assertEqual(buscar('envio', '509876'), [(self.e2.pk, None)])
+        self.assertEqual(list(filtrar_busqueda(Envio.objects.all(), 'envio', '0245')), [self.e1])
+
+    def test_bultos_en_bloque_y_reindexacion(self):
+        FragmentoCodigo.objects.all().delete()
+        Bulto.objects.bulk_create([Bulto(envio=self.e1, codigo_barras='PKG-555-1')])
+        self.assertEqual(self.ids('555'), [])
+        call_command('reindexar_busqueda', '--tipo', 'envio', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.ids('555'), [self.e1.pk])
+        self.assertEqual(self.ids('245100'), [self.e2.pk])
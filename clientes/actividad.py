@@ -0,0 +1,95 @@
+"""
+Registro de actividad de los clientes.
+
+Las vistas del portal no insertan ActividadCliente en el request: la
+actividad pasa por una política por tipo (muestreo y un máximo de un registro
+por ventana de tiempo) y luego se guarda en lote desde un hilo de fondo.
+
+La actividad reciente del dashboard se sirve desde un cache por cliente que
+se actualiza al registrar, así refleja lo último aunque aún no esté en la
+base de datos.
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from CorreosChile.escritura_diferida import BufferEscrituraDiferida
+from .models import ActividadCliente
+
+# tipo -> (fracción que se registra, segundos mínimos entre registros por cliente)
+POLITICAS = {
+    'login': (1.0, 300),
+    'view_envio': (0.25, 30),
+    'descarga_reporte': (1.0, 60),
+}
+POLITICA_POR_DEFECTO = (1.0, 0)
+
+MAX_RECIENTES = 10
+TTL_RECIENTES_S = 600
+
+
+class BufferActividad(BufferEscrituraDiferida):
+    nombre_hilo = 'actividad-clientes'
+
+    def guardar(self, actividades):
+        ActividadCliente.objects.bulk_create(actividades, batch_size=500)
+        return len(actividades)
+
+
+buffer_actividad = BufferActividad(asincrono=getattr(settings, 'ACTIVIDAD_CLIENTES_ASYNC', True))
+
+
+def _clave_recientes(cliente):
+    return f'clientes:actividad:{cliente.pk}'
+
+
+def get_client_ip(request):
+    """Obtener IP del cliente"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR')
+
+
+def registrar_actividad(request, cliente, tipo, descripcion, aplicar_politica=True):
+    """
+    Registra la actividad si la política del tipo lo permite.
+
+    Con aplicar_politica=False se registra siempre (por ejemplo, un login real).
+
+    Returns:
+        True si la actividad quedó encolada
+    """
+    tasa, ventana_s = POLITICAS.get(tipo, POLITICA_POR_DEFECTO) if aplicar_politica else POLITICA_POR_DEFECTO
+    if tasa < 1.0 and random.random() >= tasa:
+        return False
+    # cache.add es atómico: solo el primer registro de la ventana pasa
+    if ventana_s and not cache.add(f'clientes:actividad:limite:{cliente.pk}:{tipo}', 1, ventana_s):
+        return False
+
+    actividad = ActividadCliente(
+        cliente_id=cliente.pk,
+        tipo=tipo,
+        descripcion=descripcion[:255],
+        ip_address=get_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+    )
+    # auto_now_add solo se aplica al guardar; la fecha se fija ahora para el cache
+    actividad.fecha = timezone.now()
+
+    recientes = cache.get(_clave_recientes(cliente))
+    if recientes is not None:
+        cache.set(_clave_recientes(cliente), ([actividad] + recientes)[:MAX_RECIENTES], TTL_RECIENTES_S)
+    buffer_actividad.agregar(actividad)
+    return True
+
+
+def actividades_recientes(cliente):
+    """Últimas actividades del cliente, desde el cache si está disponible"""
+    recientes = cache.get(_clave_recientes(cliente))
+    if recientes is None:
+        recientes = list(ActividadCliente.objects.filter(cliente=cliente).order_by('-fecha')[:MAX_RECIENTES])
+        cache.set(_clave_recientes(cliente), recientes, TTL_RECIENTES_S)
+    return recientes
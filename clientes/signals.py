@@ -4,7 +4,8 @@ from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in
 from django.utils import timezone
 
-from .models import Cliente, ActividadCliente
+from .models import Cliente
+from .actividad import registrar_actividad
 from envios.models import Envio
 from notificaciones_mejoradas.models import NotificacionProgramada
 from notificaciones_mejoradas.services import NotificationEngine
@@ -22,13 +23,7 @@ def registrar_login_cliente(sender, request, user, **kwargs):
     """Registrar actividad de login del cliente"""
     try:
         cliente = user.cliente
-        ActividadCliente.objects.create(
-            cliente=cliente,
-            tipo='login',
-            descripcion='Inicio de sesión en el sistema',
-            ip_address=get_client_ip(request),
-            user_agent=request.META.get('HTTP_USER_AGENT', '')
-        )
+        registrar_actividad(request, cliente, 'login', 'Inicio de sesión en el sistema', aplicar_politica=False)
     except Cliente.DoesNotExist:
         pass
 
@@ -64,13 +59,3 @@ def notificar_nuevo_envio_cliente(sender, instance, created, **kwargs):
         except (Cliente.DoesNotExist, AttributeError):
             # Si no hay cliente asociado, no hacer nada
             pass
-
-
-def get_client_ip(request):
-    """Obtener IP del cliente"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
\ No newline at end of file
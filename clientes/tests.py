@@ -1,3 +1,51 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+
+from . import actividad
+from .models import ActividadCliente
+
+
+class ActividadClienteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cliente', password='clave-segura-123')
+        self.cliente = self.user.cliente
+        self.request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.5')
+        self.buffer = actividad.BufferActividad(max_eventos=100, asincrono=False)
+        patcher = mock.patch.object(actividad, 'buffer_actividad', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_se_encola_sin_insertar_en_el_request(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(actividad.registrar_actividad(self.request, self.cliente, 'cambio_direccion', 'Casa'))
+
+        self.assertEqual(ActividadCliente.objects.count(), 0)
+        self.buffer.vaciar()
+        self.assertEqual(ActividadCliente.objects.get().ip_address, '10.0.0.5')
+
+    def test_limite_por_ventana_de_tiempo(self):
+        self.assertTrue(actividad.registrar_actividad(self.request, self.cliente, 'descarga_reporte', 'Reporte'))
+        self.assertFalse(actividad.registrar_actividad(self.request, self.cliente, 'descarga_reporte', 'Reporte'))
+        self.assertTrue(actividad.registrar_actividad(
+            self.request, self.cliente, 'descarga_reporte', 'Reporte', aplicar_politica=False
+        ))
+        self.assertEqual(len(self.buffer.registros), 2)
+
+    def test_muestreo_por_tipo(self):
+        with mock.patch.object(actividad.random, 'random', return_value=0.9):
+            self.assertFalse(actividad.registrar_actividad(self.request, self.cliente, 'view_envio', 'Listado'))
+        with mock.patch.object(actividad.random, 'random', return_value=0.1):
+            self.assertTrue(actividad.registrar_actividad(self.request, self.cliente, 'view_envio', 'Listado'))
+
+    def test_actividad_reciente_desde_cache(self):
+        self.assertEqual(actividad.actividades_recientes(self.cliente), [])
+        actividad.registrar_actividad(self.request, self.cliente, 'update_perfil', 'Actualización de información personal')
+
+        with self.assertNumQueries(0):
+            recientes = actividad.actividades_recientes(self.cliente)
+        self.assertEqual(recientes[0].tipo, 'update_perfil')
+        self.assertEqual(ActividadCliente.objects.count(), 0)
@@ -6,10 +6,13 @@ from django.db.models import Q, Count
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import timedelta
 
-from .models import Cliente, DireccionEntrega, ActividadCliente
+from .models import Cliente, DireccionEntrega
+from .actividad import registrar_actividad, actividades_recientes
 from envios.models import Envio
+from busqueda.consulta import filtrar_busqueda
+from CorreosChile.fechas import filtrar_por_fechas
 from seguimiento.models import EventoSeguimiento
 from notificaciones_mejoradas.models import NotificacionProgramada, HistorialNotificacion
 
@@ -24,13 +27,7 @@ def dashboard_cliente(request):
         cliente = Cliente.objects.create(user=request.user)
     
     # Registrar actividad
-    ActividadCliente.objects.create(
-        cliente=cliente,
-        tipo='login',
-        descripcion='Inicio de sesión en el dashboard',
-        ip_address=get_client_ip(request),
-        user_agent=request.META.get('HTTP_USER_AGENT', '')
-    )
+    registrar_actividad(request, cliente, 'login', 'Inicio de sesión en el dashboard')
     
     # Estadísticas del cliente
     total_envios = Envio.objects.filter(usuario=request.user).count()
@@ -54,9 +51,7 @@ def dashboard_cliente(request):
     ).order_by('-fecha_envio')[:5]
     
     # Actividad reciente
-    actividad_reciente = ActividadCliente.objects.filter(
-        cliente=cliente
-    ).order_by('-fecha')[:10]
+    actividad_reciente = actividades_recientes(cliente)
     
     context = {
         'cliente': cliente,
@@ -89,37 +84,17 @@ def mis_envios(request):
     if estado:
         envios = envios.filter(estado=estado)
     
-    if fecha_desde:
-        try:
-            fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d')
-            envios = envios.filter(creado_en__gte=fecha_desde)
-        except ValueError:
-            pass
-    
-    if fecha_hasta:
-        try:
-            fecha_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d')
-            envios = envios.filter(creado_en__lte=fecha_hasta)
-        except ValueError:
-            pass
+    # Días incluidos completos (hasta las 23:59 de fecha_hasta); fechas inválidas se ignoran
+    envios = filtrar_por_fechas(envios, 'creado_en', fecha_desde, fecha_hasta)
     
     if busqueda:
-        envios = envios.filter(
-            Q(codigo__icontains=busqueda) |
-            Q(destinatario_nombre__icontains=busqueda) |
-            Q(destino__icontains=busqueda)
-        )
+        envios = filtrar_busqueda(envios, 'envio', busqueda)
     
     # Ordenar por fecha más reciente
     envios = envios.order_by('-creado_en')
     
     # Registrar actividad
-    ActividadCliente.objects.create(
-        cliente=cliente,
-        tipo='view_envio',
-        descripcion=f'Consultó listado de envíos (filtros: estado={estado}, búsqueda={busqueda})',
-        ip_address=get_client_ip(request)
-    )
+    registrar_actividad(request, cliente, 'view_envio', f'Consultó listado de envíos (filtros: estado={estado}, búsqueda={busqueda})')
     
     context = {
         'envios': envios,
@@ -148,12 +123,7 @@ def detalle_envio(request, codigo):
     bultos = envio.bultos.all()
     
     # Registrar actividad
-    ActividadCliente.objects.create(
-        cliente=cliente,
-        tipo='view_envio',
-        descripcion=f'Visto detalle del envío {codigo}',
-        ip_address=get_client_ip(request)
-    )
+    registrar_actividad(request, cliente, 'view_envio', f'Visto detalle del envío {codigo}')
     
     context = {
         'envio': envio,
@@ -197,12 +167,7 @@ def perfil_cliente(request):
         cliente.save()
         
         # Registrar actividad
-        ActividadCliente.objects.create(
-            cliente=cliente,
-            tipo='update_perfil',
-            descripcion='Actualización de información personal',
-            ip_address=get_client_ip(request)
-        )
+        registrar_actividad(request, cliente, 'update_perfil', 'Actualización de información personal')
         
         messages.success(request, 'Perfil actualizado correctamente')
         return redirect('perfil_cliente')
@@ -228,12 +193,7 @@ def preferencias_notificaciones(request):
         cliente.save()
         
         # Registrar actividad
-        ActividadCliente.objects.create(
-            cliente=cliente,
-            tipo='cambio_preferencias',
-            descripcion='Cambió preferencias de notificaciones',
-            ip_address=get_client_ip(request)
-        )
+        registrar_actividad(request, cliente, 'cambio_preferencias', 'Cambió preferencias de notificaciones')
         
         messages.success(request, 'Preferencias de notificaciones actualizadas')
         return redirect('preferencias_notificaciones')
@@ -297,12 +257,7 @@ def agregar_direccion(request):
         )
         
         # Registrar actividad
-        ActividadCliente.objects.create(
-            cliente=cliente,
-            tipo='cambio_direccion',
-            descripcion=f'Agregó nueva dirección: {direccion.nombre}',
-            ip_address=get_client_ip(request)
-        )
+        registrar_actividad(request, cliente, 'cambio_direccion', f'Agregó nueva dirección: {direccion.nombre}')
         
         messages.success(request, 'Dirección agregada correctamente')
         return redirect('perfil_cliente')
@@ -323,12 +278,7 @@ def descargar_reporte(request):
     ).order_by('-creado_en')
     
     # Registrar actividad
-    ActividadCliente.objects.create(
-        cliente=cliente,
-        tipo='descarga_reporte',
-        descripcion='Descargó reporte de envíos',
-        ip_address=get_client_ip(request)
-    )
+    registrar_actividad(request, cliente, 'descarga_reporte', 'Descargó reporte de envíos')
     
     # Crear reporte CSV
     import csv
@@ -352,13 +302,3 @@ def descargar_reporte(request):
         ])
     
     return response
-
-
-def get_client_ip(request):
-    """Obtener IP del cliente"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
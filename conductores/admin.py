@@ -5,7 +5,7 @@ from django.utils.safestring import mark_safe
 from django.utils import timezone
 from .models import (
     Conductor, RutaConductor, EnvioRuta, HistorialEstadoConductor,
-    IncidenciaConductor, MetricasConductor
+    IncidenciaConductor, MetricasConductor, EventoSincronizacion, TransicionNoPermitida
 )
 
 
@@ -173,14 +173,22 @@ class EnvioRutaAdmin(admin.ModelAdmin):
     def marcar_entregado(self, request, queryset):
         for envio_ruta in queryset:
             if envio_ruta.estado in ['pendiente', 'en_camino']:
-                envio_ruta.marcar_entregado()
+                try:
+                    envio_ruta.marcar_entregado()
+                except TransicionNoPermitida:
+                    # Se entregó mientras se mostraba la lista
+                    continue
         self.message_user(request, f"Envíos marcados como entregados")
     marcar_entregado.short_description = "Marcar como Entregado"
     
     def marcar_fallido(self, request, queryset):
         for envio_ruta in queryset:
             if envio_ruta.estado in ['pendiente', 'en_camino']:
-                envio_ruta.marcar_fallido('Marcado como fallido desde administrador')
+                try:
+                    envio_ruta.marcar_fallido('Marcado como fallido desde administrador')
+                except TransicionNoPermitida:
+                    # Se entregó mientras se mostraba la lista
+                    continue
         self.message_user(request, f"Envíos marcados como fallidos")
     marcar_fallido.short_description = "Marcar como Fallido"
 
@@ -194,6 +202,15 @@ class HistorialEstadoConductorAdmin(admin.ModelAdmin):
     ordering = ['-fecha_cambio']
 
 
+@admin.register(EventoSincronizacion)
+class EventoSincronizacionAdmin(admin.ModelAdmin):
+    list_display = ['evento_id', 'conductor', 'tipo', 'resultado', 'ocurrido_en', 'recibido_en']
+    list_filter = ['resultado', 'tipo', 'recibido_en']
+    search_fields = ['evento_id', 'envio_ruta__envio__codigo', 'conductor__usuario__first_name']
+    readonly_fields = ['conductor', 'evento_id', 'envio_ruta', 'tipo', 'ocurrido_en', 'resultado', 'detalle', 'recibido_en']
+    ordering = ['-recibido_en']
+
+
 @admin.register(IncidenciaConductor)
 class IncidenciaConductorAdmin(admin.ModelAdmin):
     list_display = [
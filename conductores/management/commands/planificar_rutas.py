@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from conductores.planificacion import planificar_rutas, MAX_PARADAS_POR_RUTA
+
+
+class Command(BaseCommand):
+    help = 'Agrupa los envíos pendientes y crea las rutas del día para los conductores disponibles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha a planificar (YYYY-MM-DD), por defecto hoy')
+        parser.add_argument('--origen', help='Centro de despacho como "lat,lng"')
+        parser.add_argument('--procesos', type=int, help='Procesos para optimizar las rutas')
+        parser.add_argument('--max-paradas', type=int, default=MAX_PARADAS_POR_RUTA, help='Máximo de envíos por ruta')
+
+    def handle(self, *args, **options):
+        try:
+            fecha = date.fromisoformat(options['fecha']) if options['fecha'] else None
+            origen = tuple(float(v) for v in options['origen'].split(',')) if options['origen'] else None
+        except ValueError:
+            raise CommandError('Fecha u origen inválidos')
+        if origen is not None and len(origen) != 2:
+            raise CommandError('El origen debe tener la forma "lat,lng"')
+
+        resumen = planificar_rutas(
+            fecha=fecha,
+            origen=origen,
+            procesos=options['procesos'],
+            max_paradas=options['max_paradas'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rutas creadas: {resumen['rutas_creadas']} - "
+            f"Envíos asignados: {resumen['envios_asignados']} - "
+            f"Sin asignar: {resumen['envios_sin_asignar']}"
+        ))
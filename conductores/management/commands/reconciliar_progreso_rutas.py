@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q
+from conductores.models import RutaConductor, EnvioRuta
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de progreso de las rutas y corrige las diferencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Solo rutas de esta fecha (YYYY-MM-DD)')
+        parser.add_argument('--todas', action='store_true', help='Incluir rutas completadas y canceladas')
+
+    def handle(self, *args, **options):
+        rutas = RutaConductor.objects.all()
+        if not options['todas']:
+            rutas = rutas.filter(estado__in=['pendiente', 'en_progreso'])
+        if options['fecha']:
+            try:
+                rutas = rutas.filter(fecha=date.fromisoformat(options['fecha']))
+            except ValueError:
+                raise CommandError('Fecha inválida')
+
+        # Un solo recuento agrupado por ruta en lugar de tres COUNT por ruta
+        conteos = {
+            fila['ruta_id']: fila
+            for fila in EnvioRuta.objects.filter(ruta__in=rutas).values('ruta_id').annotate(
+                total=Count('id'),
+                entregados=Count('id', filter=Q(estado='entregado')),
+                fallidos=Count('id', filter=Q(estado='fallido')),
+            )
+        }
+
+        corregidas = []
+        for ruta in rutas.only('id', 'total_envios', 'envios_entregados', 'envios_fallidos').iterator():
+            conteo = conteos.get(ruta.id, {'total': 0, 'entregados': 0, 'fallidos': 0})
+            valores = (conteo['total'], conteo['entregados'], conteo['fallidos'])
+            if valores != (ruta.total_envios, ruta.envios_entregados, ruta.envios_fallidos):
+                ruta.total_envios, ruta.envios_entregados, ruta.envios_fallidos = valores
+                corregidas.append(ruta)
+
+        RutaConductor.objects.bulk_update(
+            corregidas, ['total_envios', 'envios_entregados', 'envios_fallidos'], batch_size=500
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rutas corregidas: {len(corregidas)}'))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conductores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoSincronizacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento_id', models.CharField(max_length=64)),
+                ('tipo', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_camino', 'En Camino'), ('entregado', 'Entregado'), ('fallido', 'Fallido'), ('reprogramado', 'Reprogramado')], max_length=20)),
+                ('ocurrido_en', models.DateTimeField()),
+                ('resultado', models.CharField(choices=[('aplicado', 'Aplicado'), ('conflicto', 'Conflicto')], max_length=20)),
+                ('detalle', models.CharField(blank=True, max_length=255)),
+                ('recibido_en', models.DateTimeField(auto_now_add=True)),
+                ('conductor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_sincronizacion', to='conductores.conductor')),
+                ('envio_ruta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos_sincronizacion', to='conductores.envioruta')),
+            ],
+            options={
+                'verbose_name': 'Evento de Sincronización',
+                'verbose_name_plural': 'Eventos de Sincronización',
+                'ordering': ['-recibido_en'],
+                'unique_together': {('conductor', 'evento_id')},
+            },
+        ),
+    ]
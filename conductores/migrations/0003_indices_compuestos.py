@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conductores', '0002_eventosincronizacion'),
+        ('envios', '0005_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='envioruta',
+            index=models.Index(fields=['ruta', 'estado', 'orden_entrega'], name='conductores_ruta_id_5687fc_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conductores', '0003_indices_compuestos'),
+        ('envios', '0006_indices_fechas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incidenciaconductor',
+            index=models.Index(fields=['conductor', 'fecha_reporte'], name='conductores_conduct_f2441a_idx'),
+        ),
+    ]
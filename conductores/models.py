@@ -1,9 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 from envios.models import Envio
 
 
+class TransicionNoPermitida(Exception):
+    """El estado actual de la parada no admite el cambio pedido"""
+
+
 class Conductor(models.Model):
     """Perfil extendido para conductores con funciones móviles"""
     usuario = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -133,11 +138,20 @@ class RutaConductor(models.Model):
         return 0
 
     def actualizar_progreso(self):
-        """Actualiza el progreso basado en los envíos de la ruta"""
-        envios_ruta = self.envios_ruta.all()
-        self.total_envios = envios_ruta.count()
-        self.envios_entregados = envios_ruta.filter(envio__estado='entregado').count()
-        self.envios_fallidos = envios_ruta.filter(envio__estado='fallido').count()
+        """
+        Recalcula los contadores desde los envíos de la ruta.
+
+        Las entregas ajustan los contadores de forma incremental; este recuento
+        completo lo usa la reconciliación periódica (reconciliar_progreso_rutas).
+        """
+        conteo = self.envios_ruta.aggregate(
+            total=Count('id'),
+            entregados=Count('id', filter=Q(estado='entregado')),
+            fallidos=Count('id', filter=Q(estado='fallido')),
+        )
+        self.total_envios = conteo['total']
+        self.envios_entregados = conteo['entregados']
+        self.envios_fallidos = conteo['fallidos']
         self.save(update_fields=['total_envios', 'envios_entregados', 'envios_fallidos'])
 
 
@@ -178,45 +192,107 @@ class EnvioRuta(models.Model):
         verbose_name_plural = 'Envíos en Rutas'
         ordering = ['orden_entrega']
         unique_together = ['ruta', 'envio']
+        indexes = [
+            models.Index(fields=['ruta', 'estado', 'orden_entrega']),
+        ]
 
     def __str__(self):
         return f"{self.envio.codigo} - Ruta: {self.ruta.nombre_ruta}"
 
-    def marcar_entregado(self, firma_digital=None, foto=None, latitud=None, longitud=None):
-        """Marca el envío como entregado"""
-        self.estado = 'entregado'
-        self.fecha_intento_entrega = timezone.now()
+    def ajustar_progreso_ruta(self, estado_anterior):
+        """Aplica a los contadores de la ruta la transición desde estado_anterior con un único UPDATE"""
+        cambios = {}
+        for estado, campo in (('entregado', 'envios_entregados'), ('fallido', 'envios_fallidos')):
+            delta = (self.estado == estado) - (estado_anterior == estado)
+            if delta:
+                cambios[campo] = F(campo) + delta
+        if cambios:
+            RutaConductor.objects.filter(pk=self.ruta_id).update(fecha_actualizacion=timezone.now(), **cambios)
+
+    def cambiar_estado(self, nuevo_estado):
+        """
+        Pasa la parada a nuevo_estado y ajusta los contadores de la ruta.
+
+        El estado anterior se lee de la fila bloqueada con select_for_update,
+        no de la instancia, así que dos toques simultáneos se aplican uno
+        después del otro y cada transición ajusta los contadores una sola vez.
+        Debe llamarse dentro de una transacción para que el bloqueo dure hasta
+        el commit.
+
+        Raises:
+            TransicionNoPermitida: si la parada ya fue entregada y se pide
+            otro estado
+        """
+        with transaction.atomic():
+            estado_anterior = EnvioRuta.objects.select_for_update().values_list('estado', flat=True).get(pk=self.pk)
+            if estado_anterior == 'entregado' and nuevo_estado != 'entregado':
+                raise TransicionNoPermitida('La parada ya fue entregada')
+            EnvioRuta.objects.filter(pk=self.pk).update(estado=nuevo_estado, fecha_actualizacion=timezone.now())
+            self.estado = nuevo_estado
+            self.ajustar_progreso_ruta(estado_anterior)
+
+    @transaction.atomic
+    def marcar_entregado(self, firma_digital=None, foto=None, latitud=None, longitud=None, fecha=None):
+        """Marca el envío como entregado; fecha permite registrar entregas hechas sin conexión"""
+        # Primero el estado: bloquea la parada y valida la transición antes de escribir lo demás
+        self.cambiar_estado('entregado')
+        self.fecha_intento_entrega = fecha or timezone.now()
         self.firma_digital = firma_digital
+        campos = ['fecha_intento_entrega', 'firma_digital', 'fecha_actualizacion']
         if foto:
             self.foto_entrega = foto
+            campos.append('foto_entrega')
         if latitud and longitud:
             self.latitud_entrega = latitud
             self.longitud_entrega = longitud
-        self.save()
+            campos += ['latitud_entrega', 'longitud_entrega']
+        self.save(update_fields=campos)
         
         # Actualizar el estado del envío principal
         self.envio.estado = 'entregado'
         self.envio.save(update_fields=['estado'])
-        
-        # Actualizar progreso de la ruta
-        self.ruta.actualizar_progreso()
 
-    def marcar_fallido(self, motivo, latitud=None, longitud=None):
-        """Marca el envío como fallido"""
-        self.estado = 'fallido'
-        self.fecha_intento_entrega = timezone.now()
+    @transaction.atomic
+    def marcar_fallido(self, motivo, latitud=None, longitud=None, fecha=None):
+        """Marca el envío como fallido; fecha permite registrar intentos hechos sin conexión"""
+        self.cambiar_estado('fallido')
+        self.fecha_intento_entrega = fecha or timezone.now()
         self.motivo_fallo = motivo
+        campos = ['fecha_intento_entrega', 'motivo_fallo', 'fecha_actualizacion']
         if latitud and longitud:
             self.latitud_entrega = latitud
             self.longitud_entrega = longitud
-        self.save()
+            campos += ['latitud_entrega', 'longitud_entrega']
+        self.save(update_fields=campos)
         
         # Actualizar el estado del envío principal
         self.envio.estado = 'fallido'
         self.envio.save(update_fields=['estado'])
-        
-        # Actualizar progreso de la ruta
-        self.ruta.actualizar_progreso()
+
+
+class EventoSincronizacion(models.Model):
+    """Eventos de entrega encolados por la app móvil, registrados para aplicarlos una sola vez"""
+    RESULTADOS = [
+        ('aplicado', 'Aplicado'),
+        ('conflicto', 'Conflicto'),
+    ]
+    conductor = models.ForeignKey(Conductor, on_delete=models.CASCADE, related_name='eventos_sincronizacion')
+    evento_id = models.CharField(max_length=64)  # Generado por la app
+    envio_ruta = models.ForeignKey(EnvioRuta, on_delete=models.SET_NULL, blank=True, null=True, related_name='eventos_sincronizacion')
+    tipo = models.CharField(max_length=20, choices=EnvioRuta.ESTADOS_ENVIO_RUTA)
+    ocurrido_en = models.DateTimeField()  # Momento registrado en el dispositivo
+    resultado = models.CharField(max_length=20, choices=RESULTADOS)
+    detalle = models.CharField(max_length=255, blank=True)
+    recibido_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Evento de Sincronización'
+        verbose_name_plural = 'Eventos de Sincronización'
+        ordering = ['-recibido_en']
+        unique_together = ['conductor', 'evento_id']
+
+    def __str__(self):
+        return f"{self.evento_id} - {self.tipo} ({self.resultado})"
 
 
 class HistorialEstadoConductor(models.Model):
@@ -283,6 +359,9 @@ class IncidenciaConductor(models.Model):
         verbose_name = 'Incidencia del Conductor'
         verbose_name_plural = 'Incidencias de Conductores'
         ordering = ['-fecha_reporte']
+        indexes = [
+            models.Index(fields=['conductor', 'fecha_reporte']),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.conductor.nombre_completo}"
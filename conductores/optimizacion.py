@@ -0,0 +1,214 @@
+"""
+Optimización de la secuencia de entrega de una RutaConductor.
+
+Construye la matriz de distancias entre paradas con haversine vectorizado
+(NumPy) y resuelve el orden de visita con vecino más cercano, mejorado luego
+con 2-opt y or-opt hasta agotar el presupuesto de tiempo.
+"""
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from envios.eta import haversine_km
+
+RADIO_TIERRA_KM = 6371.0
+VELOCIDAD_PROMEDIO_KMH = 30.0  # Misma velocidad urbana base que envios.eta
+MINUTOS_POR_PARADA = 5
+TIEMPO_LIMITE_S = 2.0
+ESTADOS_PENDIENTES = ('pendiente', 'en_camino')
+_EPS = 1e-9
+
+
+def matriz_distancias_km(lats, lngs):
+    """Matriz NxN de distancias haversine en km entre todos los puntos"""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def largo_recorrido(orden, dist):
+    """Largo del recorrido abierto que sigue el orden dado"""
+    if len(orden) < 2:
+        return 0.0
+    orden = np.asarray(orden)
+    return float(dist[orden[:-1], orden[1:]].sum())
+
+
+def _vecino_mas_cercano(dist, inicio=0):
+    n = len(dist)
+    visitado = np.zeros(n, dtype=bool)
+    visitado[inicio] = True
+    orden = [inicio]
+    actual = inicio
+    for _ in range(n - 1):
+        actual = int(np.argmin(np.where(visitado, np.inf, dist[actual])))
+        visitado[actual] = True
+        orden.append(actual)
+    return orden
+
+
+def _dos_opt(orden, dist, limite):
+    """Invierte tramos mientras acorten el recorrido. El nodo 0 queda fijo."""
+    orden = np.array(orden)
+    n = len(orden)
+    mejorado = True
+    while mejorado and time.monotonic() < limite:
+        mejorado = False
+        for i in range(1, n - 1):
+            a, b = orden[i - 1], orden[i]
+            js = np.arange(i + 1, n)
+            c = orden[js]
+            # El último tramo de un recorrido abierto no tiene arco de salida
+            tiene_sig = js + 1 < n
+            e = orden[np.minimum(js + 1, n - 1)]
+            delta = dist[a, c] - dist[a, b] + np.where(tiene_sig, dist[b, e] - dist[c, e], 0.0)
+            k = int(np.argmin(delta))
+            if delta[k] < -_EPS:
+                j = js[k]
+                orden[i:j + 1] = orden[i:j + 1][::-1].copy()
+                mejorado = True
+            if time.monotonic() >= limite:
+                break
+    return orden.tolist()
+
+
+def _or_opt(orden, dist, limite):
+    """Reubica tramos de 1 a 3 paradas (en ambos sentidos) donde cuesten menos"""
+    orden = list(orden)
+    mejorado = True
+    while mejorado and time.monotonic() < limite:
+        mejorado = False
+        for largo in (1, 2, 3):
+            i = 1
+            while i + largo <= len(orden):
+                if time.monotonic() >= limite:
+                    return orden
+                tramo = orden[i:i + largo]
+                anterior = orden[i - 1]
+                ahorro = dist[anterior, tramo[0]]
+                if i + largo < len(orden):
+                    siguiente = orden[i + largo]
+                    ahorro += dist[tramo[-1], siguiente] - dist[anterior, siguiente]
+
+                resto = np.array(orden[:i] + orden[i + largo:])
+                y = np.roll(resto, -1)
+                ultimo = np.zeros(len(resto), dtype=bool)
+                ultimo[-1] = True
+                arco = np.where(ultimo, 0.0, dist[resto, y])
+                directo = dist[resto, tramo[0]] + np.where(ultimo, 0.0, dist[tramo[-1], y]) - arco
+                inverso = dist[resto, tramo[-1]] + np.where(ultimo, 0.0, dist[tramo[0], y]) - arco
+                costo = np.minimum(directo, inverso)
+                p = int(np.argmin(costo))
+                if costo[p] < ahorro - _EPS:
+                    if inverso[p] < directo[p]:
+                        tramo = tramo[::-1]
+                    resto = resto.tolist()
+                    orden = resto[:p + 1] + tramo + resto[p + 1:]
+                    mejorado = True
+                else:
+                    i += 1
+    return orden
+
+
+def optimizar_secuencia(lats, lngs, origen=None, tiempo_limite_s=TIEMPO_LIMITE_S):
+    """
+    Calcula el orden de visita de las paradas.
+
+    Args:
+        lats, lngs: coordenadas de cada parada
+        origen: tupla (lat, lng) desde donde parte el recorrido; si es None
+            el recorrido puede comenzar en cualquier parada
+        tiempo_limite_s: presupuesto de tiempo para las mejoras locales
+
+    Returns:
+        Tupla (orden, distancia_km) donde orden son índices sobre lats/lngs
+    """
+    n = len(lats)
+    if n == 0:
+        return [], 0.0
+    limite = time.monotonic() + tiempo_limite_s
+
+    # El nodo 0 es el origen; sin origen se usa un nodo ficticio a distancia 0
+    if origen is not None:
+        dist = matriz_distancias_km([origen[0], *lats], [origen[1], *lngs])
+    else:
+        dist = np.zeros((n + 1, n + 1))
+        dist[1:, 1:] = matriz_distancias_km(lats, lngs)
+
+    orden = _vecino_mas_cercano(dist)
+    distancia = largo_recorrido(orden, dist)
+    while time.monotonic() < limite:
+        orden = _or_opt(_dos_opt(orden, dist, limite), dist, limite)
+        nueva = largo_recorrido(orden, dist)
+        if nueva >= distancia - _EPS:
+            break
+        distancia = nueva
+
+    return [k - 1 for k in orden[1:]], largo_recorrido(orden, dist)
+
+
+def minutos_estimados(distancia_km, paradas):
+    """Tiempo estimado de una ruta: manejo a velocidad urbana más detención por parada"""
+    return int(round(distancia_km / VELOCIDAD_PROMEDIO_KMH * 60)) + MINUTOS_POR_PARADA * paradas
+
+
+def _coordenadas(envio_ruta):
+    envio = envio_ruta.envio
+    if envio.destino_lat is None or envio.destino_lng is None:
+        return None
+    return float(envio.destino_lat), float(envio.destino_lng)
+
+
+def optimizar_ruta(ruta, tiempo_limite_s=TIEMPO_LIMITE_S):
+    """
+    Reordena las paradas pendientes de la ruta y recalcula sus totales.
+
+    Las paradas ya visitadas conservan su posición al inicio; las pendientes
+    sin coordenadas quedan al final en su orden actual.
+    """
+    from .models import EnvioRuta
+
+    paradas = list(ruta.envios_ruta.select_related('envio').order_by('orden_entrega', 'id'))
+    cerradas = [p for p in paradas if p.estado not in ESTADOS_PENDIENTES]
+    abiertas = [p for p in paradas if p.estado in ESTADOS_PENDIENTES]
+    con_coords = [p for p in abiertas if _coordenadas(p)]
+    sin_coords = [p for p in abiertas if not _coordenadas(p)]
+
+    # Distancia ya recorrida entre las paradas cerradas; la última es el origen
+    distancia = 0.0
+    origen = None
+    for parada in cerradas:
+        punto = _coordenadas(parada)
+        if not punto:
+            continue
+        if origen:
+            distancia += haversine_km(origen[0], origen[1], punto[0], punto[1])
+        origen = punto
+
+    orden, distancia_pendiente = optimizar_secuencia(
+        [_coordenadas(p)[0] for p in con_coords],
+        [_coordenadas(p)[1] for p in con_coords],
+        origen=origen,
+        tiempo_limite_s=tiempo_limite_s,
+    )
+    distancia += distancia_pendiente
+
+    # bulk_update no actualiza los auto_now; la app móvil sincroniza por fecha_actualizacion
+    ahora = timezone.now()
+    secuencia = cerradas + [con_coords[k] for k in orden] + sin_coords
+    for posicion, parada in enumerate(secuencia, start=1):
+        parada.orden_entrega = posicion
+        parada.fecha_actualizacion = ahora
+
+    ruta.distancia_total_km = Decimal(str(round(distancia, 2)))
+    ruta.tiempo_estimado_minutos = minutos_estimados(distancia, len(paradas))
+    with transaction.atomic():
+        EnvioRuta.objects.bulk_update(secuencia, ['orden_entrega', 'fecha_actualizacion'])
+        ruta.save(update_fields=['distancia_total_km', 'tiempo_estimado_minutos', 'fecha_actualizacion'])
+    return ruta
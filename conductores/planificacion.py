@@ -0,0 +1,187 @@
+"""
+Planificación automática de las rutas del día.
+
+Agrupa los envíos pendientes con un barrido angular alrededor del centro de
+despacho respetando la capacidad de carga del vehículo de cada conductor,
+asigna un grupo por conductor disponible y crea las RutaConductor y EnvioRuta
+en bloque. La secuencia de cada ruta se optimiza en paralelo en un pool de
+procesos.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from envios.models import Envio
+from .models import Conductor, RutaConductor, EnvioRuta
+from .optimizacion import optimizar_secuencia, minutos_estimados
+
+NOMBRE_RUTA = 'Ruta automática'
+PESO_POR_DEFECTO_KG = 1.0
+MAX_PARADAS_POR_RUTA = 150
+TIEMPO_LIMITE_RUTA_S = 0.5
+
+
+def envios_por_planificar(fecha):
+    """Envíos pendientes creados hasta el día indicado que no están en una ruta activa"""
+    fin_dia = timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+    en_ruta = EnvioRuta.objects.filter(ruta__estado__in=['pendiente', 'en_progreso']).values('envio_id')
+    return Envio.objects.filter(
+        estado='pendiente',
+        creado_en__lt=fin_dia,
+        destino_lat__isnull=False,
+        destino_lng__isnull=False,
+    ).exclude(id__in=en_ruta)
+
+
+def conductores_disponibles(fecha):
+    """Conductores disponibles con vehículo activo y sin ruta para la fecha"""
+    con_ruta = RutaConductor.objects.filter(fecha=fecha).values('conductor_id')
+    return Conductor.objects.filter(
+        activo=True,
+        estado='disponible',
+        vehiculo_conductor__es_activo=True,
+        vehiculo_conductor__estado__in=['disponible', 'en_uso'],
+        vehiculo_conductor__tipo_vehiculo__es_activo=True,
+    ).exclude(id__in=con_ruta).select_related('vehiculo_conductor__tipo_vehiculo')
+
+
+def agrupar_por_barrido(lats, lngs, pesos, capacidades, centro, max_paradas=MAX_PARADAS_POR_RUTA):
+    """
+    Agrupa los puntos por ángulo alrededor del centro.
+
+    La carga se reparte en proporción a la capacidad de cada vehículo, sin
+    superarla ni exceder max_paradas por grupo.
+
+    Returns:
+        Tupla (grupos, sin_asignar): una lista de índices por capacidad, en el
+        mismo orden recibido, y los índices que no cupieron en ningún grupo
+    """
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+
+    # Se corrige la longitud por la latitud para no deformar el barrido
+    angulos = np.arctan2(lats - centro[0], (lngs - centro[1]) * math.cos(math.radians(centro[0])))
+    orden = np.argsort(angulos, kind='stable')
+    if len(orden) > 1:
+        # El barrido comienza después del mayor hueco angular
+        ordenados = angulos[orden]
+        huecos = np.diff(np.append(ordenados, ordenados[0] + 2 * math.pi))
+        orden = np.roll(orden, -(int(np.argmax(huecos)) + 1))
+
+    # Carga restante repartida sobre la capacidad restante en cada paso
+    capacidad_restante = float(sum(capacidades))
+    peso_restante = float(pesos.sum())
+
+    grupos = []
+    sin_asignar = []
+    pos = 0
+    for capacidad in capacidades:
+        objetivo = capacidad * min(1.0, peso_restante / capacidad_restante) if capacidad_restante else 0.0
+        capacidad_restante -= capacidad
+        carga = 0.0
+        grupo = []
+        while pos < len(orden) and len(grupo) < max_paradas and (not grupo or carga < objetivo):
+            peso = pesos[orden[pos]]
+            if carga + peso > capacidad:
+                if grupo:
+                    break
+                # No cabe ni en un vehículo vacío de esta capacidad
+                sin_asignar.append(int(orden[pos]))
+                pos += 1
+                continue
+            grupo.append(int(orden[pos]))
+            carga += peso
+            pos += 1
+        peso_restante -= carga
+        grupos.append(grupo)
+    sin_asignar.extend(int(i) for i in orden[pos:])
+    return grupos, sin_asignar
+
+
+def _secuenciar(tarea):
+    lats, lngs, origen = tarea
+    return optimizar_secuencia(lats, lngs, origen=origen, tiempo_limite_s=TIEMPO_LIMITE_RUTA_S)
+
+
+def secuenciar_grupos(tareas, procesos=None):
+    """Optimiza cada (lats, lngs, origen) en paralelo; devuelve (orden, distancia) por tarea"""
+    procesos = procesos or os.cpu_count() or 1
+    if procesos <= 1 or len(tareas) <= 1:
+        return [_secuenciar(tarea) for tarea in tareas]
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        return list(pool.map(_secuenciar, tareas, chunksize=max(1, len(tareas) // (procesos * 4))))
+
+
+def planificar_rutas(fecha=None, origen=None, procesos=None, max_paradas=MAX_PARADAS_POR_RUTA):
+    """
+    Crea las rutas del día para los conductores disponibles.
+
+    Args:
+        fecha: día a planificar (por defecto hoy)
+        origen: tupla (lat, lng) del centro de despacho; por defecto se usa
+            el centroide de los envíos y las rutas parten en cualquier parada
+        procesos: procesos para optimizar las secuencias (por defecto, CPUs)
+        max_paradas: máximo de envíos por ruta
+
+    Returns:
+        Dict con el resumen de la planificación
+    """
+    fecha = fecha or timezone.localdate()
+    envios = list(envios_por_planificar(fecha).values_list('id', 'destino_lat', 'destino_lng', 'peso_kg'))
+    conductores = list(conductores_disponibles(fecha).order_by('id'))
+    resumen = {'rutas_creadas': 0, 'envios_asignados': 0, 'envios_sin_asignar': len(envios)}
+    if not envios or not conductores:
+        return resumen
+
+    ids = np.array([e[0] for e in envios])
+    lats = np.array([float(e[1]) for e in envios])
+    lngs = np.array([float(e[2]) for e in envios])
+    pesos = np.array([float(e[3]) if e[3] is not None else PESO_POR_DEFECTO_KG for e in envios])
+    capacidades = [float(c.vehiculo_conductor.tipo_vehiculo.capacidad_carga_kg) for c in conductores]
+    centro = origen or (float(lats.mean()), float(lngs.mean()))
+
+    grupos, sin_asignar = agrupar_por_barrido(lats, lngs, pesos, capacidades, centro, max_paradas)
+    asignaciones = [(conductor, grupo) for conductor, grupo in zip(conductores, grupos) if grupo]
+    secuencias = secuenciar_grupos([(lats[g], lngs[g], origen) for _, g in asignaciones], procesos)
+
+    with transaction.atomic():
+        rutas = []
+        for (conductor, grupo), (_, distancia) in zip(asignaciones, secuencias):
+            rutas.append(RutaConductor(
+                conductor=conductor,
+                fecha=fecha,
+                nombre_ruta=NOMBRE_RUTA,
+                total_envios=len(grupo),
+                distancia_total_km=Decimal(str(round(distancia, 2))),
+                tiempo_estimado_minutos=minutos_estimados(distancia, len(grupo)),
+            ))
+        RutaConductor.objects.bulk_create(rutas, batch_size=500)
+
+        # MySQL no devuelve las PK de bulk_create: se recuperan por la clave única
+        ruta_ids = dict(RutaConductor.objects.filter(
+            fecha=fecha,
+            nombre_ruta=NOMBRE_RUTA,
+            conductor_id__in=[conductor.id for conductor, _ in asignaciones],
+        ).values_list('conductor_id', 'id'))
+
+        envios_ruta = []
+        for (conductor, grupo), (orden, _) in zip(asignaciones, secuencias):
+            for posicion, k in enumerate(orden, start=1):
+                envios_ruta.append(EnvioRuta(
+                    ruta_id=ruta_ids[conductor.id],
+                    envio_id=int(ids[grupo[k]]),
+                    orden_entrega=posicion,
+                ))
+        EnvioRuta.objects.bulk_create(envios_ruta, batch_size=1000)
+
+    resumen['rutas_creadas'] = len(rutas)
+    resumen['envios_asignados'] = len(envios_ruta)
+    resumen['envios_sin_asignar'] = len(sin_asignar)
+    return resumen
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Conductor, RutaConductor, EnvioRuta, IncidenciaConductor, MetricasConductor
 from envios.models import Envio
@@ -57,15 +58,13 @@ class ConductorEstadoSerializer(serializers.Serializer):
 
 class EnvioSerializer(serializers.ModelSerializer):
     """Serializador básico para envíos"""
-    remitente_nombre = serializers.CharField(source='remitente.get_full_name', read_only=True)
-    destinatario_nombre = serializers.CharField(source='destinatario.get_full_name', read_only=True)
     
     class Meta:
         model = Envio
         fields = [
-            'id', 'codigo', 'remitente_nombre', 'destinatario_nombre',
-            'direccion_destino', 'telefono_destinatario', 'estado',
-            'fecha_creacion', 'fecha_estimada_entrega'
+            'id', 'codigo', 'destinatario_nombre', 'direccion_destino',
+            'destino', 'destino_lat', 'destino_lng', 'peso_kg', 'estado',
+            'creado_en', 'actualizado_en', 'fecha_estimada_entrega'
         ]
 
 
@@ -79,9 +78,9 @@ class EnvioRutaSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'envio', 'orden_entrega', 'estado', 'direccion_formateada',
             'fecha_intento_entrega', 'motivo_fallo', 'latitud_entrega',
-            'longitud_entrega', 'notas'
+            'longitud_entrega', 'notas', 'fecha_actualizacion'
         ]
-        read_only_fields = ['id', 'fecha_intento_entrega']
+        read_only_fields = ['id', 'fecha_intento_entrega', 'fecha_actualizacion']
     
     def get_direccion_formateada(self, obj):
         """Retorna la dirección formateada del envío"""
@@ -115,9 +114,10 @@ class EnvioRutaEntregaSerializer(serializers.Serializer):
                 longitud=validated_data.get('longitud')
             )
         else:
-            instance.estado = nuevo_estado
-            instance.notas = validated_data.get('notas', '')
-            instance.save()
+            with transaction.atomic():
+                instance.cambiar_estado(nuevo_estado)
+                instance.notas = validated_data.get('notas', '')
+                instance.save(update_fields=['notas', 'fecha_actualizacion'])
         
         return instance
 
@@ -140,6 +140,33 @@ class RutaConductorSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'fecha_creacion', 'fecha_actualizacion']
 
 
+class EventoEntregaSerializer(serializers.Serializer):
+    """Serializador para eventos de entrega encolados sin conexión"""
+    id = serializers.CharField(max_length=64)
+    envio_ruta = serializers.IntegerField()
+    tipo = serializers.ChoiceField(choices=[e for e in EnvioRuta.ESTADOS_ENVIO_RUTA if e[0] != 'pendiente'])
+    ocurrido_en = serializers.DateTimeField()
+    firma_digital = serializers.CharField(required=False, allow_blank=True)
+    motivo_fallo = serializers.CharField(required=False, allow_blank=True)
+    latitud = serializers.DecimalField(max_digits=10, decimal_places=8, required=False)
+    longitud = serializers.DecimalField(max_digits=11, decimal_places=8, required=False)
+    notas = serializers.CharField(required=False, allow_blank=True)
+
+
+class RutaJornadaSerializer(serializers.ModelSerializer):
+    """Serializador compacto de la ruta para el paquete de la jornada"""
+    progreso = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = RutaConductor
+        fields = [
+            'id', 'fecha', 'nombre_ruta', 'descripcion', 'estado',
+            'total_envios', 'envios_entregados', 'envios_fallidos',
+            'distancia_total_km', 'tiempo_estimado_minutos', 'progreso',
+            'hora_inicio', 'hora_fin', 'fecha_actualizacion'
+        ]
+
+
 class RutaConductorCreateSerializer(serializers.ModelSerializer):
     """Serializador para crear rutas de conductores"""
     envios_ids = serializers.ListField(
@@ -0,0 +1,208 @@
+"""
+Sincronización de la app móvil de conductores.
+
+El paquete de la jornada entrega la ruta activa del conductor con todas sus
+paradas y un token de sincronización. Con ese token la app pide después solo
+las paradas que cambiaron desde su última descarga.
+
+Las entregas registradas sin conexión se suben en lote y se aplican en orden
+cronológico, una sola vez por id de evento generado en el dispositivo.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import RutaConductor, EnvioRuta, EventoSincronizacion, TransicionNoPermitida
+from .serializers import EnvioRutaSerializer, RutaJornadaSerializer, EventoEntregaSerializer
+
+SALT_TOKEN = 'conductores.sincronizacion'
+MAX_EVENTOS_POR_LOTE = 500
+# fecha_actualizacion se fija al guardar, antes del commit: una transacción que
+# termina después de armar el paquete puede dejar una fila con una fecha
+# anterior al corte. El token retrocede este margen para volver a incluirlas;
+# la app reemplaza las paradas por id, así que repetir alguna no importa.
+MARGEN_CORTE = timedelta(seconds=60)
+
+
+def ruta_de_la_jornada(conductor, fecha=None):
+    """Ruta en progreso del conductor o, si no hay, su ruta pendiente del día"""
+    fecha = fecha or timezone.localdate()
+    rutas = RutaConductor.objects.filter(conductor=conductor)
+    return (
+        rutas.filter(estado='en_progreso').order_by('-fecha').first()
+        or rutas.filter(estado='pendiente', fecha=fecha).order_by('fecha_creacion').first()
+    )
+
+
+def generar_token(ruta, momento):
+    return signing.dumps({'ruta': ruta.id, 'desde': momento.isoformat()}, salt=SALT_TOKEN)
+
+
+def leer_token(token, ruta):
+    """Momento de la sincronización anterior, o None si el token no es válido para la ruta"""
+    try:
+        datos = signing.loads(token, salt=SALT_TOKEN)
+    except signing.BadSignature:
+        return None
+    if datos.get('ruta') != ruta.id:
+        return None
+    return parse_datetime(datos.get('desde') or '')
+
+
+def etiqueta_jornada(ruta, token=None):
+    """ETag del paquete: cambia si cambia la ruta, alguna parada o alguno de sus envíos"""
+    version = ruta.envios_ruta.aggregate(
+        paradas=Count('id'),
+        parada=Max('fecha_actualizacion'),
+        envio=Max('envio__actualizado_en'),
+    )
+    base = f"{ruta.id}|{ruta.fecha_actualizacion.isoformat()}|{version['paradas']}|{version['parada']}|{version['envio']}|{token or ''}"
+    return hashlib.md5(base.encode('utf-8')).hexdigest()
+
+
+def paquete_jornada(ruta, token=None):
+    """
+    Arma el paquete de la jornada.
+
+    Sin token (o con uno inválido) incluye todas las paradas. Con un token
+    válido incluye solo las paradas modificadas desde entonces y la lista
+    completa de ids para que la app descarte las que ya no están en la ruta.
+    Las paradas modificadas poco antes del corte anterior pueden repetirse
+    (ver MARGEN_CORTE).
+    """
+    corte = timezone.now()
+    desde = leer_token(token, ruta) if token else None
+    paradas = ruta.envios_ruta.select_related('envio').order_by('orden_entrega')
+
+    paquete = {'completo': desde is None}
+    if desde is not None:
+        paquete['ids_paradas'] = list(paradas.values_list('id', flat=True))
+        paradas = paradas.filter(Q(fecha_actualizacion__gt=desde) | Q(envio__actualizado_en__gt=desde))
+
+    paquete.update({
+        'ruta': RutaJornadaSerializer(ruta).data,
+        'paradas': EnvioRutaSerializer(paradas, many=True).data,
+        'token': generar_token(ruta, corte - MARGEN_CORTE),
+        'generado_en': corte,
+    })
+    return paquete
+
+
+def _conflicto_evento(parada, evento):
+    """Motivo por el que el evento no se puede aplicar, o None"""
+    if parada is None:
+        return 'La parada no pertenece a las rutas del conductor'
+    if parada.ruta.estado in ('completada', 'cancelada'):
+        return 'La ruta ya está finalizada'
+    if parada.estado == 'entregado':
+        return 'La parada ya fue entregada'
+    if parada.fecha_intento_entrega and parada.fecha_intento_entrega > evento['ocurrido_en']:
+        return 'La parada tiene un intento posterior registrado'
+    return None
+
+
+def _aplicar_evento(parada, evento):
+    tipo = evento['tipo']
+    if tipo == 'entregado':
+        parada.marcar_entregado(
+            firma_digital=evento.get('firma_digital'),
+            latitud=evento.get('latitud'),
+            longitud=evento.get('longitud'),
+            fecha=evento['ocurrido_en'],
+        )
+    elif tipo == 'fallido':
+        parada.marcar_fallido(
+            motivo=evento.get('motivo_fallo') or 'No especificado',
+            latitud=evento.get('latitud'),
+            longitud=evento.get('longitud'),
+            fecha=evento['ocurrido_en'],
+        )
+    else:
+        parada.cambiar_estado(tipo)
+        parada.notas = evento.get('notas', parada.notas)
+        parada.save(update_fields=['notas', 'fecha_actualizacion'])
+
+
+def _resultado(evento_id, resultado, parada=None, detalle=''):
+    return {
+        'id': evento_id,
+        'resultado': resultado,
+        'detalle': detalle,
+        'parada': EnvioRutaSerializer(parada).data if parada else None,
+    }
+
+
+def aplicar_eventos(conductor, eventos):
+    """
+    Aplica un lote de eventos de entrega encolados por la app.
+
+    Los eventos se aplican en el orden en que ocurrieron. Un id ya recibido
+    devuelve 'duplicado' sin volver a aplicarse, de modo que la app puede
+    reintentar el lote completo sin riesgo de entregas dobles.
+
+    Returns:
+        Lista de resultados ('aplicado', 'conflicto', 'duplicado' o 'rechazado')
+    """
+    resultados = []
+    validos = []
+    for datos in eventos:
+        serializer = EventoEntregaSerializer(data=datos)
+        if serializer.is_valid():
+            validos.append(serializer.validated_data)
+        else:
+            evento_id = datos.get('id') if isinstance(datos, dict) else None
+            resultados.append(dict(_resultado(evento_id, 'rechazado'), errores=serializer.errors))
+    validos.sort(key=lambda evento: evento['ocurrido_en'])
+
+    previos = {
+        registro.evento_id: registro
+        for registro in EventoSincronizacion.objects.filter(
+            conductor=conductor, evento_id__in=[evento['id'] for evento in validos]
+        )
+    }
+    paradas = EnvioRuta.objects.filter(ruta__conductor=conductor).select_related('envio', 'ruta').in_bulk(
+        [evento['envio_ruta'] for evento in validos]
+    )
+
+    for evento in validos:
+        parada = paradas.get(evento['envio_ruta'])
+        previo = previos.get(evento['id'])
+        if previo:
+            resultados.append(_resultado(evento['id'], 'duplicado', parada, previo.detalle))
+            continue
+
+        detalle = _conflicto_evento(parada, evento)
+        try:
+            with transaction.atomic():
+                if detalle is None:
+                    try:
+                        with transaction.atomic():
+                            _aplicar_evento(parada, evento)
+                    except TransicionNoPermitida as error:
+                        # El conflicto se revisó con la parada leída al inicio del
+                        # lote; otro request pudo cerrarla después
+                        detalle = str(error)
+                        parada.refresh_from_db()
+                previos[evento['id']] = EventoSincronizacion.objects.create(
+                    conductor=conductor,
+                    evento_id=evento['id'],
+                    envio_ruta=parada,
+                    tipo=evento['tipo'],
+                    ocurrido_en=evento['ocurrido_en'],
+                    resultado='conflicto' if detalle else 'aplicado',
+                    detalle=detalle or '',
+                )
+        except IntegrityError:
+            # Un reintento concurrente ya registró el mismo evento
+            if parada:
+                parada.refresh_from_db()
+            resultados.append(_resultado(evento['id'], 'duplicado', parada))
+            continue
+        resultados.append(_resultado(evento['id'], 'conflicto' if detalle else 'aplicado', parada, detalle or ''))
+
+    return resultados
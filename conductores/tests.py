@@ -1,3 +1,363 @@
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from envios.models import Envio
+from datetime import timedelta
+from . import sincronizacion
+from .models import Conductor, RutaConductor, EnvioRuta, EventoSincronizacion, TransicionNoPermitida
+from .optimizacion import optimizar_secuencia, optimizar_ruta
+from .planificacion import agrupar_por_barrido, planificar_rutas
+from flota.models import TipoVehiculo, Vehiculo
 
-# Create your tests here.
+
+class RutaConductorTestMixin:
+    def crear_ruta(self, coordenadas, nombre_ruta='Ruta Test'):
+        """Crea una ruta con un envío por cada (lat, lng); None deja el envío sin coordenadas"""
+        if not hasattr(self, 'conductor'):
+            self.user = User.objects.create_user(username='conductor', password='testpass123')
+            self.conductor = Conductor.objects.create(
+                usuario=self.user,
+                licencia_conducir='LIC-TEST',
+                fecha_vencimiento_licencia=timezone.now().date(),
+            )
+        ruta = RutaConductor.objects.create(conductor=self.conductor, nombre_ruta=nombre_ruta)
+        for i, punto in enumerate(coordenadas, start=1):
+            envio = Envio.objects.create(
+                codigo=f'{nombre_ruta}-{i}',
+                origen='Santiago',
+                destino='Santiago',
+                destinatario_nombre=f'Cliente {i}',
+                direccion_destino=f'Calle {i}',
+                destino_lat=punto[0] if punto else None,
+                destino_lng=punto[1] if punto else None,
+            )
+            EnvioRuta.objects.create(ruta=ruta, envio=envio, orden_entrega=i)
+        ruta.total_envios = len(coordenadas)
+        ruta.save(update_fields=['total_envios'])
+        return ruta
+
+
+class OptimizacionRutaTest(RutaConductorTestMixin, TestCase):
+    def test_secuencia_sobre_una_linea(self):
+        """Test que paradas colineales se recorren en orden sin retrocesos"""
+        lngs = [-70.60, -70.64, -70.61, -70.63, -70.62]
+        orden, distancia = optimizar_secuencia([-33.45] * 5, lngs)
+        visitadas = [lngs[k] for k in orden]
+        self.assertIn(visitadas, [sorted(lngs), sorted(lngs, reverse=True)])
+        self.assertAlmostEqual(distancia, 0.04 * 93.0, delta=0.2)
+
+    def test_secuencia_respeta_origen(self):
+        """Test que el recorrido parte por la parada más cercana al origen"""
+        orden, _ = optimizar_secuencia([-33.45, -33.45, -33.45], [-70.60, -70.70, -70.65], origen=(-33.45, -70.71))
+        self.assertEqual(orden, [1, 2, 0])
+
+    def test_secuencia_vacia(self):
+        """Test optimizar sin paradas"""
+        self.assertEqual(optimizar_secuencia([], []), ([], 0.0))
+
+    def test_optimizar_ruta_actualiza_orden_y_totales(self):
+        """Test que la ruta queda ordenada y con distancia y tiempo calculados"""
+        ruta = self.crear_ruta([(-33.45, -70.60), (-33.45, -70.64), None, (-33.45, -70.62)])
+        optimizar_ruta(ruta)
+        ruta.refresh_from_db()
+        codigos = list(ruta.envios_ruta.order_by('orden_entrega').values_list('envio__codigo', flat=True))
+        self.assertIn(codigos[:3], [['Ruta Test-1', 'Ruta Test-4', 'Ruta Test-2'], ['Ruta Test-2', 'Ruta Test-4', 'Ruta Test-1']])
+        self.assertEqual(codigos[3], 'Ruta Test-3')
+        self.assertGreater(ruta.distancia_total_km, 0)
+        self.assertGreater(ruta.tiempo_estimado_minutos, 0)
+
+    def test_optimizar_ruta_conserva_paradas_cerradas(self):
+        """Test que las paradas ya entregadas mantienen su posición"""
+        ruta = self.crear_ruta([(-33.45, -70.70), (-33.45, -70.60), (-33.45, -70.69)])
+        ruta.envios_ruta.filter(orden_entrega=1).update(estado='entregado')
+        optimizar_ruta(ruta)
+        codigos = list(ruta.envios_ruta.order_by('orden_entrega').values_list('envio__codigo', flat=True))
+        self.assertEqual(codigos, ['Ruta Test-1', 'Ruta Test-3', 'Ruta Test-2'])
+
+
+class ProgresoRutaTest(RutaConductorTestMixin, TestCase):
+    def setUp(self):
+        self.ruta = self.crear_ruta([(-33.45, -70.60), (-33.45, -70.61), (-33.45, -70.62)])
+        self.paradas = list(self.ruta.envios_ruta.order_by('orden_entrega'))
+
+    def test_transiciones_ajustan_contadores(self):
+        """Test que cada cambio de estado ajusta los contadores con deltas"""
+        self.paradas[0].marcar_entregado()
+        self.paradas[1].marcar_fallido('Cliente ausente')
+        self.ruta.refresh_from_db()
+        self.assertEqual((self.ruta.envios_entregados, self.ruta.envios_fallidos), (1, 1))
+
+        # Reintento exitoso de un envío fallido
+        self.paradas[1].marcar_entregado()
+        self.ruta.refresh_from_db()
+        self.assertEqual((self.ruta.envios_entregados, self.ruta.envios_fallidos), (2, 0))
+
+        # Marcar dos veces no duplica la entrega
+        self.paradas[1].marcar_entregado()
+        self.ruta.refresh_from_db()
+        self.assertEqual(self.ruta.envios_entregados, 2)
+
+    def test_toques_simultaneos_no_desajustan_contadores(self):
+        """Test que dos instancias desactualizadas de la misma parada cuentan cada transición una vez"""
+        primera = EnvioRuta.objects.get(pk=self.paradas[0].pk)
+        segunda = EnvioRuta.objects.get(pk=self.paradas[0].pk)
+        primera.marcar_entregado()
+        segunda.marcar_entregado()
+        self.ruta.refresh_from_db()
+        self.assertEqual((self.ruta.envios_entregados, self.ruta.envios_fallidos), (1, 0))
+
+        # La segunda instancia aún cree que la parada estaba pendiente
+        tercera = EnvioRuta.objects.get(pk=self.paradas[1].pk)
+        EnvioRuta.objects.get(pk=tercera.pk).marcar_fallido('Cliente ausente')
+        tercera.marcar_entregado()
+        self.ruta.refresh_from_db()
+        self.assertEqual((self.ruta.envios_entregados, self.ruta.envios_fallidos), (2, 0))
+        self.assertEqual(EnvioRuta.objects.get(pk=tercera.pk).estado, 'entregado')
+
+    def test_parada_entregada_no_cambia_desde_una_instancia_desactualizada(self):
+        """Test que una parada entregada no pasa a fallida ni deja escritos los datos del intento"""
+        desactualizada = EnvioRuta.objects.get(pk=self.paradas[0].pk)
+        self.paradas[0].marcar_entregado()
+        with self.assertRaises(TransicionNoPermitida):
+            desactualizada.marcar_fallido('Cliente ausente')
+
+        parada = EnvioRuta.objects.get(pk=self.paradas[0].pk)
+        self.assertEqual((parada.estado, parada.motivo_fallo), ('entregado', None))
+        self.assertEqual(parada.envio.estado, 'entregado')
+        self.ruta.refresh_from_db()
+        self.assertEqual((self.ruta.envios_entregados, self.ruta.envios_fallidos), (1, 0))
+
+    def test_contador_ruta_es_un_update(self):
+        """Test que el ajuste de progreso no carga la ruta"""
+        parada = self.paradas[0]
+        parada.estado = 'entregado'
+        with self.assertNumQueries(1):
+            parada.ajustar_progreso_ruta('pendiente')
+
+    def test_reconciliacion_corrige_diferencias(self):
+        """Test que la reconciliación recalcula los contadores desde las paradas"""
+        EnvioRuta.objects.filter(pk=self.paradas[0].pk).update(estado='entregado')
+        RutaConductor.objects.filter(pk=self.ruta.pk).update(total_envios=7, envios_fallidos=2)
+        call_command('reconciliar_progreso_rutas', stdout=StringIO())
+        self.ruta.refresh_from_db()
+        self.assertEqual(
+            (self.ruta.total_envios, self.ruta.envios_entregados, self.ruta.envios_fallidos),
+            (3, 1, 0),
+        )
+
+
+class JornadaConductorAPITest(RutaConductorTestMixin, TestCase):
+    url = '/conductores/api/rutas/jornada/'
+
+    def setUp(self):
+        self.ruta = self.crear_ruta([(-33.45, -70.60), (-33.45, -70.61), (-33.45, -70.62)])
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+
+    def test_paquete_completo_con_consultas_constantes(self):
+        """Test que el paquete trae todas las paradas sin cargas perezosas por parada"""
+        with self.assertNumQueries(6):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['completo'])
+        self.assertEqual(response.data['ruta']['id'], self.ruta.id)
+        self.assertEqual([p['envio']['codigo'] for p in response.data['paradas']],
+                         ['Ruta Test-1', 'Ruta Test-2', 'Ruta Test-3'])
+
+    def envejecer_paradas(self):
+        """Deja las paradas y sus envíos modificados antes del margen del token"""
+        antes = timezone.now() - sincronizacion.MARGEN_CORTE * 2
+        self.ruta.envios_ruta.update(fecha_actualizacion=antes)
+        Envio.objects.filter(rutas__ruta=self.ruta).update(actualizado_en=antes)
+
+    def test_token_devuelve_solo_cambios(self):
+        """Test que con el token solo vuelven las paradas modificadas"""
+        self.envejecer_paradas()
+        token = self.client.get(self.url).data['token']
+        parada = self.ruta.envios_ruta.get(orden_entrega=2)
+        parada.marcar_fallido('Dirección incorrecta')
+
+        response = self.client.get(self.url, {'token': token})
+        self.assertFalse(response.data['completo'])
+        self.assertEqual([p['id'] for p in response.data['paradas']], [parada.id])
+        self.assertEqual(len(response.data['ids_paradas']), 3)
+        self.assertEqual(response.data['ruta']['envios_fallidos'], 1)
+
+    def test_token_incluye_cambios_confirmados_despues_del_corte(self):
+        """Test que una parada guardada antes del corte pero confirmada después no se pierde"""
+        self.envejecer_paradas()
+        response = self.client.get(self.url)
+        parada = self.ruta.envios_ruta.get(orden_entrega=3)
+        # La transacción fijó la fecha antes de armar el paquete y terminó después
+        EnvioRuta.objects.filter(pk=parada.pk).update(
+            estado='reprogramado', fecha_actualizacion=response.data['generado_en'] - timedelta(seconds=5)
+        )
+
+        response = self.client.get(self.url, {'token': response.data['token']})
+        self.assertEqual([p['id'] for p in response.data['paradas']], [parada.id])
+
+    def test_etag_sin_cambios_responde_304(self):
+        """Test que una descarga repetida sin cambios responde 304"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.ruta.envios_ruta.get(orden_entrega=1).marcar_entregado()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SincronizacionOfflineAPITest(RutaConductorTestMixin, TestCase):
+    url = '/conductores/api/sincronizar/'
+
+    def setUp(self):
+        self.ruta = self.crear_ruta([(-33.45, -70.60), (-33.45, -70.61)])
+        self.paradas = list(self.ruta.envios_ruta.order_by('orden_entrega'))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        self.hace_una_hora = timezone.now() - timedelta(hours=1)
+
+    def evento(self, evento_id, parada, tipo, minutos=0, **extra):
+        return dict({
+            'id': evento_id,
+            'envio_ruta': parada.id,
+            'tipo': tipo,
+            'ocurrido_en': (self.hace_una_hora + timedelta(minutes=minutos)).isoformat(),
+        }, **extra)
+
+    def test_lote_se_aplica_en_orden_cronologico(self):
+        """Test que los eventos se aplican por orden de ocurrencia y no de llegada"""
+        eventos = [
+            self.evento('ev-2', self.paradas[0], 'entregado', minutos=10),
+            self.evento('ev-1', self.paradas[0], 'fallido', minutos=5, motivo_fallo='Cliente ausente'),
+            self.evento('ev-3', self.paradas[1], 'entregado', minutos=20),
+        ]
+        response = self.client.post(self.url, {'eventos': eventos}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['id'] for r in response.data['resultados']], ['ev-1', 'ev-2', 'ev-3'])
+        self.assertEqual(response.data['aplicados'], 3)
+        self.ruta.refresh_from_db()
+        self.assertEqual((self.ruta.envios_entregados, self.ruta.envios_fallidos), (2, 0))
+        parada = EnvioRuta.objects.get(pk=self.paradas[0].pk)
+        self.assertEqual(parada.fecha_intento_entrega, self.hace_una_hora + timedelta(minutes=10))
+
+    def test_reintento_no_duplica_entregas(self):
+        """Test que reenviar el mismo lote no vuelve a aplicar los eventos"""
+        eventos = [self.evento('ev-1', self.paradas[0], 'entregado')]
+        self.client.post(self.url, {'eventos': eventos}, format='json')
+        response = self.client.post(self.url, {'eventos': eventos}, format='json')
+
+        self.assertEqual(response.data['resultados'][0]['resultado'], 'duplicado')
+        self.assertEqual(EventoSincronizacion.objects.count(), 1)
+        self.ruta.refresh_from_db()
+        self.assertEqual(self.ruta.envios_entregados, 1)
+
+    def test_conflictos_y_eventos_invalidos(self):
+        """Test que los eventos que no aplican se informan como conflicto o rechazados"""
+        self.paradas[0].marcar_entregado()
+        eventos = [
+            self.evento('ev-1', self.paradas[0], 'fallido', motivo_fallo='Cliente ausente'),
+            {'id': 'ev-2', 'tipo': 'entregado'},
+        ]
+        response = self.client.post(self.url, {'eventos': eventos}, format='json')
+
+        resultados = {r['id']: r['resultado'] for r in response.data['resultados']}
+        self.assertEqual(resultados, {'ev-1': 'conflicto', 'ev-2': 'rechazado'})
+        self.assertEqual(len(response.data['conflictos']), 2)
+        self.assertEqual(EnvioRuta.objects.get(pk=self.paradas[0].pk).estado, 'entregado')
+
+    def test_entrega_concurrente_se_informa_como_conflicto(self):
+        """Test que un evento revisado contra la parada leída antes de una entrega en línea no la pisa"""
+        self.paradas[0].marcar_entregado()
+        eventos = [self.evento('ev-1', self.paradas[0], 'fallido', motivo_fallo='Cliente ausente')]
+        # La revisión previa no ve la entrega, como si ocurriera justo después de leer el lote
+        with mock.patch('conductores.sincronizacion._conflicto_evento', return_value=None):
+            response = self.client.post(self.url, {'eventos': eventos}, format='json')
+
+        self.assertEqual(response.data['resultados'][0]['resultado'], 'conflicto')
+        self.assertEqual(EventoSincronizacion.objects.get().resultado, 'conflicto')
+        self.assertEqual(EnvioRuta.objects.get(pk=self.paradas[0].pk).estado, 'entregado')
+        self.ruta.refresh_from_db()
+        self.assertEqual((self.ruta.envios_entregados, self.ruta.envios_fallidos), (1, 0))
+
+
+class PlanificacionRutasTest(TestCase):
+    def setUp(self):
+        self.tipo = TipoVehiculo.objects.create(
+            nombre='Furgón',
+            capacidad_carga_kg=10,
+            capacidad_volumen_m3=8,
+            consumo_combustible_km=0.1,
+        )
+        self.conductores = []
+        for i in range(2):
+            user = User.objects.create_user(username=f'conductor{i}', password='testpass123')
+            conductor = Conductor.objects.create(
+                usuario=user,
+                licencia_conducir=f'LIC-{i}',
+                fecha_vencimiento_licencia=timezone.now().date(),
+            )
+            Vehiculo.objects.create(
+                numero_placa=f'AB-CD-1{i}',
+                tipo_vehiculo=self.tipo,
+                marca='Marca',
+                modelo='Modelo',
+                año_fabricacion=2020,
+                numero_chasis=f'CHASIS-{i}',
+                numero_motor=f'MOTOR-{i}',
+                capacidad_tanque_litros=60,
+                consumo_promedio_km=0.1,
+                estado='en_uso',
+                conductor_asignado=conductor,
+            )
+            self.conductores.append(conductor)
+
+    def crear_envio(self, codigo, lat, lng, peso):
+        return Envio.objects.create(
+            codigo=codigo,
+            origen='Santiago',
+            destino='Santiago',
+            destinatario_nombre='Cliente',
+            direccion_destino='Calle 1',
+            destino_lat=lat,
+            destino_lng=lng,
+            peso_kg=peso,
+        )
+
+    def test_barrido_respeta_capacidad(self):
+        """Test que ningún grupo supera la capacidad de su vehículo"""
+        pesos = [4, 4, 4, 4, 4, 30]
+        grupos, sin_asignar = agrupar_por_barrido(
+            [0, 1, 0, -1, 0.5, 0], [1, 0, -1, 0, 0.5, 0.9], pesos, [10, 10], (0, 0)
+        )
+        for grupo in grupos:
+            self.assertLessEqual(sum(pesos[i] for i in grupo), 10)
+        self.assertIn(5, sin_asignar)
+        self.assertEqual(sorted(sum(grupos, []) + sin_asignar), list(range(6)))
+
+    def test_planificar_rutas_crea_rutas_y_paradas(self):
+        """Test que la planificación crea una ruta por conductor con sus envíos ordenados"""
+        for i in range(6):
+            self.crear_envio(f'PLAN-{i}', -33.45 + i * 0.01, -70.65, 3)
+
+        resumen = planificar_rutas(procesos=1)
+
+        self.assertEqual(resumen['rutas_creadas'], 2)
+        self.assertEqual(resumen['envios_asignados'], 6)
+        self.assertEqual(resumen['envios_sin_asignar'], 0)
+        for ruta in RutaConductor.objects.all():
+            self.assertEqual(ruta.total_envios, ruta.envios_ruta.count())
+            self.assertEqual(
+                sorted(ruta.envios_ruta.values_list('orden_entrega', flat=True)),
+                list(range(1, ruta.total_envios + 1)),
+            )
+            self.assertLessEqual(sum(er.envio.peso_kg for er in ruta.envios_ruta.all()), 10)
+
+        # Una segunda planificación no vuelve a asignar los mismos envíos
+        self.assertEqual(planificar_rutas(procesos=1)['rutas_creadas'], 0)
@@ -8,6 +8,7 @@ from .views import (
     IncidenciaConductorViewSet,
     LoginConductorAPIView,
     LogoutConductorAPIView,
+    SincronizacionConductorAPIView,
 )
 from .views_web import (
     dashboard_conductor,
@@ -48,5 +49,6 @@ urlpatterns = [
     # Autenticación API
     path('api/login/', LoginConductorAPIView.as_view(), name='login_conductor'),
     path('api/logout/', LogoutConductorAPIView.as_view(), name='logout_conductor'),
+    path('api/sincronizar/', SincronizacionConductorAPIView.as_view(), name='sincronizar'),
     path('api/token-auth/', obtain_auth_token, name='api_token_auth'),
 ]
\ No newline at end of file
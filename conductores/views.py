@@ -6,14 +6,20 @@ from rest_framework.authtoken.models import Token
 from rest_framework.authentication import TokenAuthentication
 from django.contrib.auth import authenticate
 from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
 from django.db.models import Q, Count
-from .models import Conductor, RutaConductor, EnvioRuta, IncidenciaConductor, MetricasConductor
+from .models import Conductor, RutaConductor, EnvioRuta, IncidenciaConductor, MetricasConductor, TransicionNoPermitida
+from .optimizacion import optimizar_ruta, TIEMPO_LIMITE_S
+from .sincronizacion import (
+    ruta_de_la_jornada, etiqueta_jornada, paquete_jornada, aplicar_eventos, MAX_EVENTOS_POR_LOTE
+)
 from .serializers import (
     ConductorSerializer, ConductorUbicacionSerializer, ConductorEstadoSerializer,
     RutaConductorSerializer, RutaConductorCreateSerializer, EnvioRutaSerializer,
     EnvioRutaEntregaSerializer, IncidenciaConductorSerializer, MetricasConductorSerializer,
     LoginSerializer, CambiarPasswordSerializer
 )
+from CorreosChile.paginacion import PaginacionCursor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -195,13 +201,65 @@ class RutaConductorViewSet(viewsets.ModelViewSet):
             'progreso': ruta.progreso
         })
     
+    @action(detail=True, methods=['post'])
+    def optimizar(self, request, pk=None):
+        """Optimizar el orden de entrega de la ruta"""
+        ruta = self.get_object()
+        
+        if ruta.estado in ['completada', 'cancelada']:
+            return Response({
+                'error': 'La ruta ya está finalizada'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            tiempo_limite = min(float(request.data.get('tiempo_limite_s', TIEMPO_LIMITE_S)), 10.0)
+        except (TypeError, ValueError):
+            tiempo_limite = TIEMPO_LIMITE_S
+        
+        optimizar_ruta(ruta, tiempo_limite_s=tiempo_limite)
+        
+        return Response({
+            'status': 'success',
+            'message': 'Ruta optimizada correctamente',
+            'distancia_total_km': ruta.distancia_total_km,
+            'tiempo_estimado_minutos': ruta.tiempo_estimado_minutos,
+            'orden': list(ruta.envios_ruta.order_by('orden_entrega').values_list('id', flat=True))
+        })
+    
+    @action(detail=False, methods=['get'])
+    def jornada(self, request):
+        """Ruta activa del conductor con todas sus paradas en un solo paquete"""
+        user = request.user
+        
+        if not hasattr(user, 'conductor'):
+            return Response({
+                'error': 'Usuario no es conductor'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        ruta = ruta_de_la_jornada(user.conductor)
+        if not ruta:
+            return Response({
+                'error': 'No hay ruta para hoy'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        # Si nada cambió desde la última descarga se responde 304 sin cuerpo
+        token = request.query_params.get('token')
+        etag = quote_etag(etiqueta_jornada(ruta, token))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        response = Response(paquete_jornada(ruta, token))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
     @action(detail=True, methods=['get'])
     def envios_pendientes(self, request, pk=None):
         """Obtener envíos pendientes de la ruta"""
         ruta = self.get_object()
         envios_pendientes = ruta.envios_ruta.filter(
             estado__in=['pendiente', 'en_camino']
-        ).order_by('orden_entrega')
+        ).select_related('envio').order_by('orden_entrega')
         
         serializer = EnvioRutaSerializer(envios_pendientes, many=True)
         return Response(serializer.data)
@@ -244,6 +302,8 @@ class EnvioRutaViewSet(viewsets.ModelViewSet):
                     'message': 'Envío marcado como entregado',
                     'estado': envio_ruta.estado
                 })
+            except TransicionNoPermitida as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
             except Exception as e:
                 logger.error(f"Error al marcar envío como entregado: {e}")
                 return Response({
@@ -270,6 +330,8 @@ class EnvioRutaViewSet(viewsets.ModelViewSet):
                     'message': 'Envío marcado como fallido',
                     'estado': envio_ruta.estado
                 })
+            except TransicionNoPermitida as e:
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
             except Exception as e:
                 logger.error(f"Error al marcar envío como fallido: {e}")
                 return Response({
@@ -299,7 +361,7 @@ class EnvioRutaViewSet(viewsets.ModelViewSet):
             proximos_envios = EnvioRuta.objects.filter(
                 ruta=ruta_actual,
                 estado__in=['pendiente', 'en_camino']
-            ).order_by('orden_entrega')[:5]
+            ).select_related('envio').order_by('orden_entrega')[:5]
             
             serializer = self.get_serializer(proximos_envios, many=True)
             return Response(serializer.data)
@@ -318,6 +380,8 @@ class IncidenciaConductorViewSet(viewsets.ModelViewSet):
     serializer_class = IncidenciaConductorSerializer
     permission_classes = [permissions.IsAuthenticated]
     authentication_classes = [TokenAuthentication]
+    pagination_class = PaginacionCursor
+    campo_cursor = 'fecha_reporte'
     
     def get_queryset(self):
         """Filtrar incidencias según el usuario"""
@@ -444,3 +508,36 @@ class LogoutConductorAPIView(APIView):
             return Response({
                 'error': 'Error al procesar logout'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SincronizacionConductorAPIView(APIView):
+    """
+    API para subir en lote las entregas registradas sin conexión
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = [TokenAuthentication]
+    
+    def post(self, request):
+        if not hasattr(request.user, 'conductor'):
+            return Response({
+                'error': 'Usuario no es conductor'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        eventos = request.data.get('eventos')
+        if not isinstance(eventos, list):
+            return Response({
+                'error': 'Se requiere la lista de eventos'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(eventos) > MAX_EVENTOS_POR_LOTE:
+            return Response({
+                'error': f'Máximo {MAX_EVENTOS_POR_LOTE} eventos por lote'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        resultados = aplicar_eventos(request.user.conductor, eventos)
+        
+        return Response({
+            'status': 'success',
+            'resultados': resultados,
+            'aplicados': sum(1 for r in resultados if r['resultado'] == 'aplicado'),
+            'conflictos': [r for r in resultados if r['resultado'] in ('conflicto', 'rechazado')]
+        })
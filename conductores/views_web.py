@@ -7,6 +7,7 @@ from django.utils import timezone
 from django.db.models import Count, Q
 from .models import Conductor, RutaConductor, EnvioRuta, IncidenciaConductor, MetricasConductor
 from envios.models import Envio
+from CorreosChile.fechas import filtrar_por_fechas
 import json
 
 
@@ -20,7 +21,7 @@ def dashboard_conductor(request):
         return redirect('usuarios:index')
     
     # Obtener métricas del día actual
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
     
     # Ruta actual en progreso
     ruta_actual = RutaConductor.objects.filter(
@@ -50,9 +51,8 @@ def dashboard_conductor(request):
         envios_pendientes = []
     
     # Incidencias recientes
-    incidencias_recientes = IncidenciaConductor.objects.filter(
-        conductor=conductor,
-        fecha_reporte__date=hoy
+    incidencias_recientes = filtrar_por_fechas(
+        IncidenciaConductor.objects.filter(conductor=conductor), 'fecha_reporte', hoy, hoy
     ).order_by('-fecha_reporte')[:3]
     
     # Historial de rutas recientes
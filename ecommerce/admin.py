@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PlataformaEcommerce, PedidoEcommerce, ProductoPedido, WebhookLog
+from .models import PlataformaEcommerce, PedidoEcommerce, ProductoPedido, WebhookLog, EventoWebhookRecibido, SincronizacionEstado, WebhookLogArchivado
 
 
 @admin.register(PlataformaEcommerce)
@@ -34,8 +34,35 @@ class ProductoPedidoAdmin(admin.ModelAdmin):
 
 @admin.register(WebhookLog)
 class WebhookLogAdmin(admin.ModelAdmin):
-    list_display = ['plataforma', 'evento_tipo', 'nivel', 'procesado_exitoso', 'creado_en']
-    list_filter = ['nivel', 'procesado_exitoso', 'plataforma__tipo', 'creado_en']
+    list_display = ['plataforma', 'evento_tipo', 'nivel', 'estado_procesamiento', 'intentos', 'procesado_exitoso', 'creado_en']
+    list_filter = ['nivel', 'estado_procesamiento', 'procesado_exitoso', 'plataforma__tipo', 'creado_en']
     search_fields = ['evento_tipo', 'mensaje', 'evento_id']
-    readonly_fields = ['creado_en']
-    ordering = ['-creado_en']
\ No newline at end of file
+    readonly_fields = ['datos', 'ultimo_error', 'creado_en', 'procesado_en']
+    exclude = ['datos_comprimidos']
+    ordering = ['-creado_en']
+
+
+@admin.register(EventoWebhookRecibido)
+class EventoWebhookRecibidoAdmin(admin.ModelAdmin):
+    list_display = ['plataforma', 'topico', 'evento_id', 'recibido_en']
+    list_filter = ['plataforma__tipo', 'topico']
+    search_fields = ['evento_id']
+    readonly_fields = ['plataforma', 'topico', 'evento_id', 'hash_payload', 'recibido_en']
+
+
+@admin.register(SincronizacionEstado)
+class SincronizacionEstadoAdmin(admin.ModelAdmin):
+    list_display = ['pedido', 'estado', 'estado_entrega', 'intentos', 'codigo_respuesta', 'proximo_intento', 'enviado_en']
+    list_filter = ['estado_entrega', 'pedido__plataforma__tipo']
+    search_fields = ['pedido__numero_orden', 'tracking_codigo']
+    readonly_fields = ['creado_en', 'enviado_en']
+    raw_id_fields = ['pedido']
+
+
+@admin.register(WebhookLogArchivado)
+class WebhookLogArchivadoAdmin(admin.ModelAdmin):
+    list_display = ['plataforma', 'evento_tipo', 'nivel', 'procesado_exitoso', 'creado_en', 'archivado_en']
+    list_filter = ['nivel', 'plataforma__tipo']
+    search_fields = ['evento_tipo', 'evento_id']
+    exclude = ['datos_comprimidos']
+    readonly_fields = ['datos', 'creado_en', 'archivado_en']
@@ -0,0 +1,91 @@
+"""
+Catálogo de la tienda (static/ecommerce/catalogo.json).
+
+El archivo se lee y ordena una sola vez por proceso y se vuelve a cargar
+solo cuando cambia su fecha de modificación. Si se define el setting
+ECOMMERCE_CATALOGO_CACHE con el alias de un cache de Django, el catálogo
+ya procesado se comparte entre los workers.
+"""
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+CATALOGO_POR_DEFECTO = {
+    'shopify': [
+        {'sku':'SH-1001','nombre':'Polera Correos', 'precio': 12990, 'img': '/static/img/tienda/polera_correos.svg', 'peso':0.3, 'orden':1},
+        {'sku':'SH-1002','nombre':'Gorro Azul', 'precio': 7990, 'img': '/static/img/tienda/gorro_azul.svg', 'peso':0.2, 'orden':2},
+        {'sku':'SH-1003','nombre':'Polerón Rojo', 'precio': 19990, 'img': '/static/img/tienda/poleron_rojo.svg', 'peso':0.6, 'orden':3},
+    ],
+    'amazon': [
+        {'sku':'AM-2001','nombre':'Caja pequeña', 'precio': 3990, 'img': '/static/img/tienda/caja_pequena.svg', 'peso':0.4, 'orden':1},
+        {'sku':'AM-2002','nombre':'Caja mediana', 'precio': 6990, 'img': '/static/img/tienda/caja_mediana.svg', 'peso':0.8, 'orden':2},
+        {'sku':'AM-2003','nombre':'Caja grande', 'precio': 9990, 'img': '/static/img/tienda/caja_grande.svg', 'peso':1.5, 'orden':3},
+    ]
+}
+
+# (ruta, mtime) -> catálogo ordenado
+_cargados = {}
+_lock = threading.Lock()
+
+
+def ruta_catalogo():
+    return os.path.join(settings.BASE_DIR, 'static', 'ecommerce', 'catalogo.json')
+
+
+def _ordenar(productos):
+    """Ordena los productos de cada empresa por 'orden' si existe"""
+    for k in list(productos.keys()):
+        try:
+            productos[k] = sorted(productos[k], key=lambda x: x.get('orden', 999))
+        except Exception:
+            pass
+    return productos
+
+
+def _leer(ruta):
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def obtener_catalogo(ruta=None):
+    """
+    Catálogo ordenado por empresa.
+
+    La estructura devuelta es compartida entre requests: no se debe modificar.
+    """
+    ruta = ruta or ruta_catalogo()
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except OSError:
+        mtime = None
+    clave = (ruta, mtime)
+
+    productos = _cargados.get(clave)
+    if productos is not None:
+        return productos
+
+    with _lock:
+        productos = _cargados.get(clave)
+        if productos is not None:
+            return productos
+
+        alias = getattr(settings, 'ECOMMERCE_CATALOGO_CACHE', None)
+        clave_cache = f'ecommerce:catalogo:{mtime}'
+        if alias:
+            productos = caches[alias].get(clave_cache)
+        if productos is None:
+            productos = _ordenar((_leer(ruta) if mtime is not None else None) or dict(CATALOGO_POR_DEFECTO))
+            if alias:
+                caches[alias].set(clave_cache, productos, None)
+
+        # Solo se conserva la última versión del archivo
+        for anterior in [c for c in _cargados if c[0] == ruta]:
+            del _cargados[anterior]
+        _cargados[clave] = productos
+        return productos
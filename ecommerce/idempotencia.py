@@ -0,0 +1,59 @@
+"""
+Deduplicación de webhooks de e-commerce.
+
+Las plataformas reintentan un webhook cuando no reciben respuesta a tiempo.
+Cada entrega se registra en una tabla compacta con clave única por
+(plataforma, tópico, id de evento, hash del cuerpo): un reintento cuesta un
+INSERT rechazado por el índice y no vuelve a encolarse ni a guardarse
+completo en WebhookLog.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import EventoWebhookRecibido
+
+DIAS_RETENCION = 7
+TAMANO_LOTE_LIMPIEZA = 1000
+
+
+def hash_cuerpo(cuerpo):
+    return hashlib.sha256(cuerpo).hexdigest()
+
+
+def registrar_evento(plataforma, topico, evento_id, cuerpo):
+    """
+    Registra la recepción de un evento.
+
+    Debe llamarse dentro de la misma transacción que encola el webhook: si el
+    encolado falla, el registro se revierte y el reintento de la plataforma
+    no se descarta como duplicado.
+
+    Returns:
+        True si es la primera vez que se recibe, False si es un duplicado
+    """
+    try:
+        with transaction.atomic():
+            EventoWebhookRecibido.objects.create(
+                plataforma=plataforma,
+                topico=topico[:100],
+                evento_id=str(evento_id or '')[:100],
+                hash_payload=hash_cuerpo(cuerpo),
+            )
+        return True
+    except IntegrityError:
+        return False
+
+
+def limpiar_eventos_vencidos(dias=DIAS_RETENCION, tamano_lote=TAMANO_LOTE_LIMPIEZA):
+    """Elimina por lotes los eventos recibidos hace más de `dias` días; devuelve cuántos borró"""
+    limite = timezone.now() - timedelta(days=dias)
+    vencidos = EventoWebhookRecibido.objects.filter(recibido_en__lt=limite)
+    total = 0
+    while True:
+        ids = list(vencidos.values_list('id', flat=True)[:tamano_lote])
+        if not ids:
+            return total
+        total += EventoWebhookRecibido.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from ecommerce.retencion import depurar_webhook_logs, DIAS_RETENCION, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = 'Archiva (o elimina) por lotes los logs de webhooks más antiguos que la retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_RETENCION, help='Días que se conservan en la tabla principal')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Logs por transacción')
+        parser.add_argument('--sin-archivar', action='store_true', help='Eliminar sin copiar al archivo')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError('Los días y el lote deben ser mayores que cero')
+
+        resumen = depurar_webhook_logs(
+            dias=options['dias'],
+            tamano_lote=options['lote'],
+            archivar=not options['sin_archivar'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Logs archivados: {resumen['archivados']} - Eliminados: {resumen['eliminados']}"
+        ))
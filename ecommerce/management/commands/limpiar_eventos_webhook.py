@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from ecommerce.idempotencia import limpiar_eventos_vencidos, DIAS_RETENCION, TAMANO_LOTE_LIMPIEZA
+
+
+class Command(BaseCommand):
+    help = 'Elimina los registros de deduplicación de webhooks más antiguos que la retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=DIAS_RETENCION, help='Días de retención')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE_LIMPIEZA, help='Registros por DELETE')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError('Los días y el lote deben ser mayores que cero')
+
+        eliminados = limpiar_eventos_vencidos(dias=options['dias'], tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Eventos eliminados: {eliminados}'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ecommerce.procesamiento import procesar_pendientes, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = 'Procesa por lotes los webhooks de e-commerce encolados como pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Webhooks por lote')
+        parser.add_argument('--limite', type=int, help='Máximo de webhooks a procesar en esta ejecución')
+        parser.add_argument('--continuo', action='store_true', help='Seguir esperando nuevos webhooks')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera con la cola vacía')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('El lote debe ser mayor que cero')
+
+        while True:
+            resumen = procesar_pendientes(tamano_lote=options['lote'], limite=options['limite'])
+            if resumen['procesados'] or resumen['errores'] or not options['continuo']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Webhooks procesados: {resumen['procesados']} - Con error: {resumen['errores']}"
+                ))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ecommerce.sincronizacion import sincronizar_pendientes, TAMANO_LOTE, HILOS, CONEXIONES_POR_PLATAFORMA
+
+
+class Command(BaseCommand):
+    help = 'Envía a las plataformas e-commerce los cambios de estado pendientes de los pedidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Sincronizaciones por lote')
+        parser.add_argument('--hilos', type=int, default=HILOS, help='Envíos concurrentes en total')
+        parser.add_argument('--conexiones', type=int, default=CONEXIONES_POR_PLATAFORMA, help='Conexiones por plataforma')
+        parser.add_argument('--continuo', action='store_true', help='Seguir esperando nuevos cambios')
+        parser.add_argument('--intervalo', type=float, default=10.0, help='Segundos entre pasadas en modo continuo')
+
+    def handle(self, *args, **options):
+        if min(options['lote'], options['hilos'], options['conexiones']) < 1:
+            raise CommandError('El lote, los hilos y las conexiones deben ser mayores que cero')
+
+        while True:
+            resumen = sincronizar_pendientes(
+                tamano_lote=options['lote'],
+                hilos=options['hilos'],
+                conexiones_por_plataforma=options['conexiones'],
+            )
+            if any(resumen.values()) or not options['continuo']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Enviados: {resumen['enviados']} - "
+                    f"Para reintentar: {resumen['reintentos']} - "
+                    f"Fallidos: {resumen['fallidos']} - "
+                    f"Reemplazados: {resumen['reemplazados']}"
+                ))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
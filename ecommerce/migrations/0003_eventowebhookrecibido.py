@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0002_webhooklog_cola'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoWebhookRecibido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topico', models.CharField(max_length=100)),
+                ('evento_id', models.CharField(max_length=100)),
+                ('hash_payload', models.CharField(max_length=64)),
+                ('recibido_en', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('plataforma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_recibidos', to='ecommerce.plataformaecommerce')),
+            ],
+            options={
+                'verbose_name_plural': 'Eventos de Webhooks Recibidos',
+                'unique_together': {('plataforma', 'topico', 'evento_id', 'hash_payload')},
+            },
+        ),
+    ]
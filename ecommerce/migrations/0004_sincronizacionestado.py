@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0003_eventowebhookrecibido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SincronizacionEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(max_length=20)),
+                ('tracking_codigo', models.CharField(blank=True, max_length=50)),
+                ('url_destino', models.URLField(blank=True, null=True)),
+                ('estado_entrega', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('codigo_respuesta', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sincronizaciones', to='ecommerce.pedidoecommerce')),
+            ],
+            options={
+                'verbose_name_plural': 'Sincronizaciones de Estado',
+                'indexes': [models.Index(fields=['estado_entrega', 'proximo_intento'], name='ecommerce_s_estado__1bc203_idx')],
+            },
+        ),
+    ]
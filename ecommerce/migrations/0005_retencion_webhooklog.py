@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0004_sincronizacionestado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookLogArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('webhook_log_id', models.PositiveBigIntegerField(unique=True)),
+                ('evento_tipo', models.CharField(max_length=100)),
+                ('evento_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('nivel', models.CharField(choices=[('info', 'Info'), ('advertencia', 'Advertencia'), ('error', 'Error')], max_length=20)),
+                ('mensaje', models.TextField()),
+                ('datos_comprimidos', models.BinaryField(blank=True, null=True)),
+                ('ip_origen', models.GenericIPAddressField()),
+                ('procesado_exitoso', models.BooleanField(default=False)),
+                ('creado_en', models.DateTimeField(db_index=True)),
+                ('archivado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Logs de Webhooks Archivados',
+            },
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='datos_comprimidos',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['plataforma', 'creado_en'], name='ecommerce_w_platafo_1489a6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['creado_en'], name='ecommerce_w_creado__6c1538_idx'),
+        ),
+        migrations.AddField(
+            model_name='webhooklogarchivado',
+            name='plataforma',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_logs_archivados', to='ecommerce.plataformaecommerce'),
+        ),
+    ]
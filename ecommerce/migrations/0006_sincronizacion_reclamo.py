@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0005_retencion_webhooklog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sincronizacionestado',
+            name='estado_entrega',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('enviado', 'Enviado'), ('fallido', 'Fallido'), ('reemplazado', 'Reemplazado')], default='pendiente', max_length=20),
+        ),
+    ]
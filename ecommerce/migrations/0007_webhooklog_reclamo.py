@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0006_sincronizacion_reclamo'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='webhooklog',
+            name='ecommerce_w_estado__48a6b6_idx',
+        ),
+        migrations.AddField(
+            model_name='webhooklog',
+            name='proximo_intento',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='webhooklog',
+            name='estado_procesamiento',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('procesado', 'Procesado'), ('error', 'Error')], default='procesado', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='webhooklog',
+            index=models.Index(fields=['estado_procesamiento', 'proximo_intento'], name='ecommerce_w_estado__7d1ec3_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0007_webhooklog_reclamo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhooklog',
+            name='ultimo_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
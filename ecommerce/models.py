@@ -1,8 +1,23 @@
+import json
+import zlib
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from envios.models import Envio
 
 
+# Cuerpos de webhook mayores a este tamaño se guardan comprimidos
+UMBRAL_COMPRESION_BYTES = 4096
+
+
+def comprimir_json(datos):
+    return zlib.compress(json.dumps(datos, ensure_ascii=False).encode('utf-8'))
+
+
+def descomprimir_json(blob):
+    return json.loads(zlib.decompress(bytes(blob)).decode('utf-8'))
+
+
 class PlataformaEcommerce(models.Model):
     PLATAFORMAS = (
         ('shopify', 'Shopify'),
@@ -90,6 +105,12 @@ class WebhookLog(models.Model):
         ('advertencia', 'Advertencia'),
         ('error', 'Error'),
     )
+    ESTADOS_PROCESAMIENTO = (
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('procesado', 'Procesado'),
+        ('error', 'Error'),
+    )
     
     plataforma = models.ForeignKey(PlataformaEcommerce, on_delete=models.CASCADE, related_name='webhook_logs')
     evento_tipo = models.CharField(max_length=100)
@@ -97,14 +118,119 @@ class WebhookLog(models.Model):
     nivel = models.CharField(max_length=20, choices=NIVELES_LOG, default='info')
     mensaje = models.TextField()
     datos_recibidos = models.JSONField(blank=True, null=True)
+    datos_comprimidos = models.BinaryField(blank=True, null=True)
     datos_procesados = models.JSONField(blank=True, null=True)
     ip_origen = models.GenericIPAddressField()
     user_agent = models.TextField(blank=True, null=True)
     procesado_exitoso = models.BooleanField(default=False)
+    # Error del último intento de procesamiento; se limpia cuando uno termina bien
+    ultimo_error = models.TextField(blank=True, default='')
+    # Cola de procesamiento: los webhooks entran como 'pendiente' y el resto de los logs como 'procesado'
+    estado_procesamiento = models.CharField(max_length=20, choices=ESTADOS_PROCESAMIENTO, default='procesado')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    # Mientras está 'procesando', fin de la reserva del proceso que lo tomó; si está 'pendiente', próximo reintento
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    procesado_en = models.DateTimeField(blank=True, null=True)
     creado_en = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.plataforma.nombre} - {self.evento_tipo} - {self.nivel}"
 
+    @property
+    def datos(self):
+        """Cuerpo recibido, descomprimido si se guardó comprimido"""
+        if self.datos_comprimidos is not None:
+            return descomprimir_json(self.datos_comprimidos)
+        return self.datos_recibidos
+
+    def save(self, *args, **kwargs):
+        # Los cuerpos grandes se guardan comprimidos para mantener liviana la tabla
+        if self.datos_recibidos is not None:
+            crudo = json.dumps(self.datos_recibidos, ensure_ascii=False).encode('utf-8')
+            if len(crudo) > UMBRAL_COMPRESION_BYTES:
+                self.datos_comprimidos = zlib.compress(crudo)
+                self.datos_recibidos = None
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name_plural = "Logs de Webhooks"
+        indexes = [
+            models.Index(fields=['estado_procesamiento', 'proximo_intento']),
+            models.Index(fields=['plataforma', 'creado_en']),
+            models.Index(fields=['creado_en']),
+        ]
+
+
+class WebhookLogArchivado(models.Model):
+    """Webhooks antiguos movidos fuera de la tabla principal, con el cuerpo siempre comprimido"""
+    webhook_log_id = models.PositiveBigIntegerField(unique=True)
+    plataforma = models.ForeignKey(PlataformaEcommerce, on_delete=models.CASCADE, related_name='webhook_logs_archivados')
+    evento_tipo = models.CharField(max_length=100)
+    evento_id = models.CharField(max_length=100, blank=True, null=True)
+    nivel = models.CharField(max_length=20, choices=WebhookLog.NIVELES_LOG)
+    mensaje = models.TextField()
+    datos_comprimidos = models.BinaryField(blank=True, null=True)
+    ip_origen = models.GenericIPAddressField()
+    procesado_exitoso = models.BooleanField(default=False)
+    creado_en = models.DateTimeField(db_index=True)
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.plataforma_id} - {self.evento_tipo} - {self.nivel}"
+
+    @property
+    def datos(self):
+        if self.datos_comprimidos is None:
+            return None
+        return descomprimir_json(self.datos_comprimidos)
+
+    class Meta:
+        verbose_name_plural = "Logs de Webhooks Archivados"
+
+
+class EventoWebhookRecibido(models.Model):
+    """Registro mínimo de cada webhook aceptado, para descartar reintentos"""
+    plataforma = models.ForeignKey(PlataformaEcommerce, on_delete=models.CASCADE, related_name='eventos_recibidos')
+    topico = models.CharField(max_length=100)
+    evento_id = models.CharField(max_length=100)
+    hash_payload = models.CharField(max_length=64)
+    recibido_en = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.plataforma_id} - {self.topico} - {self.evento_id}"
+
+    class Meta:
+        unique_together = ('plataforma', 'topico', 'evento_id', 'hash_payload')
+        verbose_name_plural = "Eventos de Webhooks Recibidos"
+
+
+class SincronizacionEstado(models.Model):
+    """Actualización de estado pendiente de enviar a la plataforma del pedido"""
+    ESTADOS_ENTREGA = (
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+        ('reemplazado', 'Reemplazado'),
+    )
+
+    pedido = models.ForeignKey(PedidoEcommerce, on_delete=models.CASCADE, related_name='sincronizaciones')
+    estado = models.CharField(max_length=20)
+    tracking_codigo = models.CharField(max_length=50, blank=True)
+    url_destino = models.URLField(blank=True, null=True)
+    estado_entrega = models.CharField(max_length=20, choices=ESTADOS_ENTREGA, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    codigo_respuesta = models.PositiveSmallIntegerField(blank=True, null=True)
+    ultimo_error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.pedido.numero_orden} - {self.estado} - {self.estado_entrega}"
+
     class Meta:
-        verbose_name_plural = "Logs de Webhooks"
\ No newline at end of file
+        verbose_name_plural = "Sincronizaciones de Estado"
+        indexes = [
+            models.Index(fields=['estado_entrega', 'proximo_intento']),
+        ]
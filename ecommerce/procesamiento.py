@@ -0,0 +1,423 @@
+"""
+Procesamiento de los webhooks de e-commerce.
+
+Las vistas de webhook solo verifican la firma, guardan el cuerpo recibido en
+un WebhookLog pendiente y responden de inmediato. El trabajo pesado (pedido,
+productos, envío, bultos y notificación) se hace aquí, en lotes, desde el
+comando procesar_webhooks.
+
+Cada lote se reclama antes de procesarlo (select_for_update con skip_locked
+y paso a 'procesando' por ARRENDAMIENTO_S segundos), así varios procesos
+procesar_webhooks --continuo no toman el mismo webhook. Un webhook con error
+se reintenta con espera exponencial hasta MAX_INTENTOS.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from .models import PedidoEcommerce, ProductoPedido, WebhookLog
+from envios.models import Envio, Bulto
+from busqueda.codigos import indexar_codigos
+from seguimiento.models import EventoSeguimiento
+from notificaciones.models import Notificacion
+
+TAMANO_LOTE = 100
+PESO_BULTO_POR_DEFECTO_KG = Decimal('0.5')
+MAX_INTENTOS = 5
+ESPERA_BASE_S = 30
+ESPERA_MAXIMA_S = 3600
+# Tiempo que un webhook reclamado queda reservado; si el proceso muere, vence y se vuelve a reclamar
+ARRENDAMIENTO_S = 600
+
+
+def procesar_pedido_shopify(plataforma, data, webhook_log):
+    """
+    Procesar un nuevo pedido de Shopify
+    """
+    # Verificar si el pedido ya existe
+    pedido_existente = PedidoEcommerce.objects.filter(
+        plataforma=plataforma,
+        pedido_id_externo=str(data['id'])
+    ).first()
+    
+    if pedido_existente:
+        webhook_log.mensaje += " - Pedido ya existente"
+        webhook_log.save()
+        return
+    
+    # Crear el pedido
+    pedido = PedidoEcommerce.objects.create(
+        plataforma=plataforma,
+        pedido_id_externo=str(data['id']),
+        numero_orden=data['name'],
+        cliente_nombre=f"{data['customer']['first_name']} {data['customer']['last_name']}",
+        cliente_email=data['customer']['email'],
+        cliente_telefono=data.get('phone', ''),
+        direccion_entrega=_obtener_direccion_shopify(data.get('shipping_address', {})),
+        direccion_envio=_obtener_direccion_shopify(data.get('billing_address', {})),
+        total=float(data['total_price']),
+        moneda=data['currency'],
+        estado='pendiente',
+        fecha_pedido=datetime.fromisoformat(data['created_at'].replace('Z', '+00:00')),
+        datos_raw=data
+    )
+    
+    # Crear productos del pedido en un solo INSERT
+    ProductoPedido.objects.bulk_create([
+        ProductoPedido(
+            pedido=pedido,
+            sku=item['sku'] or item['variant_id'],
+            nombre=item['name'],
+            cantidad=item['quantity'],
+            precio_unitario=float(item['price']),
+            peso_kg=float(item.get('grams', 0)) / 1000 if item.get('grams') else None,
+            dimensiones=item.get('variant_title', '')
+        )
+        for item in data.get('line_items', [])
+    ])
+    
+    # Crear envío asociado
+    envio = crear_envio_desde_pedido(pedido)
+    pedido.envio = envio
+    pedido.save()
+    
+    # Notificar al administrador
+    _notificar_nuevo_pedido(pedido)
+    
+    webhook_log.mensaje += f" - Pedido {pedido.numero_orden} creado exitosamente"
+    webhook_log.datos_procesados = {'pedido_id': pedido.id, 'envio_id': envio.id}
+    webhook_log.save()
+
+
+def actualizar_pedido_shopify(plataforma, data, webhook_log):
+    """
+    Actualizar un pedido existente de Shopify
+    """
+    pedido = PedidoEcommerce.objects.filter(
+        plataforma=plataforma,
+        pedido_id_externo=str(data['id'])
+    ).first()
+    
+    if not pedido:
+        webhook_log.mensaje += " - Pedido no encontrado para actualizar"
+        webhook_log.save()
+        return
+    
+    # Actualizar estado según fulfillment status
+    if data.get('fulfillment_status') == 'fulfilled':
+        pedido.estado = 'enviado'
+        if not pedido.fecha_envio:
+            pedido.fecha_envio = timezone.now()
+    elif data.get('cancelled_at'):
+        pedido.estado = 'cancelado'
+    
+    pedido.save()
+    
+    # Actualizar envío asociado si existe
+    if pedido.envio:
+        if pedido.estado == 'enviado' and pedido.envio.estado != 'en_transito':
+            pedido.envio.estado = 'en_transito'
+            pedido.envio.save()
+            
+            # Crear evento de seguimiento
+            EventoSeguimiento.objects.create(
+                envio=pedido.envio,
+                estado='en_transito',
+                ubicacion='Despachado desde plataforma e-commerce',
+                observacion=f'Pedido {pedido.numero_orden} despachado desde {plataforma.nombre}'
+            )
+    
+    webhook_log.mensaje += f" - Pedido {pedido.numero_orden} actualizado"
+    webhook_log.save()
+
+
+def cancelar_pedido_shopify(plataforma, data, webhook_log):
+    """
+    Cancelar un pedido de Shopify
+    """
+    pedido = PedidoEcommerce.objects.filter(
+        plataforma=plataforma,
+        pedido_id_externo=str(data['id'])
+    ).first()
+    
+    if not pedido:
+        webhook_log.mensaje += " - Pedido no encontrado para cancelar"
+        webhook_log.save()
+        return
+    
+    pedido.estado = 'cancelado'
+    pedido.save()
+    
+    # Cancelar envío asociado si existe
+    if pedido.envio and pedido.envio.estado != 'cancelado':
+        pedido.envio.estado = 'cancelado'
+        pedido.envio.save()
+    
+    webhook_log.mensaje += f" - Pedido {pedido.numero_orden} cancelado"
+    webhook_log.save()
+
+
+def _obtener_direccion_shopify(direccion_data):
+    """
+    Formatear dirección de Shopify
+    """
+    if not direccion_data:
+        return ''
+    
+    partes = [
+        direccion_data.get('address1', ''),
+        direccion_data.get('address2', ''),
+        direccion_data.get('city', ''),
+        direccion_data.get('province', ''),
+        direccion_data.get('zip', ''),
+        direccion_data.get('country', '')
+    ]
+    
+    return ', '.join([p for p in partes if p.strip()])
+
+
+def crear_envio_desde_pedido(pedido):
+    """
+    Crear un envío en el sistema a partir de un pedido e-commerce
+    """
+    # Generar código único para el envío
+    codigo_envio = f"EC-{pedido.plataforma.tipo.upper()}-{pedido.numero_orden}"
+    
+    # Una sola consulta de productos para el peso y los bultos
+    productos = list(pedido.productos.all())
+    
+    # Calcular peso total
+    peso_total = sum(
+        (p.peso_kg or PESO_BULTO_POR_DEFECTO_KG) * p.cantidad  # 0.5kg por defecto si no hay peso
+        for p in productos
+    )
+    
+    # Crear envío
+    envio = Envio.objects.create(
+        codigo=codigo_envio,
+        estado='pendiente',
+        origen='Depósito Central CorreosChile',
+        destino=pedido.direccion_entrega[:100],  # Limitar a 100 caracteres
+        destinatario_nombre=pedido.cliente_nombre,
+        direccion_destino=pedido.direccion_entrega,
+        peso_kg=peso_total or 1.0,  # 1kg mínimo
+        costo=pedido.total,
+        usuario=pedido.plataforma.usuario if pedido.plataforma.usuario else None
+    )
+    
+    # Crear todos los bultos en bloque. bulk_create no emite post_save, pero
+    # los bultos nuevos nunca están entregados, así que no hay estado que recalcular
+    bultos = [
+        Bulto(
+            envio=envio,
+            codigo_barras=f"{codigo_envio}-{producto.sku}-{i+1}",
+            peso_kg=producto.peso_kg or PESO_BULTO_POR_DEFECTO_KG
+        )
+        for producto in productos
+        for i in range(producto.cantidad)
+    ]
+    Bulto.objects.bulk_create(bultos, batch_size=500)
+    # Sin post_save: los códigos de barras se indexan aquí para la búsqueda parcial
+    indexar_codigos('envio', envio.pk, [b.codigo_barras for b in bultos])
+    
+    return envio
+
+
+def _notificar_nuevo_pedido(pedido):
+    """
+    Notificar sobre nuevo pedido e-commerce
+    """
+    Notificacion.objects.create(
+        titulo=f"Nuevo pedido de {pedido.plataforma.nombre}",
+        mensaje=f"Pedido {pedido.numero_orden} de {pedido.cliente_nombre} - Total: ${pedido.total}",
+        tipo='info',
+        canal='web',
+        usuario=pedido.plataforma.usuario
+    )
+
+
+def procesar_pedido_amazon(plataforma, data):
+    """Crea/actualiza un pedido proveniente de Amazon y su envío asociado"""
+    # Id y número
+    order_id = str(data.get('orderId') or data.get('id') or '')
+    numero_orden = data.get('orderNumber') or order_id or f"AMZ-{int(timezone.now().timestamp())}"
+    if not order_id:
+        order_id = numero_orden
+    pedido = PedidoEcommerce.objects.filter(plataforma=plataforma, pedido_id_externo=order_id).first()
+    if pedido:
+        # Actualización simple de estado
+        estado_ext = (data.get('status') or '').lower()
+        if estado_ext in ['shipped','enviado']:
+            pedido.estado = 'enviado'
+            pedido.fecha_envio = timezone.now()
+        elif estado_ext in ['cancelled','cancelado']:
+            pedido.estado = 'cancelado'
+        pedido.save()
+        return pedido
+    # Crear pedido nuevo
+    buyer = data.get('buyer', {})
+    shipping = data.get('shippingAddress', {})
+    total = float(data.get('total', 0))
+    currency = (data.get('currency') or 'CLP')[:3]
+    fecha_pedido = data.get('purchaseDate') or timezone.now().isoformat()
+    pedido = PedidoEcommerce.objects.create(
+        plataforma=plataforma,
+        pedido_id_externo=order_id,
+        numero_orden=numero_orden,
+        cliente_nombre=f"{buyer.get('name') or buyer.get('firstName','')} {buyer.get('lastName','')}".strip() or (buyer.get('name') or 'Amazon Cliente'),
+        cliente_email=buyer.get('email','no-reply@example.com'),
+        cliente_telefono=buyer.get('phone',''),
+        direccion_entrega=_formatear_direccion_amazon(shipping),
+        direccion_envio=_formatear_direccion_amazon(data.get('billingAddress', {})),
+        total=total,
+        moneda=currency,
+        estado='pendiente',
+        fecha_pedido=datetime.fromisoformat(str(fecha_pedido).replace('Z','+00:00')) if isinstance(fecha_pedido, str) else timezone.now(),
+        datos_raw=data
+    )
+    # Productos
+    ProductoPedido.objects.bulk_create([
+        ProductoPedido(
+            pedido=pedido,
+            sku=str(item.get('sku') or item.get('asin') or ''),
+            nombre=item.get('name','Item Amazon'),
+            cantidad=int(item.get('quantity') or 1),
+            precio_unitario=float(item.get('price') or 0),
+            peso_kg=float(item.get('weightKg') or 0) if item.get('weightKg') is not None else None,
+            dimensiones=item.get('dimensions','')
+        )
+        for item in (data.get('items') or [])
+    ])
+    envio = crear_envio_desde_pedido(pedido)
+    pedido.envio = envio
+    pedido.save()
+    return pedido
+
+
+def _formatear_direccion_amazon(addr):
+    partes = [addr.get('address1',''), addr.get('address2',''), addr.get('city',''), addr.get('state',''), addr.get('postalCode',''), addr.get('country','')]
+    return ', '.join([p for p in partes if p])
+
+
+def _procesar_shopify(webhook_log):
+    manejador = MANEJADORES_SHOPIFY.get(webhook_log.evento_tipo)
+    if manejador:
+        manejador(webhook_log.plataforma, webhook_log.datos, webhook_log)
+
+
+def _procesar_amazon(webhook_log):
+    pedido = procesar_pedido_amazon(webhook_log.plataforma, webhook_log.datos)
+    webhook_log.mensaje += f" - Pedido {pedido.numero_orden} procesado"
+    webhook_log.datos_procesados = {'pedido_id': pedido.id, 'envio_id': pedido.envio_id}
+
+
+MANEJADORES_SHOPIFY = {
+    'orders/create': procesar_pedido_shopify,
+    'orders/updated': actualizar_pedido_shopify,
+    'orders/cancelled': cancelar_pedido_shopify,
+}
+
+PROCESADORES = {
+    'shopify': _procesar_shopify,
+    'amazon': _procesar_amazon,
+}
+
+
+def procesar_webhook(webhook_log):
+    """
+    Procesa un webhook pendiente dentro de su propia transacción.
+
+    Si falla, el log vuelve a quedar pendiente, con espera exponencial,
+    hasta agotar MAX_INTENTOS y entonces se marca con error. El error del
+    último intento queda en ultimo_error; mensaje conserva el de la
+    recepción, más lo que agregue el intento exitoso.
+
+    Returns:
+        True si se procesó correctamente
+    """
+    mensaje_recibido = webhook_log.mensaje
+    webhook_log.intentos += 1
+    try:
+        with transaction.atomic():
+            procesador = PROCESADORES.get(webhook_log.plataforma.tipo)
+            if procesador:
+                procesador(webhook_log)
+            webhook_log.nivel = 'info'
+            webhook_log.ultimo_error = ''
+            webhook_log.estado_procesamiento = 'procesado'
+            webhook_log.procesado_exitoso = True
+            webhook_log.procesado_en = timezone.now()
+            webhook_log.save()
+        return True
+    except Exception as e:
+        # Lo que el manejador agregó al mensaje se deshizo con la transacción
+        webhook_log.mensaje = mensaje_recibido
+        webhook_log.nivel = 'error'
+        webhook_log.ultimo_error = f'{type(e).__name__}: {e}'
+        ahora = timezone.now()
+        webhook_log.estado_procesamiento = 'error' if webhook_log.intentos >= MAX_INTENTOS else 'pendiente'
+        webhook_log.procesado_en = ahora
+        espera = min(ESPERA_BASE_S * 2 ** (webhook_log.intentos - 1), ESPERA_MAXIMA_S)
+        webhook_log.proximo_intento = ahora + timedelta(seconds=espera)
+        WebhookLog.objects.filter(pk=webhook_log.pk).update(
+            nivel=webhook_log.nivel,
+            ultimo_error=webhook_log.ultimo_error,
+            intentos=webhook_log.intentos,
+            estado_procesamiento=webhook_log.estado_procesamiento,
+            proximo_intento=webhook_log.proximo_intento,
+            procesado_en=webhook_log.procesado_en,
+        )
+        return False
+
+
+def reclamar_lote(cantidad, corte=None):
+    """
+    Reserva para este proceso los webhooks vencidos (pendientes o con la
+    reserva de otro proceso vencida), en orden de llegada.
+
+    Returns:
+        Lista de WebhookLog reservados
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            WebhookLog.objects.select_for_update(skip_locked=True)
+            .filter(estado_procesamiento__in=('pendiente', 'procesando'), proximo_intento__lte=corte or ahora)
+            .order_by('id')
+            .values_list('id', flat=True)[:cantidad]
+        )
+        if not ids:
+            return []
+        WebhookLog.objects.filter(id__in=ids).update(
+            estado_procesamiento='procesando', proximo_intento=ahora + timedelta(seconds=ARRENDAMIENTO_S)
+        )
+    return list(
+        WebhookLog.objects.filter(id__in=ids)
+        .select_related('plataforma', 'plataforma__usuario')
+        .order_by('id')
+    )
+
+
+def procesar_pendientes(tamano_lote=TAMANO_LOTE, limite=None):
+    """
+    Procesa la cola de webhooks pendientes por lotes, en orden de llegada.
+
+    Returns:
+        Dict con la cantidad de webhooks procesados y con error
+    """
+    resumen = {'procesados': 0, 'errores': 0}
+    # Los webhooks reclamados o reprogramados quedan después del corte y no se vuelven a leer
+    corte = timezone.now()
+    while limite is None or resumen['procesados'] + resumen['errores'] < limite:
+        cantidad = tamano_lote
+        if limite is not None:
+            cantidad = min(cantidad, limite - resumen['procesados'] - resumen['errores'])
+        lote = reclamar_lote(cantidad, corte)
+        if not lote:
+            break
+        for webhook_log in lote:
+            if procesar_webhook(webhook_log):
+                resumen['procesados'] += 1
+            else:
+                resumen['errores'] += 1
+    return resumen
@@ -0,0 +1,63 @@
+"""
+Retención de los logs de webhooks.
+
+WebhookLog guarda solo los webhooks recientes. Los más antiguos que la
+retención se mueven por lotes a WebhookLogArchivado, con el cuerpo
+comprimido, o se eliminan directamente. Los webhooks aún pendientes de
+procesar nunca se tocan.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import WebhookLog, WebhookLogArchivado, comprimir_json
+
+DIAS_RETENCION = 30
+TAMANO_LOTE = 1000
+
+
+def _archivado(log):
+    if log.datos_comprimidos is not None:
+        datos = bytes(log.datos_comprimidos)
+    elif log.datos_recibidos is not None:
+        datos = comprimir_json(log.datos_recibidos)
+    else:
+        datos = None
+    return WebhookLogArchivado(
+        webhook_log_id=log.id,
+        plataforma_id=log.plataforma_id,
+        evento_tipo=log.evento_tipo,
+        evento_id=log.evento_id,
+        nivel=log.nivel,
+        mensaje=log.mensaje,
+        datos_comprimidos=datos,
+        ip_origen=log.ip_origen,
+        procesado_exitoso=log.procesado_exitoso,
+        creado_en=log.creado_en,
+    )
+
+
+def depurar_webhook_logs(dias=DIAS_RETENCION, tamano_lote=TAMANO_LOTE, archivar=True):
+    """
+    Saca de WebhookLog los logs con más de `dias` días, un lote por transacción.
+
+    Returns:
+        Dict con la cantidad de logs archivados y eliminados
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    antiguos = WebhookLog.objects.filter(creado_en__lt=limite).exclude(estado_procesamiento__in=('pendiente', 'procesando'))
+    resumen = {'archivados': 0, 'eliminados': 0}
+    while True:
+        with transaction.atomic():
+            if archivar:
+                lote = list(antiguos.order_by('id')[:tamano_lote])
+                ids = [log.id for log in lote]
+                # ignore_conflicts permite retomar un lote que quedó a medias
+                WebhookLogArchivado.objects.bulk_create([_archivado(log) for log in lote], ignore_conflicts=True)
+                resumen['archivados'] += len(lote)
+            else:
+                ids = list(antiguos.order_by('id').values_list('id', flat=True)[:tamano_lote])
+            if not ids:
+                return resumen
+            resumen['eliminados'] += WebhookLog.objects.filter(id__in=ids).delete()[0]
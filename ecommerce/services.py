@@ -1,21 +1,84 @@
 import json
-from urllib import request
+import http.client
+from urllib.parse import urlsplit
 
-def sync_estado_a_plataforma(pedido, estado, tracking_codigo=None, override_url=None):
-    plataforma = pedido.plataforma
-    url = (override_url or (plataforma.store_url.rstrip('/') + '/api/correos/status'))
+TIMEOUT_S = 5
+
+
+class ConexionPlataforma:
+    """
+    Conexión HTTP persistente (keep-alive) hacia el host de una plataforma.
+
+    Reutiliza el mismo socket entre envíos. Solo reintenta cuando no se pudo
+    conectar: el POST no es idempotente, así que si falla después de enviarse
+    (timeout de lectura, conexión cortada) el error se propaga y el reintento
+    queda a cargo de la cola de sincronización. No es segura entre hilos:
+    cada hilo usa su propia conexión.
+    """
+
+    def __init__(self, url, timeout=TIMEOUT_S):
+        partes = urlsplit(url)
+        self.esquema = partes.scheme
+        self.host = partes.hostname
+        self.puerto = partes.port
+        self.timeout = timeout
+        self._conexion = None
+
+    def _conectar(self):
+        clase = http.client.HTTPSConnection if self.esquema == 'https' else http.client.HTTPConnection
+        return clase(self.host, self.puerto, timeout=self.timeout)
+
+    def post(self, url, body, headers):
+        """Envía un POST y devuelve el código HTTP; lanza OSError/HTTPException si no hay respuesta"""
+        partes = urlsplit(url)
+        ruta = partes.path or '/'
+        if partes.query:
+            ruta += '?' + partes.query
+        if self._conexion is None:
+            for reintento in (False, True):
+                conexion = self._conectar()
+                try:
+                    conexion.connect()
+                except OSError:
+                    conexion.close()
+                    if reintento:
+                        raise
+                    continue
+                self._conexion = conexion
+                break
+        try:
+            self._conexion.request('POST', ruta, body=body, headers=headers)
+            resp = self._conexion.getresponse()
+            resp.read()  # Se consume la respuesta para poder reutilizar el socket
+            if resp.will_close:
+                self.cerrar()
+            return resp.status
+        except (http.client.HTTPException, OSError):
+            self.cerrar()
+            raise
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+
+def url_estado(plataforma, override_url=None):
+    return override_url or (plataforma.store_url.rstrip('/') + '/api/correos/status')
+
+
+def cuerpo_estado(pedido, estado, tracking_codigo=None):
     data = {
         'order_id': pedido.pedido_id_externo,
         'order_number': pedido.numero_orden,
         'status': estado,
         'tracking_code': tracking_codigo or (getattr(pedido.envio, 'codigo', None) or ''),
     }
-    body = json.dumps(data).encode('utf-8')
-    req = request.Request(url, data=body, method='POST')
-    req.add_header('Content-Type', 'application/json')
-    req.add_header('Authorization', 'Bearer ' + (plataforma.api_key or ''))
-    try:
-        with request.urlopen(req, timeout=5) as resp:
-            return resp.status
-    except Exception:
-        return None
+    return json.dumps(data).encode('utf-8')
+
+
+def cabeceras_estado(plataforma):
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': 'Bearer ' + (plataforma.api_key or ''),
+    }
@@ -2,7 +2,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from seguimiento.models import EventoSeguimiento
 from .models import PedidoEcommerce
-from .services import sync_estado_a_plataforma
+from .sincronizacion import encolar_estado
 
 @receiver(post_save, sender=EventoSeguimiento)
 def sync_estado_ecommerce(sender, instance, created, **kwargs):
@@ -12,4 +12,4 @@ def sync_estado_ecommerce(sender, instance, created, **kwargs):
     pedido = getattr(envio, 'pedido_ecommerce', None)
     if not pedido:
         return
-    sync_estado_a_plataforma(pedido, instance.estado, tracking_codigo=getattr(envio, 'codigo', None))
+    encolar_estado(pedido, instance.estado, tracking_codigo=getattr(envio, 'codigo', None))
@@ -0,0 +1,219 @@
+"""
+Envío de los cambios de estado de los pedidos a sus plataformas.
+
+Los cambios se encolan en SincronizacionEstado y el comando
+sincronizar_estados los envía por lotes: agrupados por plataforma y host,
+sobre conexiones keep-alive, con un número acotado de hilos, reintentos con
+espera exponencial y el resultado de cada entrega registrado.
+
+El orden de los estados de un pedido se conserva así:
+
+- Al encolar un estado, los anteriores del mismo pedido aún sin enviar
+  quedan 'reemplazado': a la plataforma solo le interesa el último.
+- Cada lote se reclama (select_for_update con skip_locked y paso a
+  'enviando' por ARRENDAMIENTO_S segundos), así dos procesos no envían el
+  mismo registro. No se reclaman pedidos con un envío todavía en curso.
+- Los registros de un pedido van siempre por la misma conexión.
+- Un envío fallido no se reintenta si mientras tanto se encoló un estado
+  más nuevo del mismo pedido.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import SincronizacionEstado
+from .services import ConexionPlataforma, url_estado, cuerpo_estado, cabeceras_estado
+
+MAX_INTENTOS = 6
+ESPERA_BASE_S = 30
+ESPERA_MAXIMA_S = 3600
+HILOS = 16
+CONEXIONES_POR_PLATAFORMA = 4
+TAMANO_LOTE = 1000
+# Tiempo que un registro reclamado queda reservado; si el proceso muere, vence y se vuelve a reclamar
+ARRENDAMIENTO_S = 300
+# Respuestas 4xx que sí vale la pena reintentar
+CODIGOS_REINTENTABLES = (408, 425, 429)
+RESUMEN = ('enviados', 'reintentos', 'fallidos', 'reemplazados')
+
+
+def encolar_estado(pedido, estado, tracking_codigo=None, url_destino=None, estado_entrega='pendiente'):
+    """Encola el estado del pedido para que sincronizar_estados lo envíe; reemplaza los anteriores sin enviar"""
+    ahora = timezone.now()
+    with transaction.atomic():
+        SincronizacionEstado.objects.filter(
+            pedido=pedido, url_destino=url_destino, estado_entrega='pendiente'
+        ).update(estado_entrega='reemplazado')
+        return SincronizacionEstado.objects.create(
+            pedido=pedido,
+            estado=estado,
+            tracking_codigo=tracking_codigo or getattr(pedido.envio, 'codigo', None) or '',
+            url_destino=url_destino,
+            estado_entrega=estado_entrega,
+            proximo_intento=ahora + timedelta(seconds=ARRENDAMIENTO_S) if estado_entrega == 'enviando' else ahora,
+        )
+
+
+def _enviar_grupo(registros):
+    """Envía los registros de un mismo host por una sola conexión; se ejecuta en un hilo"""
+    resultados = []
+    conexion = None
+    try:
+        for registro in registros:
+            pedido = registro.pedido
+            url = url_estado(pedido.plataforma, registro.url_destino)
+            conexion = conexion or ConexionPlataforma(url)
+            try:
+                codigo = conexion.post(
+                    url,
+                    cuerpo_estado(pedido, registro.estado, registro.tracking_codigo),
+                    cabeceras_estado(pedido.plataforma),
+                )
+                resultados.append((registro, codigo, ''))
+            except Exception as e:
+                resultados.append((registro, None, str(e) or e.__class__.__name__))
+    finally:
+        if conexion:
+            conexion.cerrar()
+    return resultados
+
+
+def _registrar_resultado(registro, codigo, error, ahora, reemplazado=False):
+    registro.intentos += 1
+    registro.codigo_respuesta = codigo
+    if codigo is not None and 200 <= codigo < 300:
+        registro.estado_entrega = 'enviado'
+        registro.enviado_en = ahora
+        registro.ultimo_error = ''
+        return
+    registro.ultimo_error = error or f'Respuesta HTTP {codigo}'
+    definitivo = codigo is not None and 400 <= codigo < 500 and codigo not in CODIGOS_REINTENTABLES
+    if reemplazado:
+        # Reenviarlo podría dejar en la plataforma un estado más antiguo que el encolado después
+        registro.estado_entrega = 'reemplazado'
+    elif definitivo or registro.intentos >= MAX_INTENTOS:
+        registro.estado_entrega = 'fallido'
+    else:
+        espera = min(ESPERA_BASE_S * 2 ** (registro.intentos - 1), ESPERA_MAXIMA_S)
+        registro.estado_entrega = 'pendiente'
+        registro.proximo_intento = ahora + timedelta(seconds=espera)
+
+
+def _grupos_por_destino(registros, conexiones_por_plataforma):
+    """
+    Reparte los registros de cada (plataforma, host) entre a lo más N
+    conexiones; los de un mismo pedido van por la misma y en orden
+    """
+    por_destino = defaultdict(list)
+    for registro in registros:
+        url = url_estado(registro.pedido.plataforma, registro.url_destino)
+        por_destino[(registro.pedido.plataforma_id, urlsplit(url).netloc)].append(registro)
+    grupos = []
+    for pendientes in por_destino.values():
+        n = min(conexiones_por_plataforma, len(pendientes))
+        por_conexion = [[] for _ in range(n)]
+        for registro in pendientes:
+            por_conexion[registro.pedido_id % n].append(registro)
+        grupos.extend(grupo for grupo in por_conexion if grupo)
+    return grupos
+
+
+def _ultimos_por_pedido(registros):
+    """Id del registro vigente más nuevo de cada (pedido, url_destino) de los registros"""
+    filas = (
+        SincronizacionEstado.objects
+        .filter(pedido_id__in={r.pedido_id for r in registros})
+        .exclude(estado_entrega='reemplazado')
+        .values('pedido_id', 'url_destino')
+        .annotate(ultimo=Max('id'))
+    )
+    return {(f['pedido_id'], f['url_destino']): f['ultimo'] for f in filas}
+
+
+def reclamar_lote(tamano_lote=TAMANO_LOTE, corte=None):
+    """
+    Reserva para este proceso las sincronizaciones vencidas (pendientes o
+    con la reserva de otro proceso vencida), sin los pedidos con un envío
+    en curso. De cada pedido queda solo el estado más nuevo; los anteriores
+    pasan a 'reemplazado'.
+
+    Returns:
+        Lista de registros reservados, ordenados por id
+    """
+    ahora = timezone.now()
+    corte = corte or ahora
+    en_curso = SincronizacionEstado.objects.filter(estado_entrega='enviando', proximo_intento__gt=ahora)
+    with transaction.atomic():
+        ids = list(
+            SincronizacionEstado.objects.select_for_update(skip_locked=True)
+            .filter(estado_entrega__in=('pendiente', 'enviando'), proximo_intento__lte=corte)
+            .exclude(pedido_id__in=en_curso.values('pedido_id'))
+            .order_by('id')
+            .values_list('id', flat=True)[:tamano_lote]
+        )
+        if not ids:
+            return []
+        SincronizacionEstado.objects.filter(id__in=ids).update(
+            estado_entrega='enviando', proximo_intento=ahora + timedelta(seconds=ARRENDAMIENTO_S)
+        )
+
+    lote = list(
+        SincronizacionEstado.objects.filter(id__in=ids)
+        .select_related('pedido__plataforma', 'pedido__envio').order_by('id')
+    )
+    vigentes = {(r.pedido_id, r.url_destino): r.id for r in lote}
+    reemplazados = [r.id for r in lote if vigentes[(r.pedido_id, r.url_destino)] != r.id]
+    if reemplazados:
+        SincronizacionEstado.objects.filter(id__in=reemplazados).update(estado_entrega='reemplazado')
+    return [r for r in lote if r.id not in reemplazados]
+
+
+def enviar_registros(registros, hilos=HILOS, conexiones_por_plataforma=CONEXIONES_POR_PLATAFORMA):
+    """Envía los registros (ya reclamados) y guarda el resultado de cada uno; devuelve el resumen"""
+    resumen = dict.fromkeys(RESUMEN, 0)
+    if not registros:
+        return resumen
+    grupos = _grupos_por_destino(registros, conexiones_por_plataforma)
+    with ThreadPoolExecutor(max_workers=max(1, min(hilos, len(grupos)))) as pool:
+        resultados = [r for grupo in pool.map(_enviar_grupo, grupos) for r in grupo]
+
+    ahora = timezone.now()
+    ultimos = _ultimos_por_pedido(registros)
+    for registro, codigo, error in resultados:
+        reemplazado = ultimos.get((registro.pedido_id, registro.url_destino), registro.id) > registro.id
+        _registrar_resultado(registro, codigo, error, ahora, reemplazado)
+        clave = {'enviado': 'enviados', 'fallido': 'fallidos', 'reemplazado': 'reemplazados'}.get(
+            registro.estado_entrega, 'reintentos'
+        )
+        resumen[clave] += 1
+    SincronizacionEstado.objects.bulk_update(
+        [registro for registro, _, _ in resultados],
+        ['estado_entrega', 'intentos', 'proximo_intento', 'codigo_respuesta', 'ultimo_error', 'enviado_en'],
+        batch_size=500,
+    )
+    return resumen
+
+
+def sincronizar_pendientes(tamano_lote=TAMANO_LOTE, hilos=HILOS, conexiones_por_plataforma=CONEXIONES_POR_PLATAFORMA):
+    """Envía todas las sincronizaciones vencidas, por lotes"""
+    resumen = dict.fromkeys(RESUMEN, 0)
+    # Los registros reclamados o reprogramados quedan después del corte y no se vuelven a leer
+    corte = timezone.now()
+    while True:
+        lote = reclamar_lote(tamano_lote, corte)
+        if not lote:
+            return resumen
+        for clave, cantidad in enviar_registros(lote, hilos, conexiones_por_plataforma).items():
+            resumen[clave] += cantidad
+
+
+def sincronizar_ahora(pedido, estado, tracking_codigo=None, url_destino=None):
+    """Envía un estado de inmediato dejando registro de la entrega; devuelve el código HTTP"""
+    registro = encolar_estado(pedido, estado, tracking_codigo, url_destino, estado_entrega='enviando')
+    enviar_registros([registro], hilos=1)
+    return registro.codigo_respuesta
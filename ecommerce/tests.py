@@ -1,9 +1,28 @@
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import PlataformaEcommerce, PedidoEcommerce, ProductoPedido, WebhookLog
+from io import StringIO
+from .models import PlataformaEcommerce, PedidoEcommerce, ProductoPedido, WebhookLog, EventoWebhookRecibido, SincronizacionEstado, WebhookLogArchivado, descomprimir_json
+from .procesamiento import procesar_pendientes, MAX_INTENTOS, crear_envio_desde_pedido
+from .services import ConexionPlataforma
+from .sincronizacion import encolar_estado, sincronizar_pendientes
+from . import catalogo as catalogo_tienda
+from unittest import mock
+import os
+import tempfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import time
 from envios.models import Envio
+from datetime import timedelta
+from django.utils import timezone
 import json
+import hmac
+import hashlib
+import base64
 from datetime import datetime
 
 
@@ -115,6 +134,30 @@ class EcommerceIntegrationTest(TestCase):
         
         self.assertEqual(response.status_code, 401)
 
+    def testcrear_envio_desde_pedido_en_bloque(self):
+        """Los bultos del envío se crean en bloque"""
+        pedido = PedidoEcommerce.objects.create(
+            plataforma=self.plataforma,
+            pedido_id_externo='B2B-1',
+            numero_orden='#B2B-1',
+            cliente_nombre='Empresa',
+            cliente_email='compras@example.com',
+            direccion_entrega='Calle Test 123, Santiago',
+            total=150000.00,
+            fecha_pedido=timezone.now()
+        )
+        ProductoPedido.objects.create(pedido=pedido, sku='CAJA', nombre='Caja', cantidad=200, precio_unitario=500, peso_kg=1.5)
+        ProductoPedido.objects.create(pedido=pedido, sku='SOBRE', nombre='Sobre', cantidad=2, precio_unitario=100)
+        pedido = PedidoEcommerce.objects.select_related('plataforma__usuario').get(id=pedido.id)
+
+        # Antes: un INSERT y dos COUNT por cada unidad
+        with CaptureQueriesContext(connection) as consultas:
+            envio = crear_envio_desde_pedido(pedido)
+        self.assertLess(len(consultas), 10)
+
+        self.assertEqual(envio.bultos.count(), 202)
+        self.assertEqual(float(envio.peso_kg), 301.0)
+
     def test_index_view_requires_login(self):
         """Test que la vista de index requiere login"""
         response = self.client.get(reverse('ecommerce:index'))
@@ -124,4 +167,355 @@ class EcommerceIntegrationTest(TestCase):
         """Test que la vista de configuración requiere permisos"""
         self.client.login(username='testuser', password='testpass123')
         response = self.client.get(reverse('ecommerce:configurar'))
-        self.assertEqual(response.status_code, 200)  # Should work for any authenticated user for GET
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)  # Should work for any authenticated user for GET
+
+
+class WebhookColaTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='tienda', password='testpass123')
+        self.plataforma = PlataformaEcommerce.objects.create(
+            nombre='Tienda Cola',
+            tipo='shopify',
+            api_key='test_api_key',
+            webhook_secret='secreto',
+            store_url='https://cola.myshopify.com',
+            usuario=self.user,
+        )
+
+    def _pedido_shopify(self, pedido_id='555'):
+        return {
+            'id': pedido_id,
+            'name': f'#{pedido_id}',
+            'customer': {'first_name': 'Ana', 'last_name': 'Soto', 'email': 'ana@example.com'},
+            'shipping_address': {'address1': 'Av. Siempre Viva 742', 'city': 'Santiago'},
+            'total_price': '25000.00',
+            'currency': 'CLP',
+            'created_at': '2024-01-01T12:00:00Z',
+            'line_items': [
+                {'sku': 'SKU-1', 'variant_id': 1, 'name': 'Polera', 'quantity': 2, 'price': '10000', 'grams': 300},
+                {'sku': 'SKU-2', 'variant_id': 2, 'name': 'Gorro', 'quantity': 1, 'price': '5000', 'grams': 200},
+            ],
+        }
+
+    def _enviar(self, data, topic='orders/create'):
+        body = json.dumps(data).encode('utf-8')
+        firma = base64.b64encode(hmac.new(b'secreto', body, hashlib.sha256).digest()).decode('utf-8')
+        return self.client.post(
+            reverse('ecommerce:shopify_webhook', kwargs={'plataforma_id': self.plataforma.id}),
+            data=body,
+            content_type='application/json',
+            HTTP_X_SHOPIFY_TOPIC=topic,
+            HTTP_X_SHOPIFY_HMAC_SHA256=firma,
+        )
+
+    def test_webhook_se_encola_sin_procesar(self):
+        response = self._enviar(self._pedido_shopify())
+
+        self.assertEqual(response.status_code, 200)
+        log = WebhookLog.objects.get(evento_tipo='orders/create')
+        self.assertEqual(log.estado_procesamiento, 'pendiente')
+        self.assertFalse(PedidoEcommerce.objects.exists())
+
+    def test_comando_procesa_la_cola(self):
+        self._enviar(self._pedido_shopify('555'))
+        self._enviar(self._pedido_shopify('556'))
+
+        salida = StringIO()
+        call_command('procesar_webhooks', '--lote', '1', stdout=salida)
+
+        self.assertIn('Webhooks procesados: 2', salida.getvalue())
+        pedido = PedidoEcommerce.objects.get(pedido_id_externo='555')
+        self.assertEqual(pedido.productos.count(), 2)
+        self.assertEqual(pedido.envio.bultos.count(), 3)
+        self.assertFalse(WebhookLog.objects.filter(estado_procesamiento='pendiente').exists())
+        self.assertTrue(WebhookLog.objects.get(evento_id='556').procesado_exitoso)
+
+    def test_webhook_con_error_se_reintenta_hasta_el_maximo(self):
+        datos = self._pedido_shopify()
+        del datos['customer']
+        self._enviar(datos)
+
+        procesar_pendientes()
+        log = WebhookLog.objects.get(evento_tipo='orders/create')
+        self.assertEqual(log.estado_procesamiento, 'pendiente')
+        self.assertGreater(log.proximo_intento, timezone.now())
+        # Aún no vence la espera: la siguiente pasada no lo reintenta
+        self.assertEqual(procesar_pendientes(), {'procesados': 0, 'errores': 0})
+
+        for _ in range(MAX_INTENTOS - 1):
+            WebhookLog.objects.filter(pk=log.pk).update(proximo_intento=timezone.now())
+            procesar_pendientes()
+
+        log.refresh_from_db()
+        self.assertEqual(log.estado_procesamiento, 'error')
+        self.assertEqual(log.intentos, MAX_INTENTOS)
+        self.assertFalse(PedidoEcommerce.objects.exists())
+
+    def test_reintento_exitoso_limpia_el_error(self):
+        datos = self._pedido_shopify()
+        del datos['customer']
+        self._enviar(datos)
+        log = WebhookLog.objects.get(evento_tipo='orders/create')
+        mensaje_recibido = log.mensaje
+
+        for _ in range(2):
+            WebhookLog.objects.filter(pk=log.pk).update(proximo_intento=timezone.now())
+            procesar_pendientes()
+        log.refresh_from_db()
+        self.assertEqual((log.nivel, log.mensaje), ('error', mensaje_recibido))
+        self.assertIn('KeyError', log.ultimo_error)
+
+        # Se corrigen los datos y el siguiente intento termina bien
+        log.datos_recibidos = self._pedido_shopify()
+        log.proximo_intento = timezone.now()
+        log.save()
+        self.assertEqual(procesar_pendientes(), {'procesados': 1, 'errores': 0})
+        log.refresh_from_db()
+        self.assertEqual((log.nivel, log.ultimo_error, log.procesado_exitoso), ('info', '', True))
+        self.assertEqual(log.mensaje, f'{mensaje_recibido} - Pedido #555 creado exitosamente')
+
+    def test_webhook_reclamado_por_otro_proceso_no_se_procesa(self):
+        self._enviar(self._pedido_shopify('555'))
+        log = WebhookLog.objects.get(evento_tipo='orders/create')
+        WebhookLog.objects.filter(pk=log.pk).update(
+            estado_procesamiento='procesando', proximo_intento=timezone.now() + timedelta(minutes=5)
+        )
+
+        self.assertEqual(procesar_pendientes(), {'procesados': 0, 'errores': 0})
+        self.assertFalse(PedidoEcommerce.objects.exists())
+
+        # Si la reserva vence (el otro proceso murió) se vuelve a tomar
+        WebhookLog.objects.filter(pk=log.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(procesar_pendientes(), {'procesados': 1, 'errores': 0})
+        self.assertEqual(PedidoEcommerce.objects.count(), 1)
+
+    def test_reintento_duplicado_no_se_vuelve_a_encolar(self):
+        datos = self._pedido_shopify()
+        self._enviar(datos)
+        response = self._enviar(datos)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['duplicado'])
+        self.assertEqual(WebhookLog.objects.filter(evento_tipo='orders/create').count(), 1)
+
+        # Mismo pedido con contenido distinto es un evento nuevo
+        datos['total_price'] = '26000.00'
+        self._enviar(datos, topic='orders/updated')
+        self.assertEqual(WebhookLog.objects.filter(estado_procesamiento='pendiente').count(), 2)
+
+    def test_error_al_encolar_no_registra_el_evento(self):
+        datos = self._pedido_shopify()
+        with mock.patch.object(WebhookLog.objects, 'create', side_effect=[RuntimeError('sin disco'), mock.DEFAULT]):
+            response = self._enviar(datos)
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(EventoWebhookRecibido.objects.exists())
+
+        # El reintento de Shopify se encola en vez de responderse como duplicado
+        response = self._enviar(datos)
+        self.assertNotIn('duplicado', response.json())
+        self.assertEqual(WebhookLog.objects.filter(estado_procesamiento='pendiente').count(), 1)
+
+    def test_limpieza_de_eventos_vencidos(self):
+        self._enviar(self._pedido_shopify('555'))
+        self._enviar(self._pedido_shopify('556'))
+        EventoWebhookRecibido.objects.filter(evento_id='555').update(
+            recibido_en=timezone.now() - timedelta(days=30)
+        )
+
+        salida = StringIO()
+        call_command('limpiar_eventos_webhook', '--dias', '7', stdout=salida)
+
+        self.assertIn('Eventos eliminados: 1', salida.getvalue())
+        self.assertEqual(list(EventoWebhookRecibido.objects.values_list('evento_id', flat=True)), ['556'])
+
+
+class _PlataformaFalsa(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    recibidos = []
+    conexiones = set()
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers['Content-Length']))
+        _PlataformaFalsa.recibidos.append(json.loads(cuerpo))
+        _PlataformaFalsa.conexiones.add(self.client_address)
+        if self.path.startswith('/lenta'):
+            time.sleep(0.5)
+        codigo = 503 if self.path.startswith('/caida') else 200
+        self.send_response(codigo)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SincronizacionEstadoTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.servidor = ThreadingHTTPServer(('127.0.0.1', 0), _PlataformaFalsa)
+        threading.Thread(target=cls.servidor.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.servidor.shutdown()
+        cls.servidor.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        _PlataformaFalsa.recibidos = []
+        _PlataformaFalsa.conexiones = set()
+        user = User.objects.create_user(username='sync', password='testpass123')
+        puerto = self.servidor.server_address[1]
+        self.plataforma = PlataformaEcommerce.objects.create(
+            nombre='Tienda Sync', tipo='shopify', api_key='k', store_url=f'http://127.0.0.1:{puerto}', usuario=user
+        )
+        self.pedidos = [
+            PedidoEcommerce.objects.create(
+                plataforma=self.plataforma,
+                pedido_id_externo=str(i),
+                numero_orden=f'#{i}',
+                cliente_nombre='Cliente',
+                cliente_email='cliente@example.com',
+                direccion_entrega='Santiago',
+                total=1000,
+                fecha_pedido=timezone.now(),
+            )
+            for i in range(10)
+        ]
+
+    def test_envia_por_conexiones_persistentes(self):
+        for pedido in self.pedidos:
+            encolar_estado(pedido, 'entregado', tracking_codigo='EC-1')
+
+        resumen = sincronizar_pendientes(conexiones_por_plataforma=2)
+
+        self.assertEqual(resumen, {'enviados': 10, 'reintentos': 0, 'fallidos': 0, 'reemplazados': 0})
+        self.assertEqual(len(_PlataformaFalsa.recibidos), 10)
+        self.assertEqual(len(_PlataformaFalsa.conexiones), 2)
+        registro = SincronizacionEstado.objects.first()
+        self.assertEqual(registro.estado_entrega, 'enviado')
+        self.assertEqual(registro.codigo_respuesta, 200)
+
+    def test_error_del_servidor_se_reintenta_con_espera(self):
+        puerto = self.servidor.server_address[1]
+        registro = encolar_estado(self.pedidos[0], 'en_transito', url_destino=f'http://127.0.0.1:{puerto}/caida')
+
+        resumen = sincronizar_pendientes()
+
+        self.assertEqual(resumen['reintentos'], 1)
+        registro.refresh_from_db()
+        self.assertEqual(registro.estado_entrega, 'pendiente')
+        self.assertEqual(registro.intentos, 1)
+        self.assertEqual(registro.codigo_respuesta, 503)
+        self.assertGreater(registro.proximo_intento, timezone.now())
+        # Aún no vence la espera: la siguiente pasada no lo reenvía
+        self.assertEqual(sincronizar_pendientes()['reintentos'], 0)
+
+    def test_solo_se_envia_el_ultimo_estado_del_pedido(self):
+        anterior = encolar_estado(self.pedidos[0], 'en_transito')
+        encolar_estado(self.pedidos[0], 'entregado')
+
+        resumen = sincronizar_pendientes()
+
+        self.assertEqual(resumen['enviados'], 1)
+        self.assertEqual([r['status'] for r in _PlataformaFalsa.recibidos], ['entregado'])
+        anterior.refresh_from_db()
+        self.assertEqual(anterior.estado_entrega, 'reemplazado')
+
+    def test_no_reenvia_registros_ni_pedidos_reclamados_por_otro_proceso(self):
+        reclamado = encolar_estado(self.pedidos[0], 'en_transito', estado_entrega='enviando')
+        encolar_estado(self.pedidos[0], 'entregado')
+        encolar_estado(self.pedidos[1], 'entregado')
+
+        self.assertEqual(sincronizar_pendientes()['enviados'], 1)
+        self.assertEqual([r['order_id'] for r in _PlataformaFalsa.recibidos], [self.pedidos[1].pedido_id_externo])
+
+        # Si la reserva vence (el otro proceso murió) se envía solo el estado más nuevo
+        SincronizacionEstado.objects.filter(pk=reclamado.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(sincronizar_pendientes()['enviados'], 1)
+        self.assertEqual(_PlataformaFalsa.recibidos[-1]['status'], 'entregado')
+
+    def test_timeout_de_lectura_no_reenvia_el_post(self):
+        url = f'http://127.0.0.1:{self.servidor.server_address[1]}/lenta'
+        conexion = ConexionPlataforma(url, timeout=0.2)
+        with self.assertRaises(OSError):
+            conexion.post(url, b'{}', {'Content-Type': 'application/json'})
+        time.sleep(0.5)
+        self.assertEqual(len(_PlataformaFalsa.recibidos), 1)
+
+
+class RetencionWebhookLogTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='retencion', password='testpass123')
+        self.plataforma = PlataformaEcommerce.objects.create(
+            nombre='Tienda Retención', tipo='shopify', api_key='k', store_url='https://r.example.com', usuario=user
+        )
+
+    def _log(self, datos, dias=0, **extra):
+        log = WebhookLog.objects.create(
+            plataforma=self.plataforma, evento_tipo='orders/create', mensaje='Webhook recibido',
+            datos_recibidos=datos, ip_origen='127.0.0.1', **extra
+        )
+        if dias:
+            WebhookLog.objects.filter(id=log.id).update(creado_en=timezone.now() - timedelta(days=dias))
+        return log
+
+    def test_cuerpo_grande_se_guarda_comprimido(self):
+        datos = {'line_items': [{'sku': f'SKU-{i}', 'name': 'Producto de prueba'} for i in range(200)]}
+        log = WebhookLog.objects.get(id=self._log(datos).id)
+
+        self.assertIsNone(log.datos_recibidos)
+        self.assertLess(len(log.datos_comprimidos), 4096)
+        self.assertEqual(log.datos, datos)
+        self.assertEqual(WebhookLog.objects.get(id=self._log({'id': 1}).id).datos, {'id': 1})
+
+    def test_sandbox_descomprime_una_vez_por_fila(self):
+        datos = {'order_id': '77', 'order_number': '#77', 'status': 'entregado', 'tracking_code': 'CC-77', 'relleno': 'x' * 5000}
+        log = self._log(datos)
+        WebhookLog.objects.filter(id=log.id).update(evento_tipo='sandbox_status')
+
+        with mock.patch('ecommerce.models.descomprimir_json', wraps=descomprimir_json) as descomprimir:
+            response = self.client.get(reverse('ecommerce:sandbox_status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'CC-77')
+        self.assertEqual(descomprimir.call_count, 1)
+
+    def test_depuracion_archiva_los_antiguos(self):
+        antiguo = self._log({'id': 1}, dias=60)
+        self._log({'id': 2}, dias=60, estado_procesamiento='pendiente')
+        self._log({'id': 3})
+
+        salida = StringIO()
+        call_command('depurar_webhook_logs', '--dias', '30', '--lote', '1', stdout=salida)
+
+        self.assertIn('Logs archivados: 1 - Eliminados: 1', salida.getvalue())
+        self.assertEqual(WebhookLog.objects.count(), 2)
+        archivado = WebhookLogArchivado.objects.get()
+        self.assertEqual(archivado.webhook_log_id, antiguo.id)
+        self.assertEqual(archivado.datos, {'id': 1})
+
+
+class CatalogoTiendaTest(TestCase):
+    def setUp(self):
+        archivo = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8')
+        json.dump({'shopify': [{'sku': 'B', 'orden': 2}, {'sku': 'A', 'orden': 1}]}, archivo)
+        archivo.close()
+        self.ruta = archivo.name
+        self.addCleanup(os.remove, self.ruta)
+
+    def test_se_lee_una_vez_y_se_recarga_al_cambiar(self):
+        with mock.patch.object(catalogo_tienda, '_leer', wraps=catalogo_tienda._leer) as leer:
+            primero = catalogo_tienda.obtener_catalogo(self.ruta)
+            self.assertIs(catalogo_tienda.obtener_catalogo(self.ruta), primero)
+            self.assertEqual([p['sku'] for p in primero['shopify']], ['A', 'B'])
+            self.assertEqual(leer.call_count, 1)
+
+            with open(self.ruta, 'w', encoding='utf-8') as f:
+                json.dump({'shopify': [{'sku': 'C'}]}, f)
+            mtime = os.stat(self.ruta).st_mtime_ns + 1_000_000_000
+            os.utime(self.ruta, ns=(mtime, mtime))
+
+            self.assertEqual(catalogo_tienda.obtener_catalogo(self.ruta)['shopify'], [{'sku': 'C'}])
+            self.assertEqual(leer.call_count, 2)
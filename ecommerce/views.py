@@ -2,25 +2,23 @@ import json
 import hmac
 import hashlib
 import base64
-from datetime import datetime
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q, Count
 from django.utils import timezone
 from .models import PlataformaEcommerce, PedidoEcommerce, ProductoPedido, WebhookLog
-from envios.models import Envio, Bulto
 from transportista.models import Transportista
 from seguimiento.models import EventoSeguimiento
-from notificaciones.models import Notificacion
 from usuarios.models import Perfil
-from .services import sync_estado_a_plataforma
-from django.conf import settings
-import os
-import json as _json
+from .sincronizacion import sincronizar_ahora
+from .procesamiento import crear_envio_desde_pedido
+from .idempotencia import registrar_evento
+from .catalogo import obtener_catalogo
 
 
 @csrf_exempt
@@ -71,30 +69,31 @@ def shopify_webhook(request, plataforma_id):
             )
             return JsonResponse({'error': 'Firma inválida'}, status=401)
         
-        # Procesar el webhook
         data = json.loads(body)
         event_type = request.headers.get('X-Shopify-Topic', 'unknown')
         
-        # Log del webhook
-        webhook_log = WebhookLog.objects.create(
-            plataforma=plataforma,
-            evento_tipo=event_type,
-            evento_id=data.get('id'),
-            nivel='info',
-            mensaje=f'Webhook recibido: {event_type}',
-            datos_recibidos=data,
-            ip_origen=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT'),
-            procesado_exitoso=True
-        )
-        
-        # Procesar según el tipo de evento
-        if event_type == 'orders/create':
-            procesar_pedido_shopify(plataforma, data, webhook_log)
-        elif event_type == 'orders/updated':
-            actualizar_pedido_shopify(plataforma, data, webhook_log)
-        elif event_type == 'orders/cancelled':
-            cancelar_pedido_shopify(plataforma, data, webhook_log)
+        # Los reintentos de Shopify se responden sin volver a encolarse. El
+        # evento y el webhook encolado se guardan juntos: si falla el encolado
+        # el evento no queda registrado y el reintento de Shopify se acepta
+        evento_id = request.headers.get('X-Shopify-Webhook-Id') or data.get('id')
+        with transaction.atomic():
+            if not registrar_evento(plataforma, event_type, evento_id, body):
+                return JsonResponse({'status': 'ok', 'duplicado': True})
+            
+            # Se encola el webhook y se responde de inmediato; el pedido lo crea
+            # el comando procesar_webhooks para no exceder el timeout de Shopify
+            WebhookLog.objects.create(
+                plataforma=plataforma,
+                evento_tipo=event_type,
+                evento_id=data.get('id'),
+                nivel='info',
+                mensaje=f'Webhook recibido: {event_type}',
+                datos_recibidos=data,
+                ip_origen=request.META.get('REMOTE_ADDR'),
+                user_agent=request.META.get('HTTP_USER_AGENT'),
+                procesado_exitoso=False,
+                estado_procesamiento='pendiente'
+            )
         
         return JsonResponse({'status': 'ok'})
         
@@ -119,221 +118,6 @@ def shopify_webhook(request, plataforma_id):
         return JsonResponse({'error': f'Error interno: {str(e)}'}, status=500)
 
 
-def procesar_pedido_shopify(plataforma, data, webhook_log):
-    """
-    Procesar un nuevo pedido de Shopify
-    """
-    try:
-        # Verificar si el pedido ya existe
-        pedido_existente = PedidoEcommerce.objects.filter(
-            plataforma=plataforma,
-            pedido_id_externo=str(data['id'])
-        ).first()
-        
-        if pedido_existente:
-            webhook_log.mensaje += " - Pedido ya existente"
-            webhook_log.save()
-            return
-        
-        # Crear el pedido
-        pedido = PedidoEcommerce.objects.create(
-            plataforma=plataforma,
-            pedido_id_externo=str(data['id']),
-            numero_orden=data['name'],
-            cliente_nombre=f"{data['customer']['first_name']} {data['customer']['last_name']}",
-            cliente_email=data['customer']['email'],
-            cliente_telefono=data.get('phone', ''),
-            direccion_entrega=_obtener_direccion_shopify(data.get('shipping_address', {})),
-            direccion_envio=_obtener_direccion_shopify(data.get('billing_address', {})),
-            total=float(data['total_price']),
-            moneda=data['currency'],
-            estado='pendiente',
-            fecha_pedido=datetime.fromisoformat(data['created_at'].replace('Z', '+00:00')),
-            datos_raw=data
-        )
-        
-        # Crear productos del pedido
-        for item in data.get('line_items', []):
-            ProductoPedido.objects.create(
-                pedido=pedido,
-                sku=item['sku'] or item['variant_id'],
-                nombre=item['name'],
-                cantidad=item['quantity'],
-                precio_unitario=float(item['price']),
-                peso_kg=float(item.get('grams', 0)) / 1000 if item.get('grams') else None,
-                dimensiones=item.get('variant_title', '')
-            )
-        
-        # Crear envío asociado
-        envio = _crear_envio_desde_pedido(pedido)
-        pedido.envio = envio
-        pedido.save()
-        
-        # Notificar al administrador
-        _notificar_nuevo_pedido(pedido)
-        
-        webhook_log.mensaje += f" - Pedido {pedido.numero_orden} creado exitosamente"
-        webhook_log.datos_procesados = {'pedido_id': pedido.id, 'envio_id': envio.id}
-        webhook_log.save()
-        
-    except Exception as e:
-        webhook_log.nivel = 'error'
-        webhook_log.mensaje += f" - Error procesando pedido: {str(e)}"
-        webhook_log.save()
-        raise
-
-
-def actualizar_pedido_shopify(plataforma, data, webhook_log):
-    """
-    Actualizar un pedido existente de Shopify
-    """
-    try:
-        pedido = PedidoEcommerce.objects.filter(
-            plataforma=plataforma,
-            pedido_id_externo=str(data['id'])
-        ).first()
-        
-        if not pedido:
-            webhook_log.mensaje += " - Pedido no encontrado para actualizar"
-            webhook_log.save()
-            return
-        
-        # Actualizar estado según fulfillment status
-        if data.get('fulfillment_status') == 'fulfilled':
-            pedido.estado = 'enviado'
-            if not pedido.fecha_envio:
-                pedido.fecha_envio = timezone.now()
-        elif data.get('cancelled_at'):
-            pedido.estado = 'cancelado'
-        
-        pedido.save()
-        
-        # Actualizar envío asociado si existe
-        if pedido.envio:
-            if pedido.estado == 'enviado' and pedido.envio.estado != 'en_transito':
-                pedido.envio.estado = 'en_transito'
-                pedido.envio.save()
-                
-                # Crear evento de seguimiento
-                EventoSeguimiento.objects.create(
-                    envio=pedido.envio,
-                    estado='en_transito',
-                    ubicacion='Despachado desde plataforma e-commerce',
-                    observacion=f'Pedido {pedido.numero_orden} despachado desde {plataforma.nombre}'
-                )
-        
-        webhook_log.mensaje += f" - Pedido {pedido.numero_orden} actualizado"
-        webhook_log.save()
-        
-    except Exception as e:
-        webhook_log.nivel = 'error'
-        webhook_log.mensaje += f" - Error actualizando pedido: {str(e)}"
-        webhook_log.save()
-        raise
-
-
-def cancelar_pedido_shopify(plataforma, data, webhook_log):
-    """
-    Cancelar un pedido de Shopify
-    """
-    try:
-        pedido = PedidoEcommerce.objects.filter(
-            plataforma=plataforma,
-            pedido_id_externo=str(data['id'])
-        ).first()
-        
-        if not pedido:
-            webhook_log.mensaje += " - Pedido no encontrado para cancelar"
-            webhook_log.save()
-            return
-        
-        pedido.estado = 'cancelado'
-        pedido.save()
-        
-        # Cancelar envío asociado si existe
-        if pedido.envio and pedido.envio.estado != 'cancelado':
-            pedido.envio.estado = 'cancelado'
-            pedido.envio.save()
-        
-        webhook_log.mensaje += f" - Pedido {pedido.numero_orden} cancelado"
-        webhook_log.save()
-        
-    except Exception as e:
-        webhook_log.nivel = 'error'
-        webhook_log.mensaje += f" - Error cancelando pedido: {str(e)}"
-        webhook_log.save()
-        raise
-
-
-def _obtener_direccion_shopify(direccion_data):
-    """
-    Formatear dirección de Shopify
-    """
-    if not direccion_data:
-        return ''
-    
-    partes = [
-        direccion_data.get('address1', ''),
-        direccion_data.get('address2', ''),
-        direccion_data.get('city', ''),
-        direccion_data.get('province', ''),
-        direccion_data.get('zip', ''),
-        direccion_data.get('country', '')
-    ]
-    
-    return ', '.join([p for p in partes if p.strip()])
-
-
-def _crear_envio_desde_pedido(pedido):
-    """
-    Crear un envío en el sistema a partir de un pedido e-commerce
-    """
-    # Generar código único para el envío
-    codigo_envio = f"EC-{pedido.plataforma.tipo.upper()}-{pedido.numero_orden}"
-    
-    # Calcular peso total
-    peso_total = sum(
-        (p.peso_kg or 0.5) * p.cantidad  # 0.5kg por defecto si no hay peso
-        for p in pedido.productos.all()
-    )
-    
-    # Crear envío
-    envio = Envio.objects.create(
-        codigo=codigo_envio,
-        estado='pendiente',
-        origen='Depósito Central CorreosChile',
-        destino=pedido.direccion_entrega[:100],  # Limitar a 100 caracteres
-        destinatario_nombre=pedido.cliente_nombre,
-        direccion_destino=pedido.direccion_entrega,
-        peso_kg=peso_total or 1.0,  # 1kg mínimo
-        costo=pedido.total,
-        usuario=pedido.plataforma.usuario if pedido.plataforma.usuario else None
-    )
-    
-    # Crear bultos para cada producto
-    for producto in pedido.productos.all():
-        for i in range(producto.cantidad):
-            Bulto.objects.create(
-                envio=envio,
-                codigo_barras=f"{codigo_envio}-{producto.sku}-{i+1}",
-                peso_kg=producto.peso_kg or 0.5
-            )
-    
-    return envio
-
-
-def _notificar_nuevo_pedido(pedido):
-    """
-    Notificar sobre nuevo pedido e-commerce
-    """
-    Notificacion.objects.create(
-        titulo=f"Nuevo pedido de {pedido.plataforma.nombre}",
-        mensaje=f"Pedido {pedido.numero_orden} de {pedido.cliente_nombre} - Total: ${pedido.total}",
-        tipo='info',
-        canal='web',
-        usuario=pedido.plataforma.usuario
-    )
-
 
 @login_required
 def index(request):
@@ -444,6 +228,7 @@ def configurar_plataforma(request):
     logs_webhook = (
         WebhookLog.objects.filter(plataforma__usuario=request.user)
         .select_related('plataforma')
+        .defer('datos_recibidos', 'datos_comprimidos', 'datos_procesados')
         .order_by('-creado_en')[:20]
     )
     
@@ -555,7 +340,7 @@ def nuevo_pedido(request):
                         pedido=pedido,
                         sku=parts[0], nombre=parts[1], cantidad=int(parts[2]), precio_unitario=float(parts[3])
                     )
-            envio = _crear_envio_desde_pedido(pedido)
+            envio = crear_envio_desde_pedido(pedido)
             pedido.envio = envio
             pedido.save()
             created = True
@@ -580,33 +365,7 @@ def mis_pedidos(request):
 @login_required
 def tienda(request):
     """Tienda simple para que el usuario cree pedidos en dos empresas: Shopify y Amazon"""
-    def _cargar_catalogo():
-        try:
-            path = os.path.join(settings.BASE_DIR, 'static', 'ecommerce', 'catalogo.json')
-            with open(path, 'r', encoding='utf-8') as f:
-                data = _json.load(f)
-                return data
-        except Exception:
-            return None
-
-    productos = _cargar_catalogo() or {
-        'shopify': [
-            {'sku':'SH-1001','nombre':'Polera Correos', 'precio': 12990, 'img': '/static/img/tienda/polera_correos.svg', 'peso':0.3, 'orden':1},
-            {'sku':'SH-1002','nombre':'Gorro Azul', 'precio': 7990, 'img': '/static/img/tienda/gorro_azul.svg', 'peso':0.2, 'orden':2},
-            {'sku':'SH-1003','nombre':'Polerón Rojo', 'precio': 19990, 'img': '/static/img/tienda/poleron_rojo.svg', 'peso':0.6, 'orden':3},
-        ],
-        'amazon': [
-            {'sku':'AM-2001','nombre':'Caja pequeña', 'precio': 3990, 'img': '/static/img/tienda/caja_pequena.svg', 'peso':0.4, 'orden':1},
-            {'sku':'AM-2002','nombre':'Caja mediana', 'precio': 6990, 'img': '/static/img/tienda/caja_mediana.svg', 'peso':0.8, 'orden':2},
-            {'sku':'AM-2003','nombre':'Caja grande', 'precio': 9990, 'img': '/static/img/tienda/caja_grande.svg', 'peso':1.5, 'orden':3},
-        ]
-    }
-    # Ordenar por 'orden' si existe
-    for k in list(productos.keys()):
-        try:
-            productos[k] = sorted(productos[k], key=lambda x: x.get('orden', 999))
-        except Exception:
-            pass
+    productos = obtener_catalogo()
     created = False
     pedido = None
     error = ''
@@ -648,7 +407,7 @@ def tienda(request):
                         pedido=pedido,
                         sku=parts[0], nombre=parts[1], cantidad=int(parts[2]), precio_unitario=float(parts[3])
                     )
-            envio = _crear_envio_desde_pedido(pedido)
+            envio = crear_envio_desde_pedido(pedido)
             pedido.envio = envio
             pedido.save()
             created = True
@@ -672,7 +431,7 @@ def reenviar_estado(request, pedido_id):
         envio = pedido.envio
         if not envio:
             return JsonResponse({'error': 'Pedido sin envío'}, status=400)
-        status_code = sync_estado_a_plataforma(pedido, envio.estado, tracking_codigo=getattr(envio,'codigo',None))
+        status_code = sincronizar_ahora(pedido, envio.estado, tracking_codigo=getattr(envio,'codigo',None))
         return JsonResponse({'status': 'ok', 'status_code': status_code})
     except PedidoEcommerce.DoesNotExist:
         return JsonResponse({'error': 'Pedido no encontrado'}, status=404)
@@ -698,8 +457,13 @@ def sandbox_status(request):
         )
         return JsonResponse({'status':'ok'})
     # GET: mostrar últimos
-    logs = WebhookLog.objects.filter(evento_tipo='sandbox_status').order_by('-creado_en')[:20]
-    return render(request, 'ecommerce/sandbox_status.html', {'logs': logs})
+    logs = (
+        WebhookLog.objects.filter(evento_tipo='sandbox_status').order_by('-creado_en')
+        .only('creado_en', 'datos_recibidos', 'datos_comprimidos')[:20]
+    )
+    # El cuerpo se descomprime una vez por fila; el template lo usa varias veces
+    registros = [{'creado_en': log.creado_en, 'datos': log.datos} for log in logs]
+    return render(request, 'ecommerce/sandbox_status.html', {'logs': registros})
 
 @login_required
 def probar_sync(request, pedido_id):
@@ -711,7 +475,7 @@ def probar_sync(request, pedido_id):
         if not envio:
             return JsonResponse({'error': 'Pedido sin envío'}, status=400)
         override = request.build_absolute_uri('/ecommerce/sandbox/status')
-        status_code = sync_estado_a_plataforma(pedido, envio.estado, tracking_codigo=getattr(envio,'codigo',None), override_url=override)
+        status_code = sincronizar_ahora(pedido, envio.estado, tracking_codigo=getattr(envio,'codigo',None), url_destino=override)
         return JsonResponse({'status':'ok','status_code':status_code})
     except PedidoEcommerce.DoesNotExist:
         return JsonResponse({'error': 'Pedido no encontrado'}, status=404)
@@ -727,20 +491,22 @@ def amazon_webhook(request, plataforma_id):
     try:
         plataforma = PlataformaEcommerce.objects.get(id=plataforma_id, tipo='amazon', esta_activa=True)
         data = json.loads(request.body)
-        # Log básico del webhook
-        WebhookLog.objects.create(
-            plataforma=plataforma,
-            evento_tipo=data.get('event','orders/create'),
-            evento_id=str(data.get('orderId')),
-            nivel='info',
-            mensaje='Webhook Amazon recibido',
-            datos_recibidos=data,
-            ip_origen=request.META.get('REMOTE_ADDR'),
-            user_agent=request.META.get('HTTP_USER_AGENT'),
-            procesado_exitoso=True
-        )
-        # Procesar pedido
-        procesar_pedido_amazon(plataforma, data)
+        with transaction.atomic():
+            if not registrar_evento(plataforma, data.get('event','orders/create'), data.get('orderId'), request.body):
+                return JsonResponse({'status': 'ok', 'duplicado': True})
+            # Se encola el webhook; el pedido lo procesa el comando procesar_webhooks
+            WebhookLog.objects.create(
+                plataforma=plataforma,
+                evento_tipo=data.get('event','orders/create'),
+                evento_id=str(data.get('orderId')),
+                nivel='info',
+                mensaje='Webhook Amazon recibido',
+                datos_recibidos=data,
+                ip_origen=request.META.get('REMOTE_ADDR'),
+                user_agent=request.META.get('HTTP_USER_AGENT'),
+                procesado_exitoso=False,
+                estado_procesamiento='pendiente'
+            )
         return JsonResponse({'status': 'ok'})
     except PlataformaEcommerce.DoesNotExist:
         return JsonResponse({'error': 'Plataforma Amazon no encontrada'}, status=404)
@@ -748,64 +514,3 @@ def amazon_webhook(request, plataforma_id):
         return JsonResponse({'error': 'JSON inválido'}, status=400)
     except Exception as e:
         return JsonResponse({'error': f'Error interno: {str(e)}'}, status=500)
-
-
-def procesar_pedido_amazon(plataforma, data):
-    """Crea/actualiza un pedido proveniente de Amazon y su envío asociado"""
-    # Id y número
-    order_id = str(data.get('orderId') or data.get('id') or '')
-    numero_orden = data.get('orderNumber') or order_id or f"AMZ-{int(timezone.now().timestamp())}"
-    if not order_id:
-        order_id = numero_orden
-    pedido = PedidoEcommerce.objects.filter(plataforma=plataforma, pedido_id_externo=order_id).first()
-    if pedido:
-        # Actualización simple de estado
-        estado_ext = (data.get('status') or '').lower()
-        if estado_ext in ['shipped','enviado']:
-            pedido.estado = 'enviado'
-            pedido.fecha_envio = timezone.now()
-        elif estado_ext in ['cancelled','cancelado']:
-            pedido.estado = 'cancelado'
-        pedido.save()
-        return pedido
-    # Crear pedido nuevo
-    buyer = data.get('buyer', {})
-    shipping = data.get('shippingAddress', {})
-    total = float(data.get('total', 0))
-    currency = (data.get('currency') or 'CLP')[:3]
-    fecha_pedido = data.get('purchaseDate') or timezone.now().isoformat()
-    pedido = PedidoEcommerce.objects.create(
-        plataforma=plataforma,
-        pedido_id_externo=order_id,
-        numero_orden=numero_orden,
-        cliente_nombre=f"{buyer.get('name') or buyer.get('firstName','')} {buyer.get('lastName','')}".strip() or (buyer.get('name') or 'Amazon Cliente'),
-        cliente_email=buyer.get('email','no-reply@example.com'),
-        cliente_telefono=buyer.get('phone',''),
-        direccion_entrega=_formatear_direccion_amazon(shipping),
-        direccion_envio=_formatear_direccion_amazon(data.get('billingAddress', {})),
-        total=total,
-        moneda=currency,
-        estado='pendiente',
-        fecha_pedido=datetime.fromisoformat(str(fecha_pedido).replace('Z','+00:00')) if isinstance(fecha_pedido, str) else timezone.now(),
-        datos_raw=data
-    )
-    # Productos
-    for item in (data.get('items') or []):
-        ProductoPedido.objects.create(
-            pedido=pedido,
-            sku=str(item.get('sku') or item.get('asin') or ''),
-            nombre=item.get('name','Item Amazon'),
-            cantidad=int(item.get('quantity') or 1),
-            precio_unitario=float(item.get('price') or 0),
-            peso_kg=float(item.get('weightKg') or 0) if item.get('weightKg') is not None else None,
-            dimensiones=item.get('dimensions','')
-        )
-    envio = _crear_envio_desde_pedido(pedido)
-    pedido.envio = envio
-    pedido.save()
-    return pedido
-
-
-def _formatear_direccion_amazon(addr):
-    partes = [addr.get('address1',''), addr.get('address2',''), addr.get('city',''), addr.get('state',''), addr.get('postalCode',''), addr.get('country','')]
-    return ', '.join([p for p in partes if p])
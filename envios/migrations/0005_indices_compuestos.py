@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Une las dos ramas de migraciones de envios
+    dependencies = [
+        ('envios', '0002_envio_eta_fields'),
+        ('envios', '0004_envio_transportista'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='envio',
+            index=models.Index(fields=['usuario', 'estado', 'creado_en'], name='envios_envi_usuario_d5db98_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0005_indices_compuestos'),
+        ('transportista', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='envio',
+            index=models.Index(fields=['creado_en'], name='envios_envi_creado__4fd71b_idx'),
+        ),
+    ]
@@ -31,6 +31,12 @@ class Envio(models.Model):
     destino_lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     destino_lng = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'estado', 'creado_en']),
+            models.Index(fields=['creado_en']),
+        ]
+
     def __str__(self):
         return f"{self.codigo} - {self.estado}"
 
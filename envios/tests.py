@@ -1,3 +1,56 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from CorreosChile.paginacion import paginar_por_cursor
+from .models import Envio
+
+
+class PaginacionCursorTest(TestCase):
+    def setUp(self):
+        for i in range(25):
+            Envio.objects.create(
+                codigo=f'ENV{i:03d}', origen='Santiago', destino='Valparaíso',
+                destinatario_nombre=f'Destinatario {i}', direccion_destino='Calle 1',
+            )
+        # Misma fecha para todos: el id desempata
+        Envio.objects.update(creado_en=timezone.now())
+        self.esperado = list(Envio.objects.order_by('-creado_en', '-id').values_list('id', flat=True))
+
+    def test_recorre_adelante_y_atras_sin_repetir(self):
+        queryset = Envio.objects.all()
+        paginas, cursor = [], None
+        while True:
+            pagina = paginar_por_cursor(queryset, cursor, tamano=10)
+            paginas.append(pagina)
+            if not pagina.has_next:
+                break
+            cursor = pagina.cursor_siguiente
+        self.assertEqual([len(p) for p in paginas], [10, 10, 5])
+        self.assertEqual([e.id for p in paginas for e in p], self.esperado)
+        self.assertFalse(paginas[0].has_previous)
+
+        anterior = paginar_por_cursor(queryset, paginas[2].cursor_anterior, tamano=10)
+        self.assertEqual([e.id for e in anterior], self.esperado[10:20])
+        primera = paginar_por_cursor(queryset, anterior.cursor_anterior, tamano=10)
+        self.assertEqual([e.id for e in primera], self.esperado[:10])
+        self.assertFalse(primera.has_previous)
+        self.assertTrue(primera.has_next)
+
+    def test_total_aproximado_y_cursor_invalido(self):
+        pagina = paginar_por_cursor(Envio.objects.all(), 'no-es-un-cursor', tamano=10, con_total=True)
+        self.assertEqual([e.id for e in pagina], self.esperado[:10])
+        self.assertEqual(pagina.total, 25)
+        self.assertFalse(pagina.total_es_minimo)
+
+    def test_index_usa_cursor(self):
+        user = User.objects.create_user('operador', password='x')
+        self.client.force_login(user)
+        response = self.client.get(reverse('envios:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['envios']), 10)
+        siguiente = response.context['page_obj'].cursor_siguiente
+        response = self.client.get(reverse('envios:index'), {'cursor': siguiente})
+        self.assertEqual([e.id for e in response.context['envios']], self.esperado[10:20])
+        self.assertContains(response, '25 resultados')
@@ -1,7 +1,6 @@
 from django.shortcuts import render
 from django.http import HttpResponse, JsonResponse
 import csv
-from django.core.paginator import Paginator
 from django.db.models import Q, Count
 from django.utils import timezone
 from .models import Envio, Bulto
@@ -14,6 +13,9 @@ from usuarios.models import Perfil
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from CorreosChile.fechas import filtrar_por_fechas
+from CorreosChile.paginacion import paginar_por_cursor
+from busqueda.consulta import filtrar_busqueda
 
 @login_required
 def index(request):
@@ -74,11 +76,7 @@ def index(request):
 
     queryset = Envio.objects.all()
     if q:
-        queryset = queryset.filter(
-            Q(codigo__icontains=q) |
-            Q(destinatario_nombre__icontains=q) |
-            Q(direccion_destino__icontains=q)
-        )
+        queryset = filtrar_busqueda(queryset, 'envio', q)
     if estado:
         queryset = queryset.filter(estado=estado)
     if origen:
@@ -115,9 +113,7 @@ def index(request):
             writer.writerow([getattr(e,'codigo',''), getattr(e,'estado',''), getattr(e,'origen',''), getattr(e,'destino',''), getattr(e,'destinatario_nombre',''), getattr(e,'peso_kg',''), getattr(e,'costo',''), getattr(e,'creado_en','')])
         return response
 
-    paginator = Paginator(queryset, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar_por_cursor(queryset, request.GET.get('cursor'), campo='creado_en', tamano=10, con_total=True)
 
     estados = [e[0] for e in Envio.ESTADOS]
     counts = {k: Envio.objects.filter(estado=k).count() for k in estados}
@@ -320,11 +316,7 @@ def reporte_pdf(request):
     transportista_id = request.GET.get('transportista_id', '').strip()
     queryset = Envio.objects.all()
     if q:
-        queryset = queryset.filter(
-            Q(codigo__icontains=q) |
-            Q(destinatario_nombre__icontains=q) |
-            Q(direccion_destino__icontains=q)
-        )
+        queryset = filtrar_busqueda(queryset, 'envio', q)
     if estado:
         queryset = queryset.filter(estado=estado)
     if origen:
@@ -363,10 +355,7 @@ def reportes_operacionales(request):
     transportista_id = (request.GET.get('transportista_id') or '').strip()
 
     qs = Envio.objects.all()
-    if desde:
-        qs = qs.filter(creado_en__date__gte=desde)
-    if hasta:
-        qs = qs.filter(creado_en__date__lte=hasta)
+    qs = filtrar_por_fechas(qs, 'creado_en', desde, hasta)
     if estado:
         qs = qs.filter(estado=estado)
     if transportista_id:
@@ -402,10 +391,7 @@ def reportes_operacionales(request):
     try:
         from reclamos.models import Reclamo
         rec_qs = Reclamo.objects.all()
-        if desde:
-            rec_qs = rec_qs.filter(creado_en__date__gte=desde)
-        if hasta:
-            rec_qs = rec_qs.filter(creado_en__date__lte=hasta)
+        rec_qs = filtrar_por_fechas(rec_qs, 'creado_en', desde, hasta)
         if estado:
             # asociar por estado de envío si se filtró
             rec_qs = rec_qs.filter(envio__estado=estado)
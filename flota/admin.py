@@ -1,10 +1,15 @@
+from django import forms
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.db.models import Count, Sum
 
-from .models import TipoVehiculo, Vehiculo, MantenimientoVehiculo, RepuestoVehiculo, UsoRepuestoMantenimiento
+from .models import TipoVehiculo, Vehiculo, MantenimientoVehiculo, RepuestoVehiculo, UsoRepuestoMantenimiento, MovimientoStock
+from .context_processors import invalidar_badges
+from .estadisticas import invalidar_estadisticas
+from .inventario import resumen_inventario
+from .stock import registrar_movimiento
 
 
 @admin.register(TipoVehiculo)
@@ -83,11 +88,13 @@ class VehiculoAdmin(admin.ModelAdmin):
     
     def marcar_en_mantenimiento(self, request, queryset):
         queryset.update(estado='mantenimiento')
+        invalidar_estadisticas()
         self.message_user(request, f'{queryset.count()} vehículos marcados como en mantenimiento')
     marcar_en_mantenimiento.short_description = 'Marcar como en mantenimiento'
     
     def marcar_disponible(self, request, queryset):
         queryset.update(estado='disponible')
+        invalidar_estadisticas()
         self.message_user(request, f'{queryset.count()} vehículos marcados como disponibles')
     marcar_disponible.short_description = 'Marcar como disponible'
 
@@ -149,11 +156,15 @@ class MantenimientoVehiculoAdmin(admin.ModelAdmin):
     def marcar_completado(self, request, queryset):
         from datetime import datetime
         queryset.update(estado='completado', fecha_fin=datetime.now())
+        invalidar_badges()
+        invalidar_estadisticas()
         self.message_user(request, f'{queryset.count()} mantenimientos marcados como completados')
     marcar_completado.short_description = 'Marcar como completado'
     
     def marcar_programado(self, request, queryset):
         queryset.update(estado='programado', fecha_fin=None)
+        invalidar_badges()
+        invalidar_estadisticas()
         self.message_user(request, f'{queryset.count()} mantenimientos marcados como programados')
     marcar_programado.short_description = 'Marcar como programado'
 
@@ -184,9 +195,31 @@ class RepuestoVehiculoAdmin(admin.ModelAdmin):
         })
     )
     
+    change_list_template = 'admin/flota/repuestovehiculo/change_list.html'
+    
     def get_queryset(self, request):
         return super().get_queryset(request)
     
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), 'resumen_inventario': resumen_inventario()}
+        return super().changelist_view(request, extra_context=extra_context)
+    
+    def get_readonly_fields(self, request, obj=None):
+        # El stock de un repuesto existente solo cambia con movimientos
+        if obj is not None:
+            return self.readonly_fields + ['cantidad_stock']
+        return self.readonly_fields
+    
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+        inicial = obj.cantidad_stock
+        obj.cantidad_stock = 0
+        super().save_model(request, obj, form, change)
+        if inicial:
+            registrar_movimiento(obj.pk, inicial, 'ajuste', usuario=request.user, motivo='Stock inicial')
+            obj.cantidad_stock = inicial
+    
     def cantidad_stock_colored(self, obj):
         if obj.cantidad_stock <= obj.cantidad_minima:
             return format_html('<span style="color: red; font-weight: bold;">{}</span>', obj.cantidad_stock)
@@ -215,12 +248,38 @@ class RepuestoVehiculoAdmin(admin.ModelAdmin):
     marcar_bajo_stock.short_description = 'Ajustar stock mínimo'
 
 
+class UsoRepuestoMantenimientoForm(forms.ModelForm):
+    class Meta:
+        model = UsoRepuestoMantenimiento
+        fields = '__all__'
+    
+    def clean(self):
+        datos = super().clean()
+        repuesto, cantidad = datos.get('repuesto'), datos.get('cantidad_utilizada')
+        # Solo al crear se descuenta stock. El admin valida y guarda en la misma
+        # transacción: la fila queda bloqueada hasta el descuento y el stock no cambia entremedio
+        if self.instance.pk is None and repuesto and cantidad:
+            disponible = RepuestoVehiculo.objects.select_for_update().filter(pk=repuesto.pk).values_list(
+                'cantidad_stock', flat=True
+            ).get()
+            if disponible < cantidad:
+                self.add_error('cantidad_utilizada', f'Stock insuficiente: hay {disponible}')
+        return datos
+
+
 @admin.register(UsoRepuestoMantenimiento)
 class UsoRepuestoMantenimientoAdmin(admin.ModelAdmin):
+    form = UsoRepuestoMantenimientoForm
     list_display = ['repuesto', 'mantenimiento_link', 'cantidad_utilizada', 'costo_unitario', 'costo_total', 'fecha_creacion']
     search_fields = ['repuesto__codigo', 'repuesto__nombre', 'mantenimiento__vehiculo__numero_placa']
     readonly_fields = ['fecha_creacion', 'costo_total']
     
+    def get_readonly_fields(self, request, obj=None):
+        # El stock ya se descontó al crear el uso
+        if obj is not None:
+            return self.readonly_fields + ['mantenimiento', 'repuesto', 'cantidad_utilizada']
+        return self.readonly_fields
+    
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('repuesto', 'mantenimiento__vehiculo__tipo_vehiculo')
     
@@ -233,5 +292,26 @@ class UsoRepuestoMantenimientoAdmin(admin.ModelAdmin):
     mantenimiento_link.short_description = 'Mantenimiento'
     
     def costo_total(self, obj):
+        # En el formulario de alta todavía no hay cantidad ni costo
+        if obj.cantidad_utilizada is None or obj.costo_unitario is None:
+            return '-'
         return obj.cantidad_utilizada * obj.costo_unitario
     costo_total.short_description = 'Costo Total'
+
+
+@admin.register(MovimientoStock)
+class MovimientoStockAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'repuesto', 'tipo', 'cantidad', 'stock_resultante', 'mantenimiento', 'usuario']
+    list_filter = ['tipo', 'fecha']
+    search_fields = ['repuesto__codigo', 'repuesto__nombre', 'motivo']
+    list_select_related = ['repuesto', 'mantenimiento', 'usuario']
+    
+    # Libro de movimientos: no se crean, editan ni eliminan filas desde el admin
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
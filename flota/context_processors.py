@@ -1,18 +1,45 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from .models import MantenimientoVehiculo
 
+# Los badges se comparten entre todas las páginas; se invalidan al guardar o
+# eliminar un mantenimiento y el TTL cubre los updates masivos
+TTL_BADGES_S = 60
 
-def flota_badges(request):
+
+def _clave_badges():
+    # Los vencidos dependen del día, así que la clave también
+    return f'flota:badges:{timezone.localdate().isoformat()}'
+
+
+def conteo_badges():
+    conteo = cache.get(_clave_badges())
+    if conteo is None:
+        conteo = MantenimientoVehiculo.objects.filter(estado='programado').aggregate(
+            programados=Count('id'),
+            vencidos=Count('id', filter=Q(fecha_programada__lt=timezone.localdate())),
+        )
+        cache.set(_clave_badges(), conteo, TTL_BADGES_S)
+    return conteo
+
+
+def invalidar_badges():
+    cache.delete(_clave_badges())
+
+
+def _conteo_seguro():
     try:
-        hoy = timezone.now().date()
-        programados = MantenimientoVehiculo.objects.filter(estado='programado').count()
-        vencidos = MantenimientoVehiculo.objects.filter(estado='programado', fecha_programada__lt=hoy).count()
-        return {
-            'flota_mantenimientos_programados': programados,
-            'flota_mantenimientos_vencidos': vencidos,
-        }
+        return conteo_badges()
     except Exception:
-        return {
-            'flota_mantenimientos_programados': 0,
-            'flota_mantenimientos_vencidos': 0,
-        }
+        return {'programados': 0, 'vencidos': 0}
+
+
+def flota_badges(request):
+    # Nada se consulta hasta que un template usa alguno de los dos valores
+    conteo = SimpleLazyObject(_conteo_seguro)
+    return {
+        'flota_mantenimientos_programados': SimpleLazyObject(lambda: conteo['programados']),
+        'flota_mantenimientos_vencidos': SimpleLazyObject(lambda: conteo['vencidos']),
+    }
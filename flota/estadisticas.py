@@ -0,0 +1,75 @@
+"""
+Indicadores de la flota para el dashboard web y la API.
+
+Todos los KPI se calculan con agregación condicional: una consulta sobre
+Vehiculo y otra sobre MantenimientoVehiculo. El resultado se guarda en cache
+por un TTL corto y se invalida al guardar o eliminar un vehículo o un
+mantenimiento (ver signals.py).
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Vehiculo, MantenimientoVehiculo
+
+TTL_ESTADISTICAS_S = 60
+DIAS_PROXIMOS = 7
+ESTADOS_OPERATIVOS = ('disponible', 'en_uso')
+
+
+def _clave_estadisticas():
+    # Los próximos 7 días y el costo del mes dependen de la fecha
+    return f'flota:estadisticas:{timezone.localdate().isoformat()}'
+
+
+def requiere_mantenimiento_q(hoy):
+    """Mismo criterio que Vehiculo.necesita_mantenimiento, como filtro"""
+    return Q(es_activo=True) & (
+        Q(proximo_mantenimiento_km__isnull=False, proximo_mantenimiento_km__lte=F('kilometraje_actual')) |
+        Q(proximo_mantenimiento_fecha__isnull=False, proximo_mantenimiento_fecha__lte=hoy)
+    )
+
+
+def calcular_estadisticas(hoy=None):
+    hoy = hoy or timezone.localdate()
+    inicio_mes = timezone.make_aware(datetime.combine(hoy.replace(day=1), time.min))
+
+    vehiculos = Vehiculo.objects.order_by().aggregate(
+        total_vehiculos=Count('id'),
+        vehiculos_operativos=Count('id', filter=Q(estado__in=ESTADOS_OPERATIVOS)),
+        vehiculos_mantenimiento=Count('id', filter=Q(estado='mantenimiento')),
+        vehiculos_fuera_servicio=Count('id', filter=Q(estado='fuera_servicio')),
+        vehiculos_por_mantener=Count('id', filter=requiere_mantenimiento_q(hoy)),
+        promedio_consumo_combustible=Avg('consumo_promedio_km', filter=Q(consumo_promedio_km__gt=0)),
+    )
+    mantenimientos = MantenimientoVehiculo.objects.order_by().aggregate(
+        mantenimientos_pendientes=Count('id', filter=Q(estado='programado')),
+        mantenimientos_proximos_7_dias=Count('id', filter=Q(
+            estado='programado', fecha_programada__lte=hoy + timedelta(days=DIAS_PROXIMOS)
+        )),
+        costo_mantenimiento_mes=Coalesce(
+            Sum('costo_total', filter=Q(estado='completado', fecha_fin__gte=inicio_mes)),
+            Value(0),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+    estadisticas = {**vehiculos, **mantenimientos}
+    estadisticas['promedio_consumo_combustible'] = round(float(vehiculos['promedio_consumo_combustible'] or 0), 2)
+    return estadisticas
+
+
+def estadisticas_flota():
+    """KPI de la flota, desde el cache si están"""
+    estadisticas = cache.get(_clave_estadisticas())
+    if estadisticas is None:
+        estadisticas = calcular_estadisticas()
+        cache.set(_clave_estadisticas(), estadisticas, TTL_ESTADISTICAS_S)
+    return estadisticas
+
+
+def invalidar_estadisticas():
+    cache.delete(_clave_estadisticas())
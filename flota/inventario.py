@@ -0,0 +1,65 @@
+"""
+Indicadores del inventario de repuestos.
+
+La valorización y los conteos de stock se calculan con un solo aggregate en la
+base de datos en vez de recorrer los repuestos en Python. Las listas de marcas
+y proveedores para los filtros cambian poco: se obtienen en una consulta y se
+guardan en cache hasta que se guarda o elimina un repuesto.
+
+Lo usan la vista de inventario, el admin y la API, así muestran los mismos
+números.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import RepuestoVehiculo
+
+CLAVE_FACETAS = 'flota:inventario:facetas'
+TTL_FACETAS_S = 60 * 60
+
+VALOR_STOCK = ExpressionWrapper(
+    F('cantidad_stock') * F('precio_unitario'),
+    output_field=DecimalField(max_digits=20, decimal_places=2),
+)
+
+
+def resumen_inventario(queryset=None):
+    """
+    Totales del inventario en una consulta.
+
+    Returns:
+        dict con total_repuestos, stock_bajo, stock_optimo, agotados y valor_total
+    """
+    if queryset is None:
+        queryset = RepuestoVehiculo.objects.all()
+    resumen = queryset.order_by().aggregate(
+        total_repuestos=Count('id'),
+        stock_bajo=Count('id', filter=Q(cantidad_stock__lte=F('cantidad_minima'))),
+        agotados=Count('id', filter=Q(cantidad_stock=0)),
+        valor_total=Coalesce(Sum(VALOR_STOCK), Value(Decimal('0.00')), output_field=VALOR_STOCK.output_field),
+    )
+    resumen['stock_optimo'] = resumen['total_repuestos'] - resumen['stock_bajo']
+    return resumen
+
+
+def facetas_inventario():
+    """Marcas y proveedores distintos para los filtros, desde el cache si están"""
+    facetas = cache.get(CLAVE_FACETAS)
+    if facetas is None:
+        pares = RepuestoVehiculo.objects.order_by().values_list('marca', 'proveedor_principal').distinct()
+        marcas, proveedores = set(), set()
+        for marca, proveedor in pares:
+            if marca:
+                marcas.add(marca)
+            if proveedor:
+                proveedores.add(proveedor)
+        facetas = {'marcas': sorted(marcas), 'proveedores': sorted(proveedores)}
+        cache.set(CLAVE_FACETAS, facetas, TTL_FACETAS_S)
+    return facetas
+
+
+def invalidar_facetas():
+    cache.delete(CLAVE_FACETAS)
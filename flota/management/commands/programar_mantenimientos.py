@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from flota.planificacion_mantenimiento import planificar_mantenimientos, HORIZONTE_DIAS
+
+
+class Command(BaseCommand):
+    help = 'Proyecta el kilometraje de la flota y programa los mantenimientos predictivos repartidos por capacidad del taller'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha desde la que se planifica (YYYY-MM-DD), por defecto hoy')
+        parser.add_argument('--horizonte', type=int, default=HORIZONTE_DIAS, help='Días hacia adelante a planificar')
+        parser.add_argument('--capacidad', type=int, help='Mantenimientos por día que atiende el taller')
+        parser.add_argument('--simular', action='store_true', help='Muestra el plan sin crear mantenimientos')
+
+    def handle(self, *args, **options):
+        try:
+            hoy = date.fromisoformat(options['fecha']) if options['fecha'] else None
+        except ValueError:
+            raise CommandError('Fecha inválida')
+        if options['capacidad'] is not None and options['capacidad'] < 1:
+            raise CommandError('La capacidad debe ser al menos 1')
+
+        resultado = planificar_mantenimientos(
+            hoy=hoy,
+            horizonte_dias=options['horizonte'],
+            capacidad_diaria=options['capacidad'],
+            guardar=not options['simular'],
+        )
+        for mantenimiento in resultado['mantenimientos']:
+            self.stdout.write(
+                f"{mantenimiento.fecha_programada.isoformat()}  {mantenimiento.vehiculo.numero_placa}  {mantenimiento.descripcion}"
+            )
+        accion = 'Propuestos' if options['simular'] else 'Programados'
+        self.stdout.write(self.style.SUCCESS(
+            f"Vehículos evaluados: {resultado['evaluados']} - {accion}: {len(resultado['mantenimientos'])}"
+        ))
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from flota.models import RepuestoVehiculo, MovimientoStock
+
+TAMANO_LOTE = 500
+
+
+class Command(BaseCommand):
+    help = 'Compara el stock materializado de cada repuesto con la suma de sus movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corregir', action='store_true',
+            help='Registra un ajuste en el libro por la diferencia con cantidad_stock',
+        )
+
+    def handle(self, *args, **options):
+        # Lectura sin bloqueos para encontrar candidatos; cada lote se vuelve a
+        # revisar con las filas bloqueadas antes de escribir
+        saldos = dict(
+            MovimientoStock.objects.values_list('repuesto_id').annotate(saldo=Sum('cantidad')).order_by()
+        )
+
+        # Repuestos anteriores al libro: su stock actual queda como saldo inicial
+        sin_movimientos = list(
+            RepuestoVehiculo.objects.exclude(pk__in=saldos.keys()).filter(cantidad_stock__gt=0)
+            .values_list('pk', flat=True)
+        )
+        iniciales = self.asentar_diferencias(sin_movimientos, 'Saldo inicial')
+
+        diferencias = [
+            (pk, stock, saldos[pk])
+            for pk, stock in RepuestoVehiculo.objects.filter(pk__in=saldos.keys()).values_list('pk', 'cantidad_stock').iterator()
+            if stock != saldos[pk]
+        ]
+        for pk, stock, saldo in diferencias:
+            self.stdout.write(f'Repuesto {pk}: stock {stock}, movimientos {saldo}')
+        if options['corregir']:
+            corregidas = self.asentar_diferencias([pk for pk, _, _ in diferencias], 'Ajuste por reconciliación')
+            diferencias = corregidas
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Saldos iniciales: {len(iniciales)} - Diferencias: {len(diferencias)}'
+            + (' (corregidas)' if options['corregir'] and diferencias else '')
+        ))
+
+    def asentar_diferencias(self, repuesto_ids, motivo):
+        """
+        Agrega un movimiento de ajuste por la diferencia entre cantidad_stock y
+        la suma de los movimientos de cada repuesto.
+
+        Por lote bloquea las filas de los repuestos (en orden de id, como
+        consumir_repuestos) y recalcula el saldo con ellas bloqueadas: un
+        movimiento concurrente termina antes o espera, así que el ajuste no
+        pisa ninguno. El saldo materializado no se toca; el libro queda
+        cuadrado con él.
+
+        Returns:
+            Lista de MovimientoStock creados
+        """
+        ajustes = []
+        for inicio in range(0, len(repuesto_ids), TAMANO_LOTE):
+            lote = repuesto_ids[inicio:inicio + TAMANO_LOTE]
+            with transaction.atomic():
+                stocks = dict(
+                    RepuestoVehiculo.objects.select_for_update().filter(pk__in=lote).order_by('pk')
+                    .values_list('pk', 'cantidad_stock')
+                )
+                saldos = dict(
+                    MovimientoStock.objects.filter(repuesto_id__in=lote)
+                    .values_list('repuesto_id').annotate(saldo=Sum('cantidad')).order_by()
+                )
+                nuevos = [
+                    MovimientoStock(repuesto_id=pk, tipo='ajuste', cantidad=stock - saldos.get(pk, 0),
+                                    stock_resultante=stock, motivo=motivo)
+                    for pk, stock in stocks.items()
+                    if stock != saldos.get(pk, 0)
+                ]
+                MovimientoStock.objects.bulk_create(nuevos)
+            ajustes.extend(nuevos)
+        return ajustes
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flota', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('salida', 'Salida'), ('consumo', 'Consumo en mantenimiento'), ('ajuste', 'Ajuste')], max_length=10)),
+                ('cantidad', models.IntegerField(help_text='Positiva si entra al stock, negativa si sale')),
+                ('stock_resultante', models.PositiveIntegerField(help_text='Stock del repuesto después del movimiento')),
+                ('motivo', models.CharField(blank=True, max_length=255)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('mantenimiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='flota.mantenimientovehiculo')),
+                ('repuesto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='flota.repuestovehiculo')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Stock',
+                'verbose_name_plural': 'Movimientos de Stock',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['repuesto', 'fecha'], name='flota_movim_repuest_4d6789_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -357,9 +357,62 @@ class UsoRepuestoMantenimiento(models.Model):
         if not self.costo_unitario:
             self.costo_unitario = self.repuesto.precio_unitario
         
-        # Descontar del stock
-        if self.pk is None:  # Solo al crear
-            self.repuesto.cantidad_stock -= self.cantidad_utilizada
-            self.repuesto.save()
+        if self.pk is not None:
+            super().save(*args, **kwargs)
+            return
         
-        super().save(*args, **kwargs)
+        # Al crear se descuenta del stock con su movimiento, en la misma transacción
+        from .stock import registrar_movimiento
+        with transaction.atomic():
+            registrar_movimiento(
+                self.repuesto_id, -self.cantidad_utilizada, 'consumo',
+                mantenimiento=self.mantenimiento, motivo=f'Uso en {self.mantenimiento.titulo}',
+            )
+            super().save(*args, **kwargs)
+            MantenimientoVehiculo.objects.filter(pk=self.mantenimiento_id).update(
+                costo_repuestos=models.F('costo_repuestos') + self.costo_total,
+                costo_total=models.F('costo_total') + self.costo_total,
+            )
+
+
+class MovimientoStock(models.Model):
+    """
+    Libro de movimientos de stock de repuestos (solo se agregan filas).
+
+    RepuestoVehiculo.cantidad_stock es el saldo materializado: se actualiza en
+    la misma transacción que cada movimiento (ver flota/stock.py) y el comando
+    reconciliar_stock lo compara con la suma de los movimientos.
+    """
+    
+    TIPOS_MOVIMIENTO = [
+        ('entrada', 'Entrada'),
+        ('salida', 'Salida'),
+        ('consumo', 'Consumo en mantenimiento'),
+        ('ajuste', 'Ajuste'),
+    ]
+    
+    repuesto = models.ForeignKey(RepuestoVehiculo, on_delete=models.PROTECT, related_name='movimientos')
+    tipo = models.CharField(max_length=10, choices=TIPOS_MOVIMIENTO)
+    cantidad = models.IntegerField(help_text="Positiva si entra al stock, negativa si sale")
+    stock_resultante = models.PositiveIntegerField(help_text="Stock del repuesto después del movimiento")
+    mantenimiento = models.ForeignKey(
+        MantenimientoVehiculo,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='movimientos_stock'
+    )
+    usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock')
+    motivo = models.CharField(max_length=255, blank=True)
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Movimiento de Stock"
+        verbose_name_plural = "Movimientos de Stock"
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['repuesto', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} - {self.repuesto.codigo}"
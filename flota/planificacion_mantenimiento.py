@@ -0,0 +1,179 @@
+"""
+Programación anticipada de mantenimientos.
+
+Para cada vehículo activo se proyecta el kilometraje con su uso reciente:
+primero los km de las rutas completadas por su conductor en las últimas
+semanas y, si no hay rutas, el avance del odómetro desde el último
+mantenimiento. Con esa tasa se estima el día en que cruzará el umbral de
+kilometraje o de fecha, y si cae dentro del horizonte se crea un
+MantenimientoVehiculo predictivo en estado programado.
+
+Los mantenimientos se reparten respetando la capacidad diaria del taller:
+se usa el último día con cupo antes de la fecha prevista y, si no hay, el
+primero después. Así la carga no se concentra en un mismo día y los
+vehículos llegan al taller antes de vencer.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from conductores.models import RutaConductor
+from .context_processors import invalidar_badges
+from .estadisticas import invalidar_estadisticas
+from .models import Vehiculo, MantenimientoVehiculo
+
+HORIZONTE_DIAS = 30
+VENTANA_HISTORIAL_DIAS = 28
+CAPACIDAD_TALLER_DIARIA = getattr(settings, 'FLOTA_CAPACIDAD_TALLER_DIARIA', 3)
+# Intervalos cuando el vehículo no tiene próximo mantenimiento definido
+INTERVALO_KM = 10000
+INTERVALO_DIAS = 180
+# El taller no atiende los domingos
+DIAS_SIN_TALLER = {6}
+ESTADOS_ABIERTOS = ('programado', 'en_proceso', 'aplazado')
+
+
+def _km_diarios_por_conductor(conductor_ids, hoy):
+    """km diarios promedio de las rutas completadas de cada conductor"""
+    if not conductor_ids:
+        return {}
+    filas = (
+        RutaConductor.objects
+        .filter(
+            conductor_id__in=conductor_ids,
+            estado='completada',
+            fecha__gte=hoy - timedelta(days=VENTANA_HISTORIAL_DIAS),
+            fecha__lt=hoy,
+        )
+        .values('conductor_id')
+        .annotate(km=Sum('distancia_total_km'))
+    )
+    return {f['conductor_id']: float(f['km'] or 0) / VENTANA_HISTORIAL_DIAS for f in filas}
+
+
+def km_diarios(vehiculo, hoy, km_por_conductor):
+    """Tasa de uso del vehículo en km por día (None si no hay datos)"""
+    km = km_por_conductor.get(vehiculo.conductor_asignado_id)
+    if km:
+        return km
+    if vehiculo.fecha_ultimo_mantenimiento and vehiculo.kilometraje_ultimo_mantenimiento is not None:
+        dias = (hoy - vehiculo.fecha_ultimo_mantenimiento).days
+        recorridos = vehiculo.kilometraje_actual - vehiculo.kilometraje_ultimo_mantenimiento
+        if dias > 0 and recorridos > 0:
+            return recorridos / dias
+    return None
+
+
+def fecha_prevista(vehiculo, hoy, tasa_km):
+    """
+    Fecha estimada en que el vehículo alcanza su próximo mantenimiento.
+
+    Returns:
+        (fecha, motivo) o (None, '') si no hay umbral que proyectar
+    """
+    umbral_km = vehiculo.proximo_mantenimiento_km
+    if umbral_km is None and vehiculo.kilometraje_ultimo_mantenimiento is not None:
+        umbral_km = vehiculo.kilometraje_ultimo_mantenimiento + INTERVALO_KM
+    umbral_fecha = vehiculo.proximo_mantenimiento_fecha
+    if umbral_fecha is None and vehiculo.fecha_ultimo_mantenimiento:
+        umbral_fecha = vehiculo.fecha_ultimo_mantenimiento + timedelta(days=INTERVALO_DIAS)
+
+    candidatas = []
+    if umbral_km is not None:
+        faltan = umbral_km - vehiculo.kilometraje_actual
+        if faltan <= 0:
+            candidatas.append((hoy, f'Superó los {umbral_km} km'))
+        elif tasa_km:
+            dias = math.ceil(faltan / tasa_km)
+            candidatas.append((hoy + timedelta(days=dias), f'Llegará a {umbral_km} km (~{tasa_km:.0f} km/día)'))
+    if umbral_fecha is not None:
+        candidatas.append((max(umbral_fecha, hoy), f'Fecha de mantenimiento {umbral_fecha.isoformat()}'))
+    if not candidatas:
+        return None, ''
+    return min(candidatas, key=lambda c: c[0])
+
+
+def _asignar_dia(prevista, hoy, ocupacion, capacidad):
+    """Último día hábil con cupo hasta la fecha prevista, o el primero después"""
+    dia = prevista
+    while dia >= hoy:
+        if dia.weekday() not in DIAS_SIN_TALLER and ocupacion.get(dia, 0) < capacidad:
+            return dia
+        dia -= timedelta(days=1)
+    dia = prevista + timedelta(days=1)
+    while True:
+        if dia.weekday() not in DIAS_SIN_TALLER and ocupacion.get(dia, 0) < capacidad:
+            return dia
+        dia += timedelta(days=1)
+
+
+def planificar_mantenimientos(hoy=None, horizonte_dias=HORIZONTE_DIAS, capacidad_diaria=None, guardar=True):
+    """
+    Programa los mantenimientos predictivos que vencen dentro del horizonte.
+
+    Los vehículos que ya tienen un mantenimiento abierto se omiten, así el
+    comando puede ejecutarse a diario sin duplicar.
+
+    Returns:
+        dict con los mantenimientos creados (o propuestos si guardar=False)
+    """
+    hoy = hoy or timezone.localdate()
+    capacidad = capacidad_diaria or CAPACIDAD_TALLER_DIARIA
+    limite = hoy + timedelta(days=horizonte_dias)
+
+    vehiculos = list(
+        Vehiculo.objects
+        .filter(es_activo=True)
+        .exclude(estado='vendido')
+        .exclude(mantenimientos__estado__in=ESTADOS_ABIERTOS)
+        .only(
+            'id', 'numero_placa', 'conductor_asignado', 'kilometraje_actual',
+            'fecha_ultimo_mantenimiento', 'kilometraje_ultimo_mantenimiento',
+            'proximo_mantenimiento_km', 'proximo_mantenimiento_fecha',
+        )
+    )
+    km_por_conductor = _km_diarios_por_conductor(
+        [v.conductor_asignado_id for v in vehiculos if v.conductor_asignado_id], hoy
+    )
+
+    previstos = []
+    for vehiculo in vehiculos:
+        prevista, motivo = fecha_prevista(vehiculo, hoy, km_diarios(vehiculo, hoy, km_por_conductor))
+        if prevista is not None and prevista <= limite:
+            previstos.append((prevista, vehiculo.numero_placa, vehiculo, motivo))
+    # Los que vencen antes eligen día primero
+    previstos.sort(key=lambda p: (p[0], p[1]))
+
+    ocupacion = dict(
+        MantenimientoVehiculo.objects
+        .filter(estado__in=ESTADOS_ABIERTOS, fecha_programada__gte=hoy)
+        .values_list('fecha_programada')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+
+    nuevos = []
+    for prevista, _, vehiculo, motivo in previstos:
+        dia = _asignar_dia(prevista, hoy, ocupacion, capacidad)
+        ocupacion[dia] = ocupacion.get(dia, 0) + 1
+        nuevos.append(MantenimientoVehiculo(
+            vehiculo=vehiculo,
+            tipo_mantenimiento='predictivo',
+            estado='programado',
+            titulo=f'Mantenimiento predictivo - {vehiculo.numero_placa}',
+            descripcion=f'{motivo}. Fecha prevista: {prevista.isoformat()}',
+            kilometraje_actual=vehiculo.kilometraje_actual,
+            fecha_programada=dia,
+            prioridad='alta' if prevista <= hoy else 'media',
+        ))
+
+    if guardar and nuevos:
+        MantenimientoVehiculo.objects.bulk_create(nuevos, batch_size=500)
+        # bulk_create no emite post_save
+        invalidar_badges()
+        invalidar_estadisticas()
+
+    return {'mantenimientos': nuevos, 'evaluados': len(vehiculos)}
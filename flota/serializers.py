@@ -1,5 +1,8 @@
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import TipoVehiculo, Vehiculo, MantenimientoVehiculo, RepuestoVehiculo, UsoRepuestoMantenimiento
+from .stock import registrar_movimiento
 from conductores.models import Conductor
 
 
@@ -9,95 +12,86 @@ class TipoVehiculoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+def _nombre_conductor(vehiculo):
+    # conductor_asignado__usuario viene en el select_related del viewset
+    conductor = vehiculo.conductor_asignado
+    if conductor:
+        return f"{conductor.usuario.first_name} {conductor.usuario.last_name}"
+    return "Sin asignar"
+
+
 class VehiculoSerializer(serializers.ModelSerializer):
-    tipo_nombre = serializers.CharField(source='tipo.nombre', read_only=True)
+    tipo_nombre = serializers.CharField(source='tipo_vehiculo.nombre', read_only=True)
+    capacidad_carga_kg = serializers.DecimalField(source='tipo_vehiculo.capacidad_carga_kg', max_digits=10, decimal_places=2, read_only=True)
+    capacidad_volumen_m3 = serializers.DecimalField(source='tipo_vehiculo.capacidad_volumen_m3', max_digits=10, decimal_places=2, read_only=True)
     conductor_nombre = serializers.SerializerMethodField(read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
-    estado_mantenimiento_display = serializers.CharField(source='get_estado_mantenimiento_display', read_only=True)
     dias_ultimo_mantenimiento = serializers.SerializerMethodField(read_only=True)
-    proximo_mantenimiento_km = serializers.SerializerMethodField(read_only=True)
-    proximo_mantenimiento_fecha = serializers.SerializerMethodField(read_only=True)
+    necesita_mantenimiento = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = Vehiculo
         fields = [
-            'id', 'patente', 'marca', 'modelo', 'anio', 'tipo', 'tipo_nombre',
+            'id', 'numero_placa', 'marca', 'modelo', 'año_fabricacion', 'tipo_vehiculo', 'tipo_nombre',
             'capacidad_carga_kg', 'capacidad_volumen_m3', 'conductor_asignado',
             'conductor_nombre', 'estado', 'estado_display', 'kilometraje_actual',
-            'estado_mantenimiento', 'estado_mantenimiento_display', 'ultimo_mantenimiento',
+            'tipo_combustible', 'consumo_promedio_km', 'capacidad_tanque_litros',
+            'fecha_ultimo_mantenimiento', 'kilometraje_ultimo_mantenimiento',
             'proximo_mantenimiento_km', 'proximo_mantenimiento_fecha',
-            'dias_ultimo_mantenimiento', 'consumo_combustible_promedio',
-            'numero_chasis', 'numero_motor', 'fecha_adquisicion', 'fecha_creacion',
+            'dias_ultimo_mantenimiento', 'necesita_mantenimiento',
+            'numero_chasis', 'numero_motor', 'es_activo', 'fecha_adquisicion', 'fecha_creacion',
             'fecha_actualizacion'
         ]
         read_only_fields = ['fecha_creacion', 'fecha_actualizacion']
     
     def get_conductor_nombre(self, obj):
-        if obj.conductor_asignado:
-            return f"{obj.conductor_asignado.usuario.first_name} {obj.conductor_asignado.usuario.last_name}"
-        return "Sin asignar"
+        return _nombre_conductor(obj)
     
     def get_dias_ultimo_mantenimiento(self, obj):
-        if obj.ultimo_mantenimiento:
+        if obj.fecha_ultimo_mantenimiento:
             from datetime import date
-            dias = (date.today() - obj.ultimo_mantenimiento).days
+            dias = (date.today() - obj.fecha_ultimo_mantenimiento).days
             return dias
         return None
-    
-    def get_proximo_mantenimiento_km(self, obj):
-        if obj.kilometraje_actual and obj.tipo.kilometraje_mantenimiento:
-            return obj.kilometraje_actual + (obj.tipo.kilometraje_mantenimiento - (obj.kilometraje_actual % obj.tipo.kilometraje_mantenimiento))
-        return None
-    
-    def get_proximo_mantenimiento_fecha(self, obj):
-        if obj.ultimo_mantenimiento and obj.tipo.dias_mantenimiento:
-            from datetime import timedelta
-            return obj.ultimo_mantenimiento + timedelta(days=obj.tipo.dias_mantenimiento)
-        return None
 
 
 class VehiculoAsignacionSerializer(serializers.ModelSerializer):
-    tipo_nombre = serializers.CharField(source='tipo.nombre', read_only=True)
+    tipo_nombre = serializers.CharField(source='tipo_vehiculo.nombre', read_only=True)
     conductor_actual = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = Vehiculo
-        fields = ['id', 'patente', 'marca', 'modelo', 'tipo_nombre', 'conductor_actual', 'estado']
+        fields = ['id', 'numero_placa', 'marca', 'modelo', 'tipo_nombre', 'conductor_actual', 'estado']
     
     def get_conductor_actual(self, obj):
         if obj.conductor_asignado:
             return {
                 'id': obj.conductor_asignado.id,
-                'nombre': f"{obj.conductor_asignado.usuario.first_name} {obj.conductor_asignado.usuario.last_name}",
+                'nombre': _nombre_conductor(obj),
                 'telefono': obj.conductor_asignado.telefono
             }
         return None
 
 
 class MantenimientoVehiculoSerializer(serializers.ModelSerializer):
-    vehiculo_patente = serializers.CharField(source='vehiculo.patente', read_only=True)
+    vehiculo_placa = serializers.CharField(source='vehiculo.numero_placa', read_only=True)
     tipo_mantenimiento_display = serializers.CharField(source='get_tipo_mantenimiento_display', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
-    costo_total = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = MantenimientoVehiculo
         fields = [
-            'id', 'vehiculo', 'vehiculo_patente', 'tipo_mantenimiento',
-            'tipo_mantenimiento_display', 'descripcion', 'fecha_programada',
-            'fecha_realizacion', 'kilometraje_actual', 'estado', 'estado_display',
-            'costo_mano_obra', 'costo_repuestos', 'costo_total', 'taller',
-            'descripcion_trabajo_realizado', 'duracion_dias', 'proveedor',
-            'fecha_creacion', 'fecha_actualizacion'
+            'id', 'vehiculo', 'vehiculo_placa', 'tipo_mantenimiento',
+            'tipo_mantenimiento_display', 'titulo', 'descripcion', 'fecha_programada',
+            'fecha_inicio', 'fecha_fin', 'kilometraje_actual', 'estado', 'estado_display',
+            'prioridad', 'costo_mano_obra', 'costo_repuestos', 'costo_total', 'proveedor_servicio',
+            'trabajo_realizado', 'duracion_horas', 'fecha_creacion', 'fecha_actualizacion'
         ]
-        read_only_fields = ['fecha_creacion', 'fecha_actualizacion', 'costo_repuestos']
-    
-    def get_costo_total(self, obj):
-        return obj.costo_mano_obra + obj.costo_repuestos
+        read_only_fields = ['fecha_creacion', 'fecha_actualizacion', 'costo_repuestos', 'costo_total']
 
 
 class MantenimientoProgramadoSerializer(serializers.ModelSerializer):
-    vehiculo_patente = serializers.CharField(source='vehiculo.patente', read_only=True)
+    vehiculo_placa = serializers.CharField(source='vehiculo.numero_placa', read_only=True)
     vehiculo_marca = serializers.CharField(source='vehiculo.marca', read_only=True)
     vehiculo_modelo = serializers.CharField(source='vehiculo.modelo', read_only=True)
     dias_para_mantenimiento = serializers.SerializerMethodField(read_only=True)
@@ -105,8 +99,9 @@ class MantenimientoProgramadoSerializer(serializers.ModelSerializer):
     class Meta:
         model = MantenimientoVehiculo
         fields = [
-            'id', 'vehiculo', 'vehiculo_patente', 'vehiculo_marca', 'vehiculo_modelo',
-            'tipo_mantenimiento', 'descripcion', 'fecha_programada', 'dias_para_mantenimiento'
+            'id', 'vehiculo', 'vehiculo_placa', 'vehiculo_marca', 'vehiculo_modelo',
+            'tipo_mantenimiento', 'titulo', 'descripcion', 'prioridad', 'fecha_programada',
+            'dias_para_mantenimiento'
         ]
     
     def get_dias_para_mantenimiento(self, obj):
@@ -118,34 +113,61 @@ class MantenimientoProgramadoSerializer(serializers.ModelSerializer):
 
 
 class RepuestoVehiculoSerializer(serializers.ModelSerializer):
-    tipo_vehiculo_nombre = serializers.CharField(source='tipo_vehiculo.nombre', read_only=True)
+    necesita_reabastecimiento = serializers.BooleanField(read_only=True)
+    # El stock solo cambia con movimientos (ver flota/stock.py); al crear se registra como ajuste
+    stock_inicial = serializers.IntegerField(write_only=True, required=False, min_value=0)
     
     class Meta:
         model = RepuestoVehiculo
         fields = [
-            'id', 'codigo', 'nombre', 'descripcion', 'tipo_vehiculo',
-            'tipo_vehiculo_nombre', 'cantidad_stock', 'cantidad_minima',
-            'precio_unitario', 'proveedor', 'fecha_creacion', 'fecha_actualizacion'
+            'id', 'codigo', 'nombre', 'descripcion', 'marca', 'modelo_compatible',
+            'cantidad_stock', 'stock_inicial', 'cantidad_minima', 'necesita_reabastecimiento',
+            'ubicacion_almacen', 'precio_unitario', 'precio_proveedor', 'proveedor_principal',
+            'tiempo_entrega_dias', 'es_activo', 'fecha_creacion', 'fecha_actualizacion'
         ]
-        read_only_fields = ['fecha_creacion', 'fecha_actualizacion']
+        read_only_fields = ['cantidad_stock', 'fecha_creacion', 'fecha_actualizacion']
+    
+    def create(self, validated_data):
+        inicial = validated_data.pop('stock_inicial', 0)
+        request = self.context.get('request')
+        with transaction.atomic():
+            repuesto = super().create(validated_data)
+            if inicial:
+                registrar_movimiento(repuesto.pk, inicial, 'ajuste', usuario=getattr(request, 'user', None),
+                                     motivo='Stock inicial')
+                repuesto.cantidad_stock = inicial
+        return repuesto
+    
+    def update(self, instance, validated_data):
+        validated_data.pop('stock_inicial', None)
+        return super().update(instance, validated_data)
 
 
 class UsoRepuestoMantenimientoSerializer(serializers.ModelSerializer):
     repuesto_nombre = serializers.CharField(source='repuesto.nombre', read_only=True)
     repuesto_codigo = serializers.CharField(source='repuesto.codigo', read_only=True)
-    mantenimiento_id = serializers.IntegerField(source='mantenimiento.id', read_only=True)
     costo_total = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = UsoRepuestoMantenimiento
         fields = [
-            'id', 'repuesto', 'repuesto_nombre', 'repuesto_codigo', 'mantenimiento_id',
-            'cantidad_usada', 'costo_unitario', 'costo_total', 'fecha_uso'
+            'id', 'mantenimiento', 'repuesto', 'repuesto_nombre', 'repuesto_codigo',
+            'cantidad_utilizada', 'costo_unitario', 'costo_total', 'fecha_creacion'
         ]
-        read_only_fields = ['fecha_uso']
+        read_only_fields = ['fecha_creacion']
+        # Sin costo se toma el precio actual del repuesto (ver UsoRepuestoMantenimiento.save)
+        extra_kwargs = {'costo_unitario': {'required': False}}
+    
+    def validate(self, attrs):
+        # El stock se descuenta al crear el uso; cambiarlo después dejaría el libro de movimientos descuadrado
+        if self.instance is not None:
+            for campo in ('mantenimiento', 'repuesto', 'cantidad_utilizada'):
+                if campo in attrs and attrs[campo] != getattr(self.instance, campo):
+                    raise serializers.ValidationError({campo: 'No se puede modificar; registre un nuevo uso'})
+        return attrs
     
     def get_costo_total(self, obj):
-        return obj.cantidad_usada * obj.costo_unitario
+        return obj.cantidad_utilizada * obj.costo_unitario
 
 
 class DashboardFlotaSerializer(serializers.Serializer):
@@ -155,39 +177,59 @@ class DashboardFlotaSerializer(serializers.Serializer):
     vehiculos_fuera_servicio = serializers.IntegerField()
     mantenimientos_pendientes = serializers.IntegerField()
     mantenimientos_proximos_7_dias = serializers.IntegerField()
+    vehiculos_por_mantener = serializers.IntegerField()
     costo_mantenimiento_mes = serializers.DecimalField(max_digits=10, decimal_places=2)
     promedio_consumo_combustible = serializers.FloatField()
 
 
-class VehiculoDetalleSerializer(serializers.ModelSerializer):
-    tipo_nombre = serializers.CharField(source='tipo.nombre', read_only=True)
-    conductor_nombre = serializers.SerializerMethodField(read_only=True)
-    estado_display = serializers.CharField(source='get_estado_display', read_only=True)
-    estado_mantenimiento_display = serializers.CharField(source='get_estado_mantenimiento_display', read_only=True)
+MAX_ULTIMOS = 5
+MAX_PENDIENTES = 3
+ORDEN_ULTIMOS = ('-fecha_programada', '-id')
+ORDEN_PENDIENTES = ('fecha_programada', 'id')
+
+
+class VehiculoDetalleSerializer(VehiculoSerializer):
+    """
+    Vehículo con sus últimos mantenimientos y los programados.
+
+    Espera las listas precargadas por VehiculoViewSet (ver
+    vehiculos_con_mantenimientos); si no están, las consulta por vehículo.
+    """
     ultimos_mantenimientos = serializers.SerializerMethodField(read_only=True)
     mantenimientos_pendientes = serializers.SerializerMethodField(read_only=True)
     
-    class Meta:
-        model = Vehiculo
-        fields = [
-            'id', 'patente', 'marca', 'modelo', 'anio', 'tipo', 'tipo_nombre',
-            'capacidad_carga_kg', 'capacidad_volumen_m3', 'conductor_asignado',
-            'conductor_nombre', 'estado', 'estado_display', 'kilometraje_actual',
-            'estado_mantenimiento', 'estado_mantenimiento_display', 'ultimo_mantenimiento',
-            'proximo_mantenimiento_km', 'proximo_mantenimiento_fecha',
-            'consumo_combustible_promedio', 'numero_chasis', 'numero_motor',
-            'fecha_adquisicion', 'ultimos_mantenimientos', 'mantenimientos_pendientes'
-        ]
-    
-    def get_conductor_nombre(self, obj):
-        if obj.conductor_asignado:
-            return f"{obj.conductor_asignado.usuario.first_name} {obj.conductor_asignado.usuario.last_name}"
-        return "Sin asignar"
+    class Meta(VehiculoSerializer.Meta):
+        fields = VehiculoSerializer.Meta.fields + ['ultimos_mantenimientos', 'mantenimientos_pendientes']
     
     def get_ultimos_mantenimientos(self, obj):
-        mantenimientos = obj.mantenimientos.order_by('-fecha_realizacion')[:5]
+        mantenimientos = getattr(obj, 'ultimos_mantenimientos', None)
+        if mantenimientos is None:
+            mantenimientos = obj.mantenimientos.order_by(*ORDEN_ULTIMOS)[:MAX_ULTIMOS]
         return MantenimientoVehiculoSerializer(mantenimientos, many=True).data
     
     def get_mantenimientos_pendientes(self, obj):
-        mantenimientos = obj.mantenimientos.filter(estado='pendiente').order_by('fecha_programada')[:3]
-        return MantenimientoProgramadoSerializer(mantenimientos, many=True).data
\ No newline at end of file
+        mantenimientos = getattr(obj, 'mantenimientos_pendientes', None)
+        if mantenimientos is None:
+            mantenimientos = obj.mantenimientos.filter(estado='programado').order_by(*ORDEN_PENDIENTES)[:MAX_PENDIENTES]
+        return MantenimientoProgramadoSerializer(mantenimientos, many=True).data
+
+
+def vehiculos_con_mantenimientos(queryset):
+    """
+    Precarga lo que usa VehiculoDetalleSerializer en un número fijo de consultas.
+
+    Los Prefetch con slicing traen solo los N mantenimientos de cada vehículo
+    (Django los resuelve con una función de ventana).
+    """
+    return queryset.select_related('tipo_vehiculo', 'conductor_asignado__usuario').prefetch_related(
+        Prefetch(
+            'mantenimientos',
+            queryset=MantenimientoVehiculo.objects.order_by(*ORDEN_ULTIMOS)[:MAX_ULTIMOS],
+            to_attr='ultimos_mantenimientos',
+        ),
+        Prefetch(
+            'mantenimientos',
+            queryset=MantenimientoVehiculo.objects.filter(estado='programado').order_by(*ORDEN_PENDIENTES)[:MAX_PENDIENTES],
+            to_attr='mantenimientos_pendientes',
+        ),
+    )
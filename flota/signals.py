@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Vehiculo, MantenimientoVehiculo, RepuestoVehiculo
+from .context_processors import invalidar_badges
+from .estadisticas import invalidar_estadisticas
+from .inventario import invalidar_facetas
+
+
+@receiver(post_save, sender=MantenimientoVehiculo)
+@receiver(post_delete, sender=MantenimientoVehiculo)
+def invalidar_badges_mantenimiento(sender, instance, **kwargs):
+    """Los contadores de mantenimientos del menú se recalculan en la próxima página"""
+    invalidar_badges()
+    invalidar_estadisticas()
+
+
+@receiver(post_save, sender=Vehiculo)
+@receiver(post_delete, sender=Vehiculo)
+def invalidar_estadisticas_vehiculo(sender, instance, **kwargs):
+    invalidar_estadisticas()
+
+
+@receiver(post_save, sender=RepuestoVehiculo)
+@receiver(post_delete, sender=RepuestoVehiculo)
+def invalidar_facetas_repuesto(sender, instance, **kwargs):
+    """Las marcas y proveedores de los filtros del inventario se recalculan al siguiente uso"""
+    invalidar_facetas()
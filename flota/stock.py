@@ -0,0 +1,137 @@
+"""
+Movimientos de stock de repuestos.
+
+Cada cambio de stock agrega un MovimientoStock y actualiza el saldo
+materializado en RepuestoVehiculo.cantidad_stock en la misma transacción. El
+saldo nunca se lee, modifica y guarda desde Python:
+
+- Un movimiento suelto es un UPDATE condicional con F(): la base de datos
+  descuenta solo si alcanza el stock y bloquea la fila únicamente durante
+  esa sentencia.
+- Un consumo de varios repuestos bloquea las filas con select_for_update en
+  orden de id, así dos talleres que consumen los mismos repuestos esperan en
+  vez de bloquearse mutuamente, y valida todo antes de descontar.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import RepuestoVehiculo, MantenimientoVehiculo, UsoRepuestoMantenimiento, MovimientoStock
+
+
+class StockInsuficiente(ValueError):
+    def __init__(self, repuesto_id, disponible, solicitado):
+        self.repuesto_id = repuesto_id
+        self.disponible = disponible
+        self.solicitado = solicitado
+        super().__init__(f'Stock insuficiente para el repuesto {repuesto_id}: hay {disponible}, se piden {solicitado}')
+
+
+def registrar_movimiento(repuesto_id, cantidad, tipo, usuario=None, mantenimiento=None, motivo=''):
+    """
+    Suma (cantidad > 0) o descuenta (cantidad < 0) stock de un repuesto.
+
+    Returns:
+        El MovimientoStock creado
+
+    Raises:
+        StockInsuficiente si el descuento dejaría el stock bajo cero
+    """
+    if cantidad == 0:
+        raise ValueError('La cantidad del movimiento no puede ser 0')
+    with transaction.atomic():
+        repuestos = RepuestoVehiculo.objects.filter(pk=repuesto_id)
+        if cantidad < 0:
+            repuestos = repuestos.filter(cantidad_stock__gte=-cantidad)
+        if not repuestos.update(cantidad_stock=F('cantidad_stock') + cantidad):
+            disponible = RepuestoVehiculo.objects.filter(pk=repuesto_id).values_list('cantidad_stock', flat=True).first()
+            if disponible is None:
+                raise RepuestoVehiculo.DoesNotExist(f'Repuesto {repuesto_id} no existe')
+            raise StockInsuficiente(repuesto_id, disponible, -cantidad)
+        # La fila quedó bloqueada por el UPDATE: el saldo leído es el propio
+        stock = RepuestoVehiculo.objects.filter(pk=repuesto_id).values_list('cantidad_stock', flat=True).get()
+        return MovimientoStock.objects.create(
+            repuesto_id=repuesto_id,
+            tipo=tipo,
+            cantidad=cantidad,
+            stock_resultante=stock,
+            usuario=usuario,
+            mantenimiento=mantenimiento,
+            motivo=motivo[:255],
+        )
+
+
+def registrar_entrada(repuesto_id, cantidad, usuario=None, motivo=''):
+    return registrar_movimiento(repuesto_id, abs(cantidad), 'entrada', usuario=usuario, motivo=motivo)
+
+
+def registrar_salida(repuesto_id, cantidad, usuario=None, motivo=''):
+    return registrar_movimiento(repuesto_id, -abs(cantidad), 'salida', usuario=usuario, motivo=motivo)
+
+
+def consumir_repuestos(mantenimiento, items, usuario=None):
+    """
+    Descuenta varios repuestos para un mantenimiento en una sola transacción.
+
+    Args:
+        mantenimiento: MantenimientoVehiculo al que se cargan los repuestos
+        items: iterable de (repuesto_id, cantidad); los repetidos se suman
+
+    Returns:
+        Lista de UsoRepuestoMantenimiento creados
+
+    Raises:
+        StockInsuficiente si algún repuesto no alcanza; no se descuenta ninguno
+    """
+    cantidades = OrderedDict()
+    for repuesto_id, cantidad in items:
+        if cantidad <= 0:
+            raise ValueError('Las cantidades a consumir deben ser positivas')
+        cantidades[int(repuesto_id)] = cantidades.get(int(repuesto_id), 0) + cantidad
+    if not cantidades:
+        return []
+
+    with transaction.atomic():
+        # Orden fijo de bloqueo para que consumos concurrentes no se crucen
+        repuestos = {
+            r.pk: r for r in RepuestoVehiculo.objects.select_for_update()
+            .filter(pk__in=cantidades).order_by('pk').only('id', 'cantidad_stock', 'precio_unitario')
+        }
+        for repuesto_id, cantidad in cantidades.items():
+            if repuesto_id not in repuestos:
+                raise RepuestoVehiculo.DoesNotExist(f'Repuesto {repuesto_id} no existe')
+            if repuestos[repuesto_id].cantidad_stock < cantidad:
+                raise StockInsuficiente(repuesto_id, repuestos[repuesto_id].cantidad_stock, cantidad)
+
+        usos, movimientos = [], []
+        costo = Decimal('0')
+        for repuesto_id, cantidad in cantidades.items():
+            repuesto = repuestos[repuesto_id]
+            RepuestoVehiculo.objects.filter(pk=repuesto_id).update(cantidad_stock=F('cantidad_stock') - cantidad)
+            usos.append(UsoRepuestoMantenimiento(
+                mantenimiento=mantenimiento,
+                repuesto_id=repuesto_id,
+                cantidad_utilizada=cantidad,
+                costo_unitario=repuesto.precio_unitario,
+            ))
+            movimientos.append(MovimientoStock(
+                repuesto_id=repuesto_id,
+                tipo='consumo',
+                cantidad=-cantidad,
+                stock_resultante=repuesto.cantidad_stock - cantidad,
+                mantenimiento=mantenimiento,
+                usuario=usuario,
+                motivo=f'Uso en {mantenimiento.titulo}'[:255],
+            ))
+            costo += cantidad * repuesto.precio_unitario
+
+        # bulk_create no pasa por UsoRepuestoMantenimiento.save: el stock ya se descontó
+        UsoRepuestoMantenimiento.objects.bulk_create(usos)
+        MovimientoStock.objects.bulk_create(movimientos)
+        MantenimientoVehiculo.objects.filter(pk=mantenimiento.pk).update(
+            costo_repuestos=F('costo_repuestos') + costo,
+            costo_total=F('costo_total') + costo,
+        )
+    return usos
@@ -1,3 +1,374 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .context_processors import flota_badges
+from .estadisticas import estadisticas_flota
+from .inventario import resumen_inventario, facetas_inventario
+from .planificacion_mantenimiento import planificar_mantenimientos
+from .stock import StockInsuficiente, registrar_entrada, registrar_salida, consumir_repuestos
+from .models import TipoVehiculo, Vehiculo, MantenimientoVehiculo, RepuestoVehiculo, UsoRepuestoMantenimiento
+from conductores.models import Conductor, RutaConductor
+
+
+class FlotaTestMixin:
+    def crear_vehiculo(self, placa='AB1234', **extra):
+        tipo, _ = TipoVehiculo.objects.get_or_create(
+            nombre='Furgón',
+            defaults={'capacidad_carga_kg': 1000, 'capacidad_volumen_m3': 8, 'consumo_combustible_km': 0.1},
+        )
+        datos = {
+            'numero_placa': placa,
+            'tipo_vehiculo': tipo,
+            'marca': 'Peugeot',
+            'modelo': 'Partner',
+            'año_fabricacion': 2020,
+            'numero_chasis': f'CH-{placa}',
+            'numero_motor': f'MO-{placa}',
+            'capacidad_tanque_litros': 60,
+            'consumo_promedio_km': 0.08,
+        }
+        datos.update(extra)
+        return Vehiculo.objects.create(**datos)
+
+    def crear_mantenimiento(self, vehiculo, dias=0, **extra):
+        datos = {
+            'vehiculo': vehiculo,
+            'tipo_mantenimiento': 'preventivo',
+            'titulo': 'Cambio de aceite',
+            'descripcion': 'Mantención periódica',
+            'kilometraje_actual': vehiculo.kilometraje_actual,
+            'fecha_programada': timezone.localdate() + timedelta(days=dias),
+        }
+        datos.update(extra)
+        return MantenimientoVehiculo.objects.create(**datos)
+
+
+class FlotaBadgesTest(FlotaTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+        self.vehiculo = self.crear_vehiculo()
+        self.crear_mantenimiento(self.vehiculo, dias=-3)
+        self.crear_mantenimiento(self.vehiculo, dias=5)
+
+    def test_no_consulta_si_el_template_no_usa_los_badges(self):
+        with self.assertNumQueries(0):
+            flota_badges(self.request)
+
+    def test_conteo_en_cache_e_invalidado_al_guardar(self):
+        with self.assertNumQueries(1):
+            badges = flota_badges(self.request)
+            self.assertEqual(str(badges['flota_mantenimientos_programados']), '2')
+            self.assertTrue(badges['flota_mantenimientos_vencidos'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(str(flota_badges(self.request)['flota_mantenimientos_programados']), '2')
+
+        self.crear_mantenimiento(self.vehiculo, dias=1)
+        self.assertEqual(str(flota_badges(self.request)['flota_mantenimientos_programados']), '3')
+
+
+class InventarioRepuestosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        RepuestoVehiculo.objects.create(codigo='F-1', nombre='Filtro', marca='Bosch', proveedor_principal='Repuestos Sur',
+                                        cantidad_stock=10, cantidad_minima=2, precio_unitario=Decimal('1500.50'))
+        RepuestoVehiculo.objects.create(codigo='P-1', nombre='Pastillas', marca='Bosch',
+                                        cantidad_stock=0, cantidad_minima=4, precio_unitario=Decimal('9990'))
+        RepuestoVehiculo.objects.create(codigo='A-1', nombre='Aceite', marca='Castrol', proveedor_principal='Lubricantes SA',
+                                        cantidad_stock=3, cantidad_minima=5, precio_unitario=Decimal('100'))
+
+    def test_resumen_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            resumen = resumen_inventario()
+
+        self.assertEqual(resumen['total_repuestos'], 3)
+        self.assertEqual(resumen['stock_bajo'], 2)
+        self.assertEqual(resumen['agotados'], 1)
+        self.assertEqual(resumen['stock_optimo'], 1)
+        self.assertEqual(resumen['valor_total'], Decimal('15305.00'))
+
+    def test_facetas_en_cache_e_invalidadas_al_guardar(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(facetas_inventario()['marcas'], ['Bosch', 'Castrol'])
+        with self.assertNumQueries(0):
+            self.assertEqual(facetas_inventario()['proveedores'], ['Lubricantes SA', 'Repuestos Sur'])
+
+        RepuestoVehiculo.objects.create(codigo='B-1', nombre='Batería', marca='Varta', precio_unitario=Decimal('50000'))
+        self.assertEqual(facetas_inventario()['marcas'], ['Bosch', 'Castrol', 'Varta'])
+
+    def test_vista_y_api_usan_los_mismos_totales(self):
+        self.client.force_login(User.objects.create_user(username='bodega', password='clave-segura-123'))
+
+        response = self.client.get(reverse('flota:lista_repuestos'))
+        self.assertEqual(response.context['estadisticas']['valor_total'], Decimal('15305.00'))
+        self.assertEqual(response.context['marcas'], ['Bosch', 'Castrol'])
+
+        api = self.client.get('/flota/api/repuestos/resumen/')
+        self.assertEqual(api.status_code, 200)
+        self.assertEqual(api.json()['stock_bajo'], 2)
+
+
+class VehiculoApiTest(FlotaTestMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='flota', password='clave-segura-123'))
+
+    def crear_flota(self, cantidad, inicio=0):
+        for i in range(inicio, inicio + cantidad):
+            usuario = User.objects.create_user(username=f'conductor{i}', first_name='Conductor', last_name=str(i))
+            conductor = Conductor.objects.create(usuario=usuario, licencia_conducir=f'LIC-{i}',
+                                                 fecha_vencimiento_licencia=timezone.localdate() + timedelta(days=365))
+            vehiculo = self.crear_vehiculo(f'PL{i:04d}', conductor_asignado=conductor)
+            for dias in (-30, -10, 5, 12):
+                self.crear_mantenimiento(vehiculo, dias=dias, estado='completado' if dias < 0 else 'programado')
+
+    def listar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/flota/api/vehiculos/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(consultas)
+
+    def test_listado_con_consultas_constantes(self):
+        self.crear_flota(2)
+        _, pocas = self.listar()
+        self.crear_flota(8, inicio=2)
+        response, muchas = self.listar()
+
+        self.assertEqual(pocas, muchas)
+        vehiculo = response.json()['results'][0]
+        self.assertEqual(vehiculo['conductor_nombre'], 'Conductor 0')
+        self.assertEqual(len(vehiculo['ultimos_mantenimientos']), 4)
+        self.assertEqual([m['dias_para_mantenimiento'] for m in vehiculo['mantenimientos_pendientes']], [5, 12])
+
+    def test_mantenimientos_paginados_por_cursor(self):
+        vehiculo = self.crear_vehiculo()
+        for dias in range(25):
+            self.crear_mantenimiento(vehiculo, dias=dias)
+
+        response = self.client.get('/flota/api/mantenimientos/', {'total': 1})
+        datos = response.json()
+        self.assertEqual(len(datos['results']), 20)
+        self.assertEqual(datos['count'], 25)
+        self.assertIsNone(datos['previous'])
+
+        datos = self.client.get(datos['next']).json()
+        self.assertEqual(len(datos['results']), 5)
+        self.assertIsNone(datos['next'])
+        self.assertEqual(datos['count'], 25)
+        datos = self.client.get(datos['previous']).json()
+        self.assertEqual(len(datos['results']), 20)
+        self.assertIsNone(datos['previous'])
+
+
+class PlanificacionMantenimientoTest(FlotaTestMixin, TestCase):
+    # Lunes, para que el domingo sin taller quede a la vista
+    hoy = date(2026, 3, 2)
+
+    def test_proyecta_el_kilometraje_con_las_rutas_del_conductor(self):
+        usuario = User.objects.create_user(username='chofer')
+        conductor = Conductor.objects.create(usuario=usuario, licencia_conducir='LIC-1',
+                                             fecha_vencimiento_licencia=self.hoy + timedelta(days=365))
+        vehiculo = self.crear_vehiculo(conductor_asignado=conductor, kilometraje_actual=9000,
+                                       proximo_mantenimiento_km=10000)
+        for dias in range(1, 29):
+            RutaConductor.objects.create(conductor=conductor, fecha=self.hoy - timedelta(days=dias),
+                                         nombre_ruta=f'R{dias}', estado='completada', distancia_total_km=100)
+
+        resultado = planificar_mantenimientos(hoy=self.hoy)
+
+        mantenimiento = MantenimientoVehiculo.objects.get(vehiculo=vehiculo)
+        self.assertEqual(resultado['evaluados'], 1)
+        self.assertEqual(mantenimiento.tipo_mantenimiento, 'predictivo')
+        self.assertEqual(mantenimiento.estado, 'programado')
+        self.assertEqual(mantenimiento.fecha_programada, self.hoy + timedelta(days=10))
+
+    def test_reparte_por_capacidad_y_no_duplica(self):
+        for i in range(5):
+            self.crear_vehiculo(f'CAP{i}', proximo_mantenimiento_fecha=self.hoy + timedelta(days=7))
+
+        planificar_mantenimientos(hoy=self.hoy, capacidad_diaria=2)
+        planificar_mantenimientos(hoy=self.hoy, capacidad_diaria=2)
+
+        fechas = sorted(MantenimientoVehiculo.objects.values_list('fecha_programada', flat=True))
+        # Vence el lunes 9: dos ese día, el domingo 8 se salta y el resto antes
+        self.assertEqual(fechas, [self.hoy + timedelta(days=d) for d in (4, 5, 5, 7, 7)])
+
+
+class EstadisticasFlotaTest(FlotaTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user(username='jefe', password='clave-segura-123'))
+        self.vehiculo = self.crear_vehiculo('EST001', estado='en_uso',
+                                           proximo_mantenimiento_fecha=timezone.localdate() - timedelta(days=1))
+        self.crear_vehiculo('EST002', estado='mantenimiento', consumo_promedio_km=0.12)
+        self.crear_mantenimiento(self.vehiculo, dias=3)
+        self.crear_mantenimiento(self.vehiculo, dias=-1, estado='completado', costo_mano_obra=20000,
+                                 fecha_fin=timezone.now())
+
+    def test_kpi_en_dos_consultas_y_en_cache(self):
+        with self.assertNumQueries(2):
+            estadisticas = estadisticas_flota()
+        with self.assertNumQueries(0):
+            estadisticas_flota()
+
+        self.assertEqual(estadisticas['total_vehiculos'], 2)
+        self.assertEqual(estadisticas['vehiculos_operativos'], 1)
+        self.assertEqual(estadisticas['vehiculos_mantenimiento'], 1)
+        self.assertEqual(estadisticas['vehiculos_por_mantener'], 1)
+        self.assertEqual(estadisticas['mantenimientos_proximos_7_dias'], 1)
+        self.assertEqual(estadisticas['costo_mantenimiento_mes'], Decimal('20000'))
+        self.assertEqual(estadisticas['promedio_consumo_combustible'], 0.1)
+
+    def test_api_y_dashboard_comparten_los_valores(self):
+        api = self.client.get('/flota/api/dashboard/').json()
+        self.crear_vehiculo('EST003', estado='fuera_servicio')
+        web = self.client.get(reverse('flota:dashboard_flota')).context
+
+        self.assertEqual(api['total_vehiculos'], 2)
+        self.assertEqual(web['total_vehiculos'], 3)
+        self.assertEqual(web['vehiculos_fuera_servicio'], 1)
+        self.assertEqual(api['mantenimientos_pendientes'], web['mantenimientos_pendientes'])
+
+
+class StockRepuestosTest(FlotaTestMixin, TestCase):
+    def setUp(self):
+        self.filtro = RepuestoVehiculo.objects.create(codigo='F-1', nombre='Filtro', cantidad_stock=10,
+                                                      precio_unitario=Decimal('1000'))
+        self.aceite = RepuestoVehiculo.objects.create(codigo='A-1', nombre='Aceite', cantidad_stock=2,
+                                                      precio_unitario=Decimal('500'))
+        self.mantenimiento = self.crear_mantenimiento(self.crear_vehiculo())
+
+    def test_movimientos_actualizan_el_saldo(self):
+        registrar_entrada(self.filtro.pk, 5)
+        movimiento = registrar_salida(self.filtro.pk, 3)
+
+        self.filtro.refresh_from_db()
+        self.assertEqual(self.filtro.cantidad_stock, 12)
+        self.assertEqual(movimiento.stock_resultante, 12)
+        self.assertEqual(sum(self.filtro.movimientos.values_list('cantidad', flat=True)), 2)
+
+        with self.assertRaises(StockInsuficiente):
+            registrar_salida(self.filtro.pk, 13)
+        self.assertEqual(self.filtro.movimientos.count(), 2)
+
+    def test_consumo_de_varios_repuestos_es_todo_o_nada(self):
+        with self.assertRaises(StockInsuficiente):
+            consumir_repuestos(self.mantenimiento, [(self.filtro.pk, 4), (self.aceite.pk, 3)])
+        self.filtro.refresh_from_db()
+        self.assertEqual(self.filtro.cantidad_stock, 10)
+
+        consumir_repuestos(self.mantenimiento, [(self.filtro.pk, 4), (self.aceite.pk, 1), (self.aceite.pk, 1)])
+
+        self.assertEqual(
+            dict(RepuestoVehiculo.objects.values_list('codigo', 'cantidad_stock')), {'F-1': 6, 'A-1': 0}
+        )
+        self.assertEqual(self.mantenimiento.repuestos_utilizados.count(), 2)
+        self.mantenimiento.refresh_from_db()
+        self.assertEqual(self.mantenimiento.costo_repuestos, Decimal('5000'))
+
+    def test_uso_individual_descuenta_con_movimiento(self):
+        UsoRepuestoMantenimiento.objects.create(mantenimiento=self.mantenimiento, repuesto=self.aceite,
+                                                cantidad_utilizada=2, costo_unitario=Decimal('500'))
+
+        self.aceite.refresh_from_db()
+        self.assertEqual(self.aceite.cantidad_stock, 0)
+        self.assertEqual(self.aceite.movimientos.get().tipo, 'consumo')
+        with self.assertRaises(StockInsuficiente):
+            UsoRepuestoMantenimiento.objects.create(mantenimiento=self.mantenimiento, repuesto=self.aceite,
+                                                    cantidad_utilizada=1, costo_unitario=Decimal('500'))
+
+    def test_reconciliar_asienta_diferencias_como_ajuste(self):
+        registrar_entrada(self.filtro.pk, 5)
+        # Cambio que no pasó por el libro
+        RepuestoVehiculo.objects.filter(pk=self.filtro.pk).update(cantidad_stock=12)
+
+        salida = StringIO()
+        call_command('reconciliar_stock', stdout=salida)
+        self.assertIn(f'Repuesto {self.filtro.pk}: stock 12, movimientos 5', salida.getvalue())
+        self.assertEqual(self.filtro.movimientos.count(), 1)
+
+        call_command('reconciliar_stock', '--corregir', stdout=StringIO())
+        self.filtro.refresh_from_db()
+        self.assertEqual(self.filtro.cantidad_stock, 12)
+        ajuste = self.filtro.movimientos.latest('id')
+        self.assertEqual((ajuste.tipo, ajuste.cantidad, ajuste.stock_resultante), ('ajuste', 7, 12))
+        # El aceite no tenía movimientos: su stock queda como saldo inicial
+        for repuesto in (self.filtro, self.aceite):
+            self.assertEqual(repuesto.movimientos.aggregate(saldo=Sum('cantidad'))['saldo'],
+                             RepuestoVehiculo.objects.get(pk=repuesto.pk).cantidad_stock)
+
+
+class RepuestoApiTest(FlotaTestMixin, TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username='bodega', password='clave-segura-123'))
+
+    def test_stock_solo_cambia_con_movimientos(self):
+        response = self.client.post('/flota/api/repuestos/', {
+            'codigo': 'B-1', 'nombre': 'Batería', 'precio_unitario': '45000', 'stock_inicial': 4,
+            'cantidad_stock': 99,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['cantidad_stock'], 4)
+        repuesto = RepuestoVehiculo.objects.get(codigo='B-1')
+        self.assertEqual(list(repuesto.movimientos.values_list('tipo', 'cantidad')), [('ajuste', 4)])
+
+        response = self.client.patch(f'/flota/api/repuestos/{repuesto.pk}/', {'cantidad_stock': 50},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        repuesto.refresh_from_db()
+        self.assertEqual(repuesto.cantidad_stock, 4)
+
+    def test_actualizar_stock(self):
+        repuesto = RepuestoVehiculo.objects.create(codigo='F-1', nombre='Filtro', precio_unitario=Decimal('1000'))
+        url = f'/flota/api/repuestos/{repuesto.pk}/actualizar_stock/'
+
+        response = self.client.post(url, {'cantidad': 2, 'tipo': 'sumar'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cantidad_stock'], 2)
+
+        response = self.client.post(url, {'cantidad': 3, 'tipo': 'restar'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(repuesto.movimientos.values_list('tipo', 'cantidad')), [('entrada', 2)])
+        self.assertEqual(self.client.get('/flota/api/repuestos/', {'bajo_stock': 'true'}).status_code, 200)
+
+
+class UsoRepuestoTest(FlotaTestMixin, TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_superuser(username='taller', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+        self.aceite = RepuestoVehiculo.objects.create(codigo='A-1', nombre='Aceite', cantidad_stock=2,
+                                                      precio_unitario=Decimal('500'))
+        self.mantenimiento = self.crear_mantenimiento(self.crear_vehiculo())
+
+    def test_api_responde_400_sin_stock(self):
+        datos = {'mantenimiento': self.mantenimiento.pk, 'repuesto': self.aceite.pk, 'cantidad_utilizada': 3}
+        response = self.client.post('/flota/api/uso-repuestos/', datos, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cantidad_utilizada', response.json())
+
+        datos['cantidad_utilizada'] = 2
+        response = self.client.post('/flota/api/uso-repuestos/', datos, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['costo_total'], 1000)
+        self.aceite.refresh_from_db()
+        self.assertEqual(self.aceite.cantidad_stock, 0)
+
+    def test_admin_muestra_error_de_formulario_sin_stock(self):
+        response = self.client.post(reverse('admin:flota_usorepuestomantenimiento_add'), {
+            'mantenimiento': self.mantenimiento.pk, 'repuesto': self.aceite.pk,
+            'cantidad_utilizada': 3, 'costo_unitario': '500',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('cantidad_utilizada', response.context['adminform'].form.errors)
+        self.assertFalse(UsoRepuestoMantenimiento.objects.exists())
@@ -2,12 +2,13 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Count, Q, Sum, Avg
+from django.db.models import Count, Q, Sum, Avg, F
 from django.utils import timezone
 from datetime import datetime, timedelta
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
@@ -16,8 +17,12 @@ from .serializers import (
     TipoVehiculoSerializer, VehiculoSerializer, VehiculoAsignacionSerializer,
     MantenimientoVehiculoSerializer, MantenimientoProgramadoSerializer,
     RepuestoVehiculoSerializer, UsoRepuestoMantenimientoSerializer,
-    DashboardFlotaSerializer, VehiculoDetalleSerializer
+    DashboardFlotaSerializer, VehiculoDetalleSerializer, vehiculos_con_mantenimientos
 )
+from .inventario import resumen_inventario, facetas_inventario
+from .estadisticas import estadisticas_flota, requiere_mantenimiento_q
+from .stock import StockInsuficiente, registrar_entrada, registrar_salida, consumir_repuestos
+from CorreosChile.paginacion import PaginacionCursor
 
 
 class TipoVehiculoViewSet(viewsets.ModelViewSet):
@@ -37,8 +42,16 @@ class VehiculoViewSet(viewsets.ModelViewSet):
     serializer_class = VehiculoSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return VehiculoDetalleSerializer
+        return super().get_serializer_class()
+    
     def get_queryset(self):
         queryset = Vehiculo.objects.select_related('tipo_vehiculo', 'conductor_asignado__usuario')
+        if self.action in ('list', 'retrieve'):
+            # Consultas fijas sin importar el tamaño de la flota
+            queryset = vehiculos_con_mantenimientos(queryset)
         
         # Filtros
         estado = self.request.query_params.get('estado')
@@ -47,15 +60,15 @@ class VehiculoViewSet(viewsets.ModelViewSet):
         
         tipo = self.request.query_params.get('tipo')
         if tipo:
-            queryset = queryset.filter(tipo_id=tipo)
+            queryset = queryset.filter(tipo_vehiculo_id=tipo)
         
         conductor = self.request.query_params.get('conductor')
         if conductor:
             queryset = queryset.filter(conductor_asignado_id=conductor)
         
         mantenimiento = self.request.query_params.get('mantenimiento')
-        if mantenimiento:
-            queryset = queryset.filter(estado_mantenimiento=mantenimiento)
+        if mantenimiento == 'requerido':
+            queryset = queryset.filter(requiere_mantenimiento_q(timezone.localdate()))
         
         return queryset
     
@@ -117,19 +130,13 @@ class VehiculoViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def disponibles(self, request):
-        vehiculos = self.get_queryset().filter(
-            estado='operativo',
-            estado_mantenimiento='en_servicio'
-        )
+        vehiculos = self.get_queryset().filter(estado='disponible', es_activo=True)
         serializer = VehiculoAsignacionSerializer(vehiculos, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def requieren_mantenimiento(self, request):
-        vehiculos = self.get_queryset().filter(
-            Q(estado_mantenimiento='mantenimiento_pendiente') |
-            Q(estado_mantenimiento='atrasado')
-        )
+        vehiculos = self.get_queryset().filter(requiere_mantenimiento_q(timezone.localdate()))
         serializer = self.get_serializer(vehiculos, many=True)
         return Response(serializer.data)
 
@@ -138,6 +145,8 @@ class MantenimientoVehiculoViewSet(viewsets.ModelViewSet):
     queryset = MantenimientoVehiculo.objects.all()
     serializer_class = MantenimientoVehiculoSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
+    campo_cursor = 'fecha_creacion'
     
     def get_queryset(self):
         queryset = MantenimientoVehiculo.objects.select_related('vehiculo__tipo_vehiculo')
@@ -203,6 +212,30 @@ class MantenimientoVehiculoViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({'error': f'Error en los datos: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'])
+    def consumir_repuestos(self, request, pk=None):
+        """Descuenta varios repuestos de una vez: {"repuestos": [{"repuesto": id, "cantidad": n}, ...]}"""
+        mantenimiento = self.get_object()
+        try:
+            items = [(int(item['repuesto']), int(item['cantidad'])) for item in request.data.get('repuestos') or []]
+        except (KeyError, TypeError, ValueError):
+            return Response({'error': 'Cada repuesto requiere "repuesto" y "cantidad" numéricos'}, status=status.HTTP_400_BAD_REQUEST)
+        if not items:
+            return Response({'error': 'Debe indicar al menos un repuesto'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            usos = consumir_repuestos(mantenimiento, items, usuario=request.user)
+        except StockInsuficiente as e:
+            return Response({'error': str(e), 'repuesto': e.repuesto_id, 'disponible': e.disponible}, status=status.HTTP_400_BAD_REQUEST)
+        except RepuestoVehiculo.DoesNotExist as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'repuestos': [{'repuesto': u.repuesto_id, 'cantidad': u.cantidad_utilizada, 'costo_unitario': u.costo_unitario} for u in usos]
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=False, methods=['get'])
     def pendientes(self, request):
         mantenimientos = self.get_queryset().filter(estado='pendiente')
@@ -226,16 +259,12 @@ class RepuestoVehiculoViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = RepuestoVehiculo.objects.select_related('tipo_vehiculo')
+        queryset = RepuestoVehiculo.objects.all()
         
         # Filtros
-        tipo_vehiculo = self.request.query_params.get('tipo_vehiculo')
-        if tipo_vehiculo:
-            queryset = queryset.filter(tipo_vehiculo_id=tipo_vehiculo)
-        
         bajo_stock = self.request.query_params.get('bajo_stock')
         if bajo_stock == 'true':
-            queryset = queryset.filter(cantidad_stock__lte=models.F('cantidad_minima'))
+            queryset = queryset.filter(cantidad_stock__lte=F('cantidad_minima'))
         
         return queryset
     
@@ -250,21 +279,28 @@ class RepuestoVehiculoViewSet(viewsets.ModelViewSet):
         
         try:
             cantidad = int(cantidad)
+            if cantidad <= 0:
+                raise ValueError
             if tipo == 'sumar':
-                repuesto.cantidad_stock += cantidad
+                registrar_entrada(repuesto.id, cantidad, usuario=request.user)
             elif tipo == 'restar':
-                if repuesto.cantidad_stock < cantidad:
-                    return Response({'error': 'Stock insuficiente'}, status=status.HTTP_400_BAD_REQUEST)
-                repuesto.cantidad_stock -= cantidad
+                registrar_salida(repuesto.id, cantidad, usuario=request.user)
             else:
                 return Response({'error': 'Tipo debe ser "sumar" o "restar"'}, status=status.HTTP_400_BAD_REQUEST)
             
-            repuesto.save()
+            repuesto.refresh_from_db()
             serializer = self.get_serializer(repuesto)
             return Response(serializer.data)
             
+        except StockInsuficiente:
+            return Response({'error': 'Stock insuficiente'}, status=status.HTTP_400_BAD_REQUEST)
         except ValueError:
             return Response({'error': 'Cantidad debe ser un número válido'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['get'])
+    def resumen(self, request):
+        """Valorización y conteos del inventario, con las marcas y proveedores disponibles"""
+        return Response({**resumen_inventario(), **facetas_inventario()})
 
 
 class UsoRepuestoMantenimientoViewSet(viewsets.ModelViewSet):
@@ -280,50 +316,17 @@ class UsoRepuestoMantenimientoViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(mantenimiento_id=mantenimiento)
         
         return queryset
+    
+    def perform_create(self, serializer):
+        try:
+            serializer.save()
+        except StockInsuficiente as e:
+            raise ValidationError({'cantidad_utilizada': f'Stock insuficiente: hay {e.disponible}'})
 
 
 class DashboardFlotaViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     
     def list(self, request):
-        # Estadísticas generales
-        total_vehiculos = Vehiculo.objects.count()
-        vehiculos_operativos = Vehiculo.objects.filter(estado='operativo').count()
-        vehiculos_mantenimiento = Vehiculo.objects.filter(estado='en_mantenimiento').count()
-        vehiculos_fuera_servicio = Vehiculo.objects.filter(estado='fuera_servicio').count()
-        
-        # Mantenimientos
-        hoy = timezone.now().date()
-        fecha_limite = hoy + timedelta(days=7)
-        
-        mantenimientos_pendientes = MantenimientoVehiculo.objects.filter(estado='pendiente').count()
-        mantenimientos_proximos_7_dias = MantenimientoVehiculo.objects.filter(
-            estado='pendiente',
-            fecha_programada__lte=fecha_limite
-        ).count()
-        
-        # Costos del mes actual
-        primer_dia_mes = hoy.replace(day=1)
-        costo_mantenimiento_mes = MantenimientoVehiculo.objects.filter(
-            fecha_realizacion__gte=primer_dia_mes,
-            estado='completado'
-        ).aggregate(total=Sum('costo_mano_obra'))['total'] or 0
-        
-        # Consumo promedio de combustible
-        promedio_consumo = Vehiculo.objects.filter(
-            consumo_combustible_promedio__gt=0
-        ).aggregate(promedio=Avg('consumo_combustible_promedio'))['promedio'] or 0
-        
-        data = {
-            'total_vehiculos': total_vehiculos,
-            'vehiculos_operativos': vehiculos_operativos,
-            'vehiculos_mantenimiento': vehiculos_mantenimiento,
-            'vehiculos_fuera_servicio': vehiculos_fuera_servicio,
-            'mantenimientos_pendientes': mantenimientos_pendientes,
-            'mantenimientos_proximos_7_dias': mantenimientos_proximos_7_dias,
-            'costo_mantenimiento_mes': costo_mantenimiento_mes,
-            'promedio_consumo_combustible': round(promedio_consumo, 2)
-        }
-        
-        serializer = DashboardFlotaSerializer(data)
+        serializer = DashboardFlotaSerializer(estadisticas_flota())
         return Response(serializer.data)
@@ -8,44 +8,22 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 
 from .models import TipoVehiculo, Vehiculo, MantenimientoVehiculo, RepuestoVehiculo, UsoRepuestoMantenimiento
+from .inventario import resumen_inventario, facetas_inventario
+from .estadisticas import estadisticas_flota, requiere_mantenimiento_q, DIAS_PROXIMOS
+from .stock import StockInsuficiente, registrar_entrada, registrar_salida
 from conductores.models import Conductor
 
 
 @login_required
 def dashboard_flota(request):
     """Dashboard principal de gestión de flota"""
-    # Estadísticas generales
-    total_vehiculos = Vehiculo.objects.count()
-    vehiculos_disponibles = Vehiculo.objects.filter(estado='disponible').count()
-    vehiculos_en_uso = Vehiculo.objects.filter(estado='en_uso').count()
-    vehiculos_operativos = vehiculos_disponibles + vehiculos_en_uso
-    vehiculos_mantenimiento = Vehiculo.objects.filter(estado='mantenimiento').count()
-    vehiculos_fuera_servicio = Vehiculo.objects.filter(estado='fuera_servicio').count()
-
-    # Mantenimientos
-    hoy = timezone.now().date()
-    fecha_limite = hoy + timedelta(days=7)
-
-    mantenimientos_pendientes = MantenimientoVehiculo.objects.filter(estado='programado').count()
-    mantenimientos_proximos_7_dias = MantenimientoVehiculo.objects.filter(
-        estado='programado',
-        fecha_programada__lte=fecha_limite
-    ).count()
-
-    # Costos del mes actual
-    primer_dia_mes = hoy.replace(day=1)
-    costo_mantenimiento_mes = MantenimientoVehiculo.objects.filter(
-        estado='completado',
-        fecha_fin__date__gte=primer_dia_mes
-    ).aggregate(total=Sum('costo_total'))['total'] or 0
-
-    # Consumo promedio
-    promedio_consumo = Vehiculo.objects.aggregate(promedio=Avg('consumo_promedio_km'))['promedio'] or 0
+    estadisticas = estadisticas_flota()
+    hoy = timezone.localdate()
+    fecha_limite = hoy + timedelta(days=DIAS_PROXIMOS)
 
     # Vehículos que requieren mantenimiento (por km o fecha)
-    vehiculos_requieren_mantenimiento = Vehiculo.objects.filter(es_activo=True).filter(
-        Q(proximo_mantenimiento_km__isnull=False, proximo_mantenimiento_km__lte=F('kilometraje_actual')) |
-        Q(proximo_mantenimiento_fecha__isnull=False, proximo_mantenimiento_fecha__lte=hoy)
+    vehiculos_requieren_mantenimiento = Vehiculo.objects.filter(
+        requiere_mantenimiento_q(hoy)
     ).select_related('tipo_vehiculo', 'conductor_asignado__usuario')[:10]
 
     # Mantenimientos próximos
@@ -55,14 +33,7 @@ def dashboard_flota(request):
     ).select_related('vehiculo__tipo_vehiculo').order_by('fecha_programada')[:10]
 
     context = {
-        'total_vehiculos': total_vehiculos,
-        'vehiculos_operativos': vehiculos_operativos,
-        'vehiculos_mantenimiento': vehiculos_mantenimiento,
-        'vehiculos_fuera_servicio': vehiculos_fuera_servicio,
-        'mantenimientos_pendientes': mantenimientos_pendientes,
-        'mantenimientos_proximos_7_dias': mantenimientos_proximos_7_dias,
-        'costo_mantenimiento_mes': costo_mantenimiento_mes,
-        'promedio_consumo_combustible': round(promedio_consumo or 0, 2),
+        **estadisticas,
         'vehiculos_requieren_mantenimiento': vehiculos_requieren_mantenimiento,
         'mantenimientos_proximos': mantenimientos_proximos,
         'today': hoy,
@@ -443,21 +414,11 @@ def lista_repuestos(request):
     repuestos_page = paginator.get_page(page)
     
     # Estadísticas y opciones
-    total_repuestos = RepuestoVehiculo.objects.count()
-    stock_bajo = RepuestoVehiculo.objects.filter(cantidad_stock__lte=F('cantidad_minima')).count()
-    # Valor total del stock
-    valor_total = sum([r.valor_total_stock for r in RepuestoVehiculo.objects.all()])
-    marcas = list(RepuestoVehiculo.objects.exclude(marca='').values_list('marca', flat=True).distinct().order_by('marca'))
-    proveedores = list(RepuestoVehiculo.objects.exclude(proveedor_principal='').values_list('proveedor_principal', flat=True).distinct().order_by('proveedor_principal'))
+    facetas = facetas_inventario()
 
     context = {
         'repuestos': repuestos_page,
-        'estadisticas': {
-            'total_repuestos': total_repuestos,
-            'stock_bajo': stock_bajo,
-            'valor_total': valor_total,
-            'stock_optimo': max(total_repuestos - stock_bajo, 0),
-        },
+        'estadisticas': resumen_inventario(),
         'filtros': {
             'marca': marca,
             'proveedor': proveedor,
@@ -465,8 +426,8 @@ def lista_repuestos(request):
             'search': search,
             'sort': sort,
         },
-        'marcas': marcas,
-        'proveedores': proveedores,
+        'marcas': facetas['marcas'],
+        'proveedores': facetas['proveedores'],
     }
     
     return render(request, 'flota/inventario_repuestos.html', context)
@@ -485,23 +446,24 @@ def actualizar_stock_repuesto(request, repuesto_id):
         if cantidad and tipo:
             try:
                 cantidad = int(cantidad)
+                if cantidad <= 0:
+                    raise ValueError
                 if tipo == 'sumar':
-                    repuesto.cantidad_stock += cantidad
+                    registrar_entrada(repuesto.id, cantidad, usuario=request.user)
                     mensaje = f'Stock incrementado en {cantidad} unidades'
                 elif tipo == 'restar':
-                    if repuesto.cantidad_stock < cantidad:
-                        messages.error(request, 'Stock insuficiente')
-                        return redirect('flota:actualizar_stock_repuesto', repuesto_id=repuesto.id)
-                    repuesto.cantidad_stock -= cantidad
+                    registrar_salida(repuesto.id, cantidad, usuario=request.user)
                     mensaje = f'Stock decrementado en {cantidad} unidades'
                 else:
                     messages.error(request, 'Tipo de operación inválido')
                     return redirect('flota:actualizar_stock_repuesto', repuesto_id=repuesto.id)
                 
-                repuesto.save()
                 messages.success(request, mensaje)
                 return redirect('flota:lista_repuestos')
                 
+            except StockInsuficiente:
+                messages.error(request, 'Stock insuficiente')
+                return redirect('flota:actualizar_stock_repuesto', repuesto_id=repuesto.id)
             except ValueError:
                 messages.error(request, 'Cantidad debe ser un número válido')
         else:
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0005_indices_compuestos'),
+        ('notificaciones', '0002_preferencianotificacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leida', 'creado_en'], name='notificacio_usuario_d446ff_idx'),
+        ),
+    ]
@@ -26,6 +26,11 @@ class Notificacion(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     enviado_en = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'leida', 'creado_en']),
+        ]
+
     def __str__(self):
         return f"{self.titulo} - {self.tipo}"
 
@@ -1,9 +1,9 @@
 from django.shortcuts import render
-from django.core.paginator import Paginator
 from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from .models import Notificacion, PreferenciaNotificacion
 from django.utils import timezone
+from CorreosChile.paginacion import paginar_por_cursor
 
 @login_required
 def index(request):
@@ -48,9 +48,7 @@ def index(request):
         queryset = queryset.filter(leida=False)
 
     queryset = queryset.order_by('-creado_en')
-    paginator = Paginator(queryset, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar_por_cursor(queryset, request.GET.get('cursor'), campo='creado_en', tamano=10, con_total=True)
 
     tipos = [t[0] for t in Notificacion.TIPOS]
     canales = [c[0] for c in Notificacion.CANALES]
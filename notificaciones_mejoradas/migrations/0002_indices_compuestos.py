@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0005_indices_compuestos'),
+        ('notificaciones_mejoradas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacionprogramada',
+            index=models.Index(fields=['estado', 'fecha_programada'], name='notificacio_estado_1003e3_idx'),
+        ),
+    ]
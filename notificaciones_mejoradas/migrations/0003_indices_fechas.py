@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones_mejoradas', '0002_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialnotificacion',
+            index=models.Index(fields=['fecha_envio'], name='notificacio_fecha_e_ca5cbb_idx'),
+        ),
+    ]
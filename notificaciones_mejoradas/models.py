@@ -170,6 +170,9 @@ class NotificacionProgramada(models.Model):
         verbose_name = "Notificación Programada"
         verbose_name_plural = "Notificaciones Programadas"
         ordering = ['fecha_programada', 'prioridad']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_programada']),
+        ]
 
 
 class HistorialNotificacion(models.Model):
@@ -211,6 +214,9 @@ class HistorialNotificacion(models.Model):
         verbose_name = "Historial de Notificación"
         verbose_name_plural = "Historial de Notificaciones"
         ordering = ['-fecha_envio']
+        indexes = [
+            models.Index(fields=['fecha_envio']),
+        ]
 
 
 class ListaExclusionNotificacion(models.Model):
@@ -5,6 +5,7 @@ import logging
 
 from .models import NotificacionProgramada, HistorialNotificacion, MetricaNotificacion
 from .services import NotificationEngine
+from CorreosChile.fechas import filtrar_por_fechas
 
 logger = logging.getLogger(__name__)
 
@@ -142,12 +143,10 @@ def enviar_notificacion_individual(notificacion):
 def actualizar_metricas_diarias():
     """Actualiza las métricas diarias del sistema de notificaciones"""
     try:
-        hoy = timezone.now().date()
+        hoy = timezone.localdate()
         
         # Obtener estadísticas del día
-        notificaciones_hoy = HistorialNotificacion.objects.filter(
-            fecha_envio__date=hoy
-        )
+        notificaciones_hoy = filtrar_por_fechas(HistorialNotificacion.objects.all(), 'fecha_envio', hoy, hoy)
         
         # Calcular métricas por canal
         email_stats = notificaciones_hoy.filter(canal_utilizado='email').aggregate(
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('paquetes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialpaquete',
+            index=models.Index(fields=['paquete', 'fecha_cambio'], name='paquetes_hi_paquete_3d78b8_idx'),
+        ),
+    ]
@@ -315,6 +315,9 @@ class HistorialPaquete(models.Model):
         verbose_name = "Historial de Paquete"
         verbose_name_plural = "Historial de Paquetes"
         ordering = ['-fecha_cambio']
+        indexes = [
+            models.Index(fields=['paquete', 'fecha_cambio']),
+        ]
     
     def __str__(self):
         return f"{self.paquete.codigo_seguimiento}: {self.estado_anterior} → {self.estado_nuevo}"
@@ -1,3 +1,20 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+
+class FiltroFechasPaquetesAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='operador'))
+        self.url = reverse('paquetes:paquete-list')
+
+    def test_acepta_fechas_y_fechas_con_hora(self):
+        response = self.client.get(self.url, {'fecha_inicio': '2025-01-10T08:00:00', 'fecha_fin': '2025-01-12'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_fecha_invalida_responde_400(self):
+        response = self.client.get(self.url, {'fecha_inicio': '10/01/2025', 'fecha_fin': '2025-01-12'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ['fecha_inicio'])
@@ -1,5 +1,6 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
@@ -14,6 +15,9 @@ from .serializers import (
     GenerarEtiquetaSerializer, RutaPaqueteSerializer, PuntoEntregaSerializer,
     HistorialPaqueteSerializer
 )
+from CorreosChile.fechas import filtrar_por_fechas, parsear_limite
+from CorreosChile.paginacion import PaginacionCursor
+from busqueda.codigos import filtrar_por_codigo
 
 
 class TipoPaqueteViewSet(viewsets.ModelViewSet):
@@ -47,6 +51,8 @@ class PaqueteViewSet(viewsets.ModelViewSet):
     queryset = Paquete.objects.all().select_related(
         'remitente', 'destinatario', 'tipo_paquete'
     ).prefetch_related('historial', 'rutas')
+    pagination_class = PaginacionCursor
+    campo_cursor = 'fecha_creacion'
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -72,17 +78,26 @@ class PaqueteViewSet(viewsets.ModelViewSet):
         estado = self.request.query_params.get('estado')
         fecha_inicio = self.request.query_params.get('fecha_inicio')
         fecha_fin = self.request.query_params.get('fecha_fin')
+        errores = {}
+        for nombre, valor in (('fecha_inicio', fecha_inicio), ('fecha_fin', fecha_fin)):
+            try:
+                parsear_limite(valor)
+            except ValueError:
+                errores[nombre] = ['Use AAAA-MM-DD o una fecha con hora ISO 8601 (AAAA-MM-DDTHH:MM:SS).']
+        if errores:
+            raise ValidationError(errores)
         remitente = self.request.query_params.get('remitente')
         destinatario = self.request.query_params.get('destinatario')
         
         if codigo_seguimiento:
-            queryset = queryset.filter(codigo_seguimiento__icontains=codigo_seguimiento)
+            # modo_codigo: contiene (por defecto), prefijo o sufijo
+            queryset = filtrar_por_codigo(
+                queryset, 'paquete', codigo_seguimiento,
+                modo=self.request.query_params.get('modo_codigo', 'contiene'),
+            )
         if estado:
             queryset = queryset.filter(estado=estado)
-        if fecha_inicio:
-            queryset = queryset.filter(fecha_creacion__gte=fecha_inicio)
-        if fecha_fin:
-            queryset = queryset.filter(fecha_creacion__lte=fecha_fin)
+        queryset = filtrar_por_fechas(queryset, 'fecha_creacion', fecha_inicio, fecha_fin)
         if remitente:
             queryset = queryset.filter(remitente__nombre_completo__icontains=remitente)
         if destinatario:
@@ -242,6 +257,8 @@ class HistorialPaqueteViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = HistorialPaquete.objects.all().select_related('paquete')
     serializer_class = HistorialPaqueteSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacionCursor
+    campo_cursor = 'fecha_cambio'
     
     def get_queryset(self):
         queryset = super().get_queryset()
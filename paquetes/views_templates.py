@@ -6,7 +6,9 @@ from django.utils.decorators import method_decorator
 from .models import Paquete, HistorialPaquete, RutaPaquete, TipoPaquete, PuntoEntrega
 from envios.models import Envio
 from seguimiento.models import EventoSeguimiento
-from django.db.models import Q, Count, Sum
+from busqueda.consulta import buscar_objetos
+from CorreosChile.fechas import filtrar_por_fechas
+from django.db.models import Count, Sum
 import json
 
 
@@ -198,18 +200,15 @@ class BuscarPaqueteView(TemplateView):
         
         query = self.request.GET.get('q')
         if query:
-            paquetes = Paquete.objects.filter(
-                Q(codigo_seguimiento__icontains=query) |
-                Q(remitente__nombre_completo__icontains=query) |
-                Q(remitente__numero_documento__icontains=query) |
-                Q(destinatario__nombre_completo__icontains=query) |
-                Q(destinatario__email__icontains=query)
-            ).select_related('remitente', 'destinatario', 'tipo_paquete').order_by('-fecha_creacion')
+            # Ordenados por relevancia
+            paquetes = buscar_objetos(
+                'paquete', query, Paquete.objects.select_related('remitente', 'destinatario', 'tipo_paquete')
+            )
             
             context.update({
                 'paquetes': paquetes,
                 'query': query,
-                'total_resultados': paquetes.count()
+                'total_resultados': len(paquetes)
             })
         
         return context
@@ -241,17 +240,8 @@ class APIBusquedaAjaxView(TemplateView):
             query = data.get('query', '')
             
             if len(query) >= 3:  # Mínimo 3 caracteres para búsqueda
-                paquetes = Paquete.objects.filter(
-                    Q(codigo_seguimiento__icontains=query) |
-                    Q(remitente__nombre_completo__icontains=query) |
-                    Q(destinatario__nombre_completo__icontains=query)
-                ).select_related('remitente', 'destinatario')[:5]
-                envios = Envio.objects.filter(
-                    Q(codigo__icontains=query) |
-                    Q(destinatario_nombre__icontains=query) |
-                    Q(origen__icontains=query) |
-                    Q(destino__icontains=query)
-                )[:5]
+                paquetes = buscar_objetos('paquete', query, limite=5)
+                envios = buscar_objetos('envio', query, limite=5)
                 resultados = []
                 for paquete in paquetes:
                     resultados.append({
@@ -295,10 +285,7 @@ class ReportePaquetesView(TemplateView):
             'remitente', 'destinatario', 'tipo_paquete'
         )
         
-        if fecha_inicio:
-            paquetes = paquetes.filter(fecha_creacion__gte=fecha_inicio)
-        if fecha_fin:
-            paquetes = paquetes.filter(fecha_creacion__lte=fecha_fin)
+        paquetes = filtrar_por_fechas(paquetes, 'fecha_creacion', fecha_inicio, fecha_fin)
         if estado:
             paquetes = paquetes.filter(estado=estado)
         
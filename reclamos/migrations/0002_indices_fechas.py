@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0006_indices_fechas'),
+        ('reclamos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reclamo',
+            index=models.Index(fields=['creado_en'], name='reclamos_re_creado__1c235f_idx'),
+        ),
+    ]
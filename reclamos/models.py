@@ -30,6 +30,11 @@ class Reclamo(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['creado_en']),
+        ]
+
     def __str__(self):
         return f"{self.numero} - {self.estado}"
 
@@ -1,8 +1,6 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import HttpResponse
 import csv
-from django.core.paginator import Paginator
-from django.db.models import Q
 from .models import Reclamo
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
@@ -10,6 +8,9 @@ from usuarios.models import Perfil
 from envios.models import Envio
 import time
 import random
+from CorreosChile.fechas import filtrar_por_fechas
+from CorreosChile.paginacion import paginar_por_cursor
+from busqueda.consulta import filtrar_busqueda
 
 @login_required
 def index(request):
@@ -21,19 +22,12 @@ def index(request):
 
     queryset = Reclamo.objects.all()
     if q:
-        queryset = queryset.filter(
-            Q(numero__icontains=q) |
-            Q(descripcion__icontains=q) |
-            Q(respuesta__icontains=q)
-        )
+        queryset = filtrar_busqueda(queryset, 'reclamo', q)
     if estado:
         queryset = queryset.filter(estado=estado)
     if tipo:
         queryset = queryset.filter(tipo=tipo)
-    if desde:
-        queryset = queryset.filter(creado_en__date__gte=desde)
-    if hasta:
-        queryset = queryset.filter(creado_en__date__lte=hasta)
+    queryset = filtrar_por_fechas(queryset, 'creado_en', desde, hasta)
 
     queryset = queryset.order_by('-creado_en')
 
@@ -62,9 +56,7 @@ def index(request):
             writer.writerow([getattr(r,'numero',''), getattr(r,'tipo',''), getattr(r,'estado',''), getattr(r,'descripcion',''), getattr(r,'creado_en','')])
         return response
 
-    paginator = Paginator(queryset, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar_por_cursor(queryset, request.GET.get('cursor'), campo='creado_en', tamano=10, con_total=True)
 
     estados = [e[0] for e in Reclamo.ESTADOS]
     tipos = [t[0] for t in Reclamo.TIPOS]
@@ -145,19 +137,12 @@ def reporte_pdf(request):
 
     queryset = Reclamo.objects.all()
     if q:
-        queryset = queryset.filter(
-            Q(numero__icontains=q) |
-            Q(descripcion__icontains=q) |
-            Q(respuesta__icontains=q)
-        )
+        queryset = filtrar_busqueda(queryset, 'reclamo', q)
     if estado:
         queryset = queryset.filter(estado=estado)
     if tipo:
         queryset = queryset.filter(tipo=tipo)
-    if desde:
-        queryset = queryset.filter(creado_en__date__gte=desde)
-    if hasta:
-        queryset = queryset.filter(creado_en__date__lte=hasta)
+    queryset = filtrar_por_fechas(queryset, 'creado_en', desde, hasta)
 
     queryset = queryset.order_by('-creado_en')
 
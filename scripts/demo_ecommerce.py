@@ -11,6 +11,7 @@ django.setup()
 from django.contrib.auth.models import User
 from ecommerce.models import PlataformaEcommerce, PedidoEcommerce, ProductoPedido, WebhookLog
 from django.test import Client
+from django.core.management import call_command
 
 def demo_shopify_webhook():
     print("🚀 Demo: Probando integración Shopify")
@@ -99,7 +100,8 @@ def demo_shopify_webhook():
     print(f"📄 Respuesta: {response.json()}")
     
     if response.status_code == 200:
-        print("✅ Webhook procesado exitosamente")
+        print("✅ Webhook encolado exitosamente")
+        call_command('procesar_webhooks')
         
         # Verificar que se creó el pedido
         try:
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0005_indices_compuestos'),
+        ('seguimiento', '0003_eventoseguimiento_foto_url'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventoseguimiento',
+            index=models.Index(fields=['envio', 'registrado_en'], name='seguimiento_envio_i_8da7cb_idx'),
+        ),
+    ]
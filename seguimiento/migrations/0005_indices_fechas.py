@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('envios', '0006_indices_fechas'),
+        ('seguimiento', '0004_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventoseguimiento',
+            index=models.Index(fields=['registrado_en'], name='seguimiento_registr_b621df_idx'),
+        ),
+    ]
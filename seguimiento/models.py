@@ -25,6 +25,12 @@ class EventoSeguimiento(models.Model):
     lng = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     foto_url = models.CharField(max_length=255, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['envio', 'registrado_en']),
+            models.Index(fields=['registrado_en']),
+        ]
+
     def __str__(self):
         return f"{self.envio.codigo} - {self.estado} - {self.ubicacion}"
 
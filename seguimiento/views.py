@@ -1,7 +1,6 @@
 from django.shortcuts import render
 from django.http import HttpResponse
 import csv
-from django.core.paginator import Paginator
 from django.db.models import Q
 from .models import EventoSeguimiento
 from envios.models import Envio
@@ -14,6 +13,10 @@ from django.core.files.base import ContentFile
 from usuarios.models import Perfil
 from django.db import connection
 from envios.eta import recompute_eta_for_envio
+from CorreosChile.fechas import filtrar_por_fechas
+from CorreosChile.paginacion import paginar_por_cursor
+from busqueda.codigos import filtrar_por_codigo
+from busqueda.consulta import interpretar
 
 def _ensure_evento_foto_column():
     try:
@@ -25,6 +28,15 @@ def _ensure_evento_foto_column():
     except Exception:
         pass
 
+def filtrar_eventos(queryset, q):
+    # Un código (o sus últimos dígitos) se busca en el índice de códigos de envíos y bultos
+    codigo, _ = interpretar(q)
+    if codigo:
+        envios = filtrar_por_codigo(Envio.objects.all(), 'envio', codigo)
+        if envios.exists():
+            return queryset.filter(envio__in=envios.values('pk'))
+    return queryset.filter(Q(ubicacion__icontains=q) | Q(observacion__icontains=q))
+
 @login_required
 def index(request):
     _ensure_evento_foto_column()
@@ -115,17 +127,10 @@ def index(request):
 
     queryset = EventoSeguimiento.objects.select_related('envio')
     if q:
-        queryset = queryset.filter(
-            Q(envio__codigo__icontains=q) |
-            Q(ubicacion__icontains=q) |
-            Q(observacion__icontains=q)
-        )
+        queryset = filtrar_eventos(queryset, q)
     if estado:
         queryset = queryset.filter(estado=estado)
-    if desde:
-        queryset = queryset.filter(registrado_en__date__gte=desde)
-    if hasta:
-        queryset = queryset.filter(registrado_en__date__lte=hasta)
+    queryset = filtrar_por_fechas(queryset, 'registrado_en', desde, hasta)
 
     queryset = queryset.order_by('-registrado_en')
 
@@ -163,9 +168,7 @@ def index(request):
             writer.writerow([getattr(ev.envio,'codigo',''), getattr(ev,'estado',''), getattr(ev,'ubicacion',''), getattr(ev,'observacion',''), getattr(ev,'registrado_en','')])
         return response
 
-    paginator = Paginator(queryset, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar_por_cursor(queryset, request.GET.get('cursor'), campo='registrado_en', tamano=10, con_total=True)
 
     estados = [e[0] for e in EventoSeguimiento.ESTADOS]
     counts = {k: EventoSeguimiento.objects.filter(estado=k).count() for k in estados}
@@ -200,17 +203,10 @@ def reporte_pdf(request):
 
     queryset = EventoSeguimiento.objects.select_related('envio')
     if q:
-        queryset = queryset.filter(
-            Q(envio__codigo__icontains=q) |
-            Q(ubicacion__icontains=q) |
-            Q(observacion__icontains=q)
-        )
+        queryset = filtrar_eventos(queryset, q)
     if estado:
         queryset = queryset.filter(estado=estado)
-    if desde:
-        queryset = queryset.filter(registrado_en__date__gte=desde)
-    if hasta:
-        queryset = queryset.filter(registrado_en__date__lte=hasta)
+    queryset = filtrar_por_fechas(queryset, 'registrado_en', desde, hasta)
 
     queryset = queryset.order_by('-registrado_en')
 
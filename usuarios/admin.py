@@ -9,6 +9,6 @@ class PerfilAdmin(admin.ModelAdmin):
 
 @admin.register(SecurityEvent)
 class SecurityEventAdmin(admin.ModelAdmin):
-    list_display = ('status','metodo','ruta','usuario','ip','ocurrido_en')
+    list_display = ('status','metodo','ruta','usuario','ip','cantidad','ocurrido_en')
     list_filter = ('status','metodo')
     search_fields = ('ruta','usuario__username','ip')
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core import checks
+
+# Backends que guardan los datos en la memoria de cada proceso
+CACHES_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def revisar_cache_compartido(app_configs, **kwargs):
+    """El límite de intentos de login solo funciona con un cache compartido entre workers"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+    if backend not in CACHES_LOCALES:
+        return []
+    mensaje = f'El cache por defecto ({backend}) no se comparte entre procesos'
+    ayuda = 'Configure CACHE_REDIS_URL o CACHE_EN_BASE_DE_DATOS (ver settings.py).'
+    if getattr(settings, 'PERMITIR_CACHE_LOCAL', False):
+        return [checks.Warning(mensaje, hint=ayuda, id='usuarios.W001')]
+    return [checks.Error(mensaje, hint=ayuda, id='usuarios.E001')]
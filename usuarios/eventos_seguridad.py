@@ -0,0 +1,56 @@
+"""
+Registro diferido de eventos de seguridad.
+
+SecurityLogMiddleware no inserta un SecurityEvent por cada 401/403: deja el
+evento en un BufferEscrituraDiferida que lo guarda en bloque desde un hilo de
+fondo. Los eventos idénticos (usuario, método, ruta, IP, status y detalle)
+acumulados entre dos vaciados se guardan como una sola fila con su cantidad.
+"""
+from django.conf import settings
+from django.utils import timezone
+
+from CorreosChile.escritura_diferida import BufferEscrituraDiferida
+from .models import SecurityEvent
+
+CAPACIDAD = 10000
+MAX_EVENTOS = 200
+INTERVALO_MS = 1000
+
+
+class BufferEventosSeguridad(BufferEscrituraDiferida):
+    nombre_hilo = 'eventos-seguridad'
+
+    def __init__(self, capacidad=CAPACIDAD, max_eventos=MAX_EVENTOS, intervalo_ms=INTERVALO_MS, asincrono=True):
+        super().__init__(capacidad, max_eventos, intervalo_ms, asincrono)
+
+    def agregar(self, usuario_id, metodo, ruta, ip, status, detalle):
+        super().agregar((usuario_id, metodo, ruta[:255], ip, status, detalle, timezone.now()))
+
+    def guardar(self, eventos):
+        agrupados = {}
+        for usuario_id, metodo, ruta, ip, status, detalle, ocurrido_en in eventos:
+            clave = (usuario_id, metodo, ruta, ip, status, detalle)
+            if clave in agrupados:
+                agrupados[clave].cantidad += 1
+            else:
+                agrupados[clave] = SecurityEvent(
+                    usuario_id=usuario_id,
+                    metodo=metodo,
+                    ruta=ruta,
+                    ip=ip,
+                    status=status,
+                    detalle=detalle,
+                    ocurrido_en=ocurrido_en,
+                    cantidad=1,
+                )
+        SecurityEvent.objects.bulk_create(agrupados.values(), batch_size=500)
+        return len(agrupados)
+
+
+buffer_eventos = BufferEventosSeguridad(asincrono=getattr(settings, 'SECURITY_EVENTS_ASYNC', True))
+
+
+def registrar_evento_seguridad(request, status, detalle='Acceso bloqueado por permisos'):
+    user = getattr(request, 'user', None)
+    usuario_id = user.pk if user is not None and user.is_authenticated else None
+    buffer_eventos.agregar(usuario_id, request.method, request.path, request.META.get('REMOTE_ADDR'), status, detalle)
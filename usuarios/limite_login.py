@@ -0,0 +1,86 @@
+"""
+Limitación de intentos de login.
+
+Los intentos fallidos se cuentan en el cache de Django, por nombre de usuario
+y por IP, con una ventana deslizante aproximada: un contador por ventana fija
+y el de la ventana anterior ponderado por la fracción que aún se solapa. Los
+contadores se incrementan con cache.incr, que es atómico en Redis; con el
+cache en base de datos dos fallos simultáneos pueden contar como uno.
+
+El cache tiene que ser compartido entre procesos (ver CACHES en settings): con
+uno local cada worker lleva sus propios contadores y el límite efectivo se
+multiplica por la cantidad de workers. La revisión usuarios.E001 (checks.py)
+detiene el arranque en ese caso, salvo que se permita con PERMITIR_CACHE_LOCAL.
+
+login_view consulta el límite antes de buscar el usuario o calcular el hash
+de la contraseña, así un atacante no puede forzar ese trabajo una vez
+bloqueado. A diferencia del contador en Perfil o en la sesión, no se evita
+borrando cookies ni probando usuarios inexistentes.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+MAX_INTENTOS_USUARIO = getattr(settings, 'LOGIN_MAX_INTENTOS_USUARIO', 3)
+MAX_INTENTOS_IP = getattr(settings, 'LOGIN_MAX_INTENTOS_IP', 20)
+VENTANA_S = getattr(settings, 'LOGIN_VENTANA_S', 15 * 60)
+
+
+def _claves(ambito, valor, ahora):
+    """Claves del contador de la ventana actual y de la anterior"""
+    digest = hashlib.sha256(valor.encode('utf-8')).hexdigest()[:32]
+    ventana = int(ahora // VENTANA_S)
+    return f'login:{ambito}:{digest}:{ventana}', f'login:{ambito}:{digest}:{ventana - 1}'
+
+
+def _ambitos(username, ip):
+    ambitos = [('usuario', (username or '').strip().lower(), MAX_INTENTOS_USUARIO)]
+    if ip:
+        ambitos.append(('ip', ip, MAX_INTENTOS_IP))
+    return ambitos
+
+
+def _estimar(valores, actual, anterior, ahora):
+    peso_anterior = 1 - (ahora % VENTANA_S) / VENTANA_S
+    return valores.get(actual, 0) + valores.get(anterior, 0) * peso_anterior
+
+
+def intentos_restantes(username, ip):
+    """
+    Intentos que quedan antes del bloqueo (0 si ya está bloqueado).
+
+    Es el mínimo entre el límite por usuario y el límite por IP; se resuelve
+    con una sola lectura al cache.
+    """
+    ahora = time.time()
+    ambitos = [(_claves(ambito, valor, ahora), maximo) for ambito, valor, maximo in _ambitos(username, ip)]
+    valores = cache.get_many([clave for claves, _ in ambitos for clave in claves])
+    return max(0, min(math.ceil(maximo - _estimar(valores, *claves, ahora)) for claves, maximo in ambitos))
+
+
+def registrar_fallo(username, ip):
+    """Suma un intento fallido al usuario y a la IP; devuelve los intentos restantes"""
+    ahora = time.time()
+    restantes = []
+    for ambito, valor, maximo in _ambitos(username, ip):
+        actual, anterior = _claves(ambito, valor, ahora)
+        # El contador debe sobrevivir a la ventana siguiente, donde se pondera
+        cache.add(actual, 0, 2 * VENTANA_S)
+        try:
+            cuenta = cache.incr(actual)
+        except ValueError:
+            # Expiró entre add e incr
+            cache.add(actual, 1, 2 * VENTANA_S)
+            cuenta = 1
+        valores = {actual: cuenta, anterior: cache.get(anterior, 0)}
+        restantes.append(math.ceil(maximo - _estimar(valores, actual, anterior, ahora)))
+    return max(0, min(restantes))
+
+
+def limpiar_usuario(username):
+    """Tras un login exitoso se olvidan los fallos del usuario (no los de la IP)"""
+    ahora = time.time()
+    cache.delete_many(_claves('usuario', (username or '').strip().lower(), ahora))
@@ -1,23 +1,13 @@
 from django.utils.deprecation import MiddlewareMixin
-from django.utils import timezone
-from django.contrib.auth.models import AnonymousUser
-from .models import SecurityEvent
+from .eventos_seguridad import registrar_evento_seguridad
 
 
 class SecurityLogMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
         try:
             if response.status_code in (401, 403):
-                user = getattr(request, 'user', None)
-                SecurityEvent.objects.create(
-                    usuario=None if (not user or isinstance(user, AnonymousUser) or not user.is_authenticated) else user,
-                    metodo=request.method,
-                    ruta=request.path,
-                    ip=request.META.get('REMOTE_ADDR'),
-                    status=response.status_code,
-                    detalle='Acceso bloqueado por permisos',
-                    ocurrido_en=timezone.now(),
-                )
+                # Se encola; el hilo de eventos_seguridad lo guarda en bloque
+                registrar_evento_seguridad(request, response.status_code)
         except Exception:
             pass
         return response
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # También une las dos ramas 0003 existentes
+    dependencies = [
+        ('usuarios', '0003_alter_securityevent_ocurrido_en'),
+        ('usuarios', '0003_perfil_loginlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='securityevent',
+            name='cantidad',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
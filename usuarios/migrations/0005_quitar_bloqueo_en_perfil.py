@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_securityevent_cantidad'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='perfil',
+            name='bloqueado_hasta',
+        ),
+        migrations.RemoveField(
+            model_name='perfil',
+            name='intentos_fallidos',
+        ),
+    ]
@@ -31,8 +31,6 @@ class Perfil(models.Model):
         null=True,
         blank=True
     )  # Foto opcional del perfil
-    intentos_fallidos = models.PositiveIntegerField(default=0)
-    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.rol}"
@@ -51,6 +49,8 @@ class SecurityEvent(models.Model):
     status = models.PositiveIntegerField()
     detalle = models.TextField(blank=True, null=True)
     ocurrido_en = models.DateTimeField(default=None, null=True, blank=True)
+    # Eventos idénticos agrupados en la misma fila por el registro diferido
+    cantidad = models.PositiveIntegerField(default=1)
 
     def __str__(self):
         return f"{self.status} {self.metodo} {self.ruta}"
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from CorreosChile.escritura_diferida import BufferEscrituraDiferida
+
+from . import limite_login
+from .checks import revisar_cache_compartido
+from .eventos_seguridad import BufferEventosSeguridad
+from .models import SecurityEvent
+
+
+class BufferEventosSeguridadTest(TestCase):
+    def setUp(self):
+        self.buffer = BufferEventosSeguridad(max_eventos=100, asincrono=False)
+
+    def test_eventos_identicos_se_guardan_en_una_fila(self):
+        user = User.objects.create_user(username='ana', password='clave-segura-123')
+        for _ in range(5):
+            self.buffer.agregar(None, 'POST', '/usuarios/login/', '10.0.0.1', 403, 'Bloqueado')
+        self.buffer.agregar(None, 'POST', '/usuarios/login/', '10.0.0.2', 403, 'Bloqueado')
+        self.buffer.agregar(user.pk, 'GET', '/flota/', '10.0.0.1', 403, 'Bloqueado')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.vaciar(), 3)
+
+        evento = SecurityEvent.objects.get(ip='10.0.0.1', usuario__isnull=True)
+        self.assertEqual(evento.cantidad, 5)
+        self.assertEqual(SecurityEvent.objects.get(usuario=user).ruta, '/flota/')
+
+    def test_se_vacia_al_alcanzar_el_maximo(self):
+        buffer = BufferEventosSeguridad(max_eventos=3, asincrono=False)
+        for i in range(3):
+            buffer.agregar(None, 'GET', f'/ruta/{i}/', '10.0.0.1', 401, '')
+
+        self.assertEqual(SecurityEvent.objects.count(), 3)
+        self.assertFalse(buffer.registros)
+
+    def test_buffer_lleno_descarta_los_mas_antiguos(self):
+        buffer = BufferEventosSeguridad(capacidad=2, max_eventos=10, asincrono=False)
+        for i in range(4):
+            buffer.agregar(None, 'GET', f'/ruta/{i}/', '10.0.0.1', 401, '')
+
+        self.assertEqual(buffer.descartados, 2)
+        buffer.vaciar()
+        self.assertEqual(sorted(SecurityEvent.objects.values_list('ruta', flat=True)), ['/ruta/2/', '/ruta/3/'])
+
+    def test_el_buffer_base_exige_definir_guardar(self):
+        with self.assertRaises(TypeError):
+            BufferEscrituraDiferida()
+
+    def test_al_salir_se_ignora_un_error_al_guardar(self):
+        self.buffer.agregar(None, 'GET', '/ruta/', '10.0.0.1', 401, '')
+        with mock.patch.object(self.buffer, 'guardar', side_effect=RuntimeError('sin conexión')):
+            self.buffer._vaciar_al_salir()
+        self.assertFalse(self.buffer.registros)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LimiteLoginTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ana', password='clave-segura-123')
+        self.url = reverse('usuarios:login')
+
+    def intentar(self, password, username='ana', ip='10.0.0.1'):
+        return self.client.post(self.url, {'username': username, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_bloqueo_por_usuario_sin_tocar_la_base_de_datos(self):
+        for _ in range(limite_login.MAX_INTENTOS_USUARIO):
+            self.intentar('incorrecta')
+
+        with mock.patch('django.contrib.auth.backends.ModelBackend.authenticate') as autenticar:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.intentar('clave-segura-123', ip='10.0.0.2')
+        autenticar.assert_not_called()
+        # Con el cache en base de datos solo se consulta la tabla del cache
+        tabla_usuarios = User._meta.db_table
+        self.assertFalse([q['sql'] for q in consultas if tabla_usuarios in q['sql']])
+        self.assertIn('bloqueado=1', response['Location'])
+        self.assertEqual(self.client.session['login_prefill'], 'ana')
+
+    def test_cache_local_no_se_acepta_en_produccion(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=locmem, PERMITIR_CACHE_LOCAL=False):
+            self.assertEqual([e.id for e in revisar_cache_compartido(None)], ['usuarios.E001'])
+        with override_settings(CACHES=locmem, PERMITIR_CACHE_LOCAL=True):
+            self.assertEqual([e.id for e in revisar_cache_compartido(None)], ['usuarios.W001'])
+        compartido = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache_compartido'}}
+        with override_settings(CACHES=compartido, PERMITIR_CACHE_LOCAL=False):
+            self.assertEqual(revisar_cache_compartido(None), [])
+
+    def test_bloqueo_por_ip_con_usuarios_distintos(self):
+        for i in range(limite_login.MAX_INTENTOS_IP):
+            self.intentar('incorrecta', username=f'inexistente{i}')
+
+        self.assertEqual(limite_login.intentos_restantes('ana', '10.0.0.1'), 0)
+        self.assertEqual(limite_login.intentos_restantes('ana', '10.0.0.9'), limite_login.MAX_INTENTOS_USUARIO)
+
+    def test_login_exitoso_limpia_los_intentos_del_usuario(self):
+        self.intentar('incorrecta')
+        self.assertEqual(limite_login.intentos_restantes('ana', None), limite_login.MAX_INTENTOS_USUARIO - 1)
+
+        response = self.intentar('clave-segura-123')
+
+        self.assertEqual(response['Location'], reverse('usuarios:index'))
+        self.assertEqual(limite_login.intentos_restantes('ana', None), limite_login.MAX_INTENTOS_USUARIO)